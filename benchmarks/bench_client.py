@@ -0,0 +1,195 @@
+"""
+Client throughput benchmarks against the local mock GoTo API (benchmarks/mockgoto.py).
+
+Reports requests/sec, p50/p99 request latency and peak traced memory for full directory walks, bulk create, bulk
+update and token refresh.
+
+    python -m benchmarks.bench_client [--users 100000] [--latency 0.005] [--scenarios walk,create]
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from typing import Callable, Dict, List
+
+from gotomeeting_manager.gotobulk import run_bulk
+from gotomeeting_manager.gotocredentials import FileCredentialStore
+from gotomeeting_manager.gotomanager import Manager
+from gotomeeting_manager.gotoratelimit import DEFAULT_LIMITS, RateLimit, RateLimiter
+from gotomeeting_manager.gotoretry import RetryPolicy
+from gotomeeting_manager.gototokens import TIMESTAMP_FORMAT
+from gotomeeting_manager.gototransport import Transport
+
+from benchmarks.mockgoto import ACCOUNT_KEY, KEY_BASE, MockGoToServer
+
+
+class TimedTransport(Transport):
+    """
+    Transport that records the duration of every request
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations: List[float] = []
+        self._durations_lock = threading.Lock()
+
+    def request(self, method: str, path: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().request(method, path, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._durations_lock:
+                self.durations.append(elapsed)
+
+
+def make_manager(server: MockGoToServer, directory: str, rate_limited: bool) -> Manager:
+    store = FileCredentialStore(os.path.join(directory, "bench.creds"))
+    store.save({
+        "organizer_key": "mock-organizer",
+        "account_key": ACCOUNT_KEY,
+        "access_token": "mock-access-0",
+        "refresh_token": "mock-refresh-0",
+        "last_refreshed": datetime.datetime.now().strftime(TIMESTAMP_FORMAT),
+    })
+
+    unlimited = {family: RateLimit(rate=1e9, burst=10 ** 9) for family in DEFAULT_LIMITS}
+    transport = TimedTransport(base_url=server.base_url, pool_size=32,
+                               rate_limiter=RateLimiter() if rate_limited else RateLimiter(limits=unlimited),
+                               retry_policy=RetryPolicy(backoff=0.01))
+
+    return Manager(consumer_key="key", consumer_secret="secret", credential_store=store, transport=transport,
+                   proactive_token_renewal=False, headless=True)
+
+
+# SCENARIOS
+########################################################################################################################
+_emails = itertools.count()
+
+
+def walk(manager: Manager, args) -> int:
+    return sum(1 for _ in manager.iter_users(page_size=100))
+
+
+def walk_streamed(manager: Manager, args) -> int:
+    return sum(1 for _ in manager.iter_users(page_size=100, stream=True))
+
+
+def fetch_all(manager: Manager, args) -> int:
+    return len(manager.fetch_all_users(parallelism=args.workers, page_size=100))
+
+
+def bulk_create(manager: Manager, args) -> int:
+    users = ({"first_name": "Bench", "last_name": str(number), "email": f"bench{number}@example.com"}
+             for number in itertools.islice(_emails, args.writes))
+    return sum(result.ok for result in manager.create_users(users, workers=args.workers))
+
+
+def bulk_update(manager: Manager, args) -> int:
+    def update(index: int):
+        return manager.update_user(str(KEY_BASE + index), email=f"user{index}@example.com", confirm=False,
+                                   firstName="Updated")
+
+    return sum(result.ok for result in run_bulk(update, range(args.writes), workers=args.workers))
+
+
+def token_refresh(manager: Manager, args) -> int:
+    for _ in range(args.refreshes):
+        manager._tokens.refresh(stale_token=manager._tokens.access_token)
+    return args.refreshes
+
+
+SCENARIOS: Dict[str, Callable[[Manager, argparse.Namespace], int]] = {
+    "walk": walk,
+    "walk-stream": walk_streamed,
+    "fetch-all": fetch_all,
+    "create": bulk_create,
+    "update": bulk_update,
+    "refresh": token_refresh,
+}
+
+
+# REPORTING
+########################################################################################################################
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run(name: str, server: MockGoToServer, directory: str, args) -> Dict:
+    scenario = SCENARIOS[name]
+
+    manager = make_manager(server, directory, args.rate_limited)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        items = scenario(manager, args)
+        elapsed = time.perf_counter() - start
+    durations = manager._transport.durations
+    manager.close()
+
+    peak = None
+    if args.memory:
+        # A second run under tracemalloc, so its overhead does not distort the timings above
+        manager = make_manager(server, directory, args.rate_limited)
+        with contextlib.redirect_stdout(io.StringIO()):
+            tracemalloc.start()
+            scenario(manager, args)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        manager.close()
+
+    return {
+        "scenario": name,
+        "items": items,
+        "requests": len(durations),
+        "elapsed": elapsed,
+        "rps": len(durations) / elapsed if elapsed else 0.0,
+        "p50": percentile(durations, 0.5) * 1000,
+        "p99": percentile(durations, 0.99) * 1000,
+        "mean": statistics.fmean(durations) * 1000 if durations else 0.0,
+        "peak": peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock server latency per request, in seconds")
+    parser.add_argument("--max-page-size", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=2000, help="Users created/updated by the bulk scenarios")
+    parser.add_argument("--refreshes", type=int, default=200)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--rate-limited", action="store_true", help="Keep the client's default rate limits")
+    parser.add_argument("--no-memory", dest="memory", action="store_false")
+    args = parser.parse_args()
+
+    print(f"{args.users} users, {args.latency * 1000:g} ms latency, {args.error_rate:.1%} 502s, "
+          f"{args.throttle_rate:.1%} 429s, {args.workers} workers")
+    print(f"{'scenario':<12} {'items':>8} {'requests':>9} {'seconds':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'peak MB':>8}")
+
+    with MockGoToServer(users=args.users, latency=args.latency, max_page_size=args.max_page_size,
+                        error_rate=args.error_rate, throttle_rate=args.throttle_rate) as server, \
+            tempfile.TemporaryDirectory() as directory:
+        for name in args.scenarios.split(","):
+            result = run(name.strip(), server, directory, args)
+            peak = f"{result['peak'] / 2 ** 20:8.1f}" if result["peak"] is not None else f"{'-':>8}"
+            print(f"{result['scenario']:<12} {result['items']:>8} {result['requests']:>9} {result['elapsed']:>8.2f} "
+                  f"{result['rps']:>9.1f} {result['p50']:>8.2f} {result['p99']:>8.2f} {peak}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Import-time benchmark: how long a fresh interpreter takes to import the Manager, and which heavy modules it loads.
+
+    python -m benchmarks.bench_import [--runs 10] [--budget-ms 250]
+
+Exits with status 1 if the median import time exceeds the budget or if the interactive auth stack (browser launcher,
+redirect receiver) is imported eagerly.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULE = "gotomeeting_manager.gotomanager"
+LAZY_MODULES = ("webbrowser", "http.server", "gotomeeting_manager.gotoauthreceiver")
+
+_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import {MODULE}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure(runs: int):
+    timings, loaded = [], set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _PROBE], check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["elapsed"])
+        loaded.update(result["loaded"])
+    return timings, sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=250)
+    args = parser.parse_args()
+
+    timings, loaded = measure(args.runs)
+    median = statistics.median(timings) * 1000
+
+    print(f"import {MODULE}: median {median:.1f} ms, min {min(timings) * 1000:.1f} ms, "
+          f"max {max(timings) * 1000:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    if loaded:
+        print(f"eagerly imported: {', '.join(loaded)}")
+
+    if median > args.budget_ms or loaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Microbenchmark for the response models: bytes retained per user and construction time for a synthetic page of users.
+
+    python -m benchmarks.bench_responses [--users 100000]
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from gotomeeting_manager.gotoresponses import UserResponse
+
+
+class DictUserResponse:
+    """
+    The previous model: a plain class whose fields are copied eagerly into a per-instance __dict__
+    """
+
+    def __init__(self, user_data):
+        self.key = user_data.get("key", None)
+        self.first_name = user_data.get("firstName", None)
+        self.last_name = user_data.get("lastName", None)
+        self.email = user_data.get("email", None)
+        self.locale = user_data.get("locale", None)
+        self.license_keys = user_data.get("licenseKeys", None)
+        self.group_key = user_data.get("groupKey", None)
+        self.group_name = user_data.get("groupName", None)
+        self.admin = user_data.get("admin", False)
+        self.products = user_data.get("products", None)
+        self.status = user_data.get("status", None)
+
+
+def synthetic_page(users: int) -> bytes:
+    return json.dumps({"results": [{
+        "key": str(1000000000 + index),
+        "firstName": "First",
+        "lastName": f"Last{index}",
+        "email": f"user{index}@example.com",
+        "locale": "en_US",
+        "licenseKeys": [1000000001],
+        "groupKey": str(index % 50),
+        "groupName": f"Group {index % 50}",
+        "admin": False,
+        "products": ["G2M"],
+        "status": "ACTIVE",
+    } for index in range(users)]}).encode("utf-8")
+
+
+def measure(name: str, build, body: bytes, users: int):
+    results = json.loads(body)["results"]
+    start = time.perf_counter()
+    build(results)
+    elapsed = time.perf_counter() - start
+    del results
+
+    gc.collect()
+    tracemalloc.start()
+    results = json.loads(body)["results"]
+    models = build(results)
+    del results
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<28} {retained / users:>10.1f} B/user {elapsed / users * 1e6:>10.3f} us/user")
+    return models
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100000)
+    args = parser.parse_args()
+
+    body = synthetic_page(args.users)
+
+    print(f"{args.users} users; retained memory includes whatever decoded JSON the models still reference")
+    measure("dict (previous)", lambda results: [DictUserResponse(data) for data in results], body, args.users)
+    measure("slots, lazy (from_page)", lambda results: UserResponse.from_page(results), body, args.users)
+    measure("slots, compact", lambda results: UserResponse.from_page(results, compact=True), body, args.users)
+
+    models = UserResponse.from_page(json.loads(body)["results"])
+    start = time.perf_counter()
+    for model in models:
+        model.to_tuple()
+    print(f"{'to_tuple':<28} {'':>17} {(time.perf_counter() - start) / args.users * 1e6:>10.3f} us/user")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Local stand-in for the parts of the GoTo admin, OAuth and G2M APIs that Manager uses, for offline benchmarks.
+
+The directory is synthetic: user i is generated on demand from its index, so 100k users cost no memory until they are
+created, updated or deleted. Latency, the server's maximum page size and 502/429 injection are configurable.
+
+    python -m benchmarks.mockgoto [--port 8080] [--users 100000] [--latency 0.005]
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ACCOUNT_KEY = "mock-account"
+KEY_BASE = 1000000000
+
+LICENSES = [
+    {"key": "1", "products": ["G2M"]},
+    {"key": "2", "products": ["G2M", "G2W"]},
+    {"key": "3", "products": ["G2M", "G2T"]},
+]
+
+
+def _products(license_keys: List[str]) -> List[str]:
+    granted = {product for license in LICENSES if license["key"] in license_keys for product in license["products"]}
+    return sorted(granted)
+
+
+_TERM = re.compile(r'\((\w+)="(\(\?i\))?((?:[^"\\]|\\.)*)"\)')
+_ESCAPE = re.compile(r"\\(.)")
+
+_USERS = re.compile(r"^/admin/rest/v1/accounts/[^/]+/users(?:/([^/]+))?$")
+_GROUPS = re.compile(r"^/admin/rest/v1/accounts/[^/]+/groups$")
+_LICENSES = re.compile(r"^/admin/rest/v1/accounts/[^/]+/licenses$")
+_ORGANIZERS = re.compile(r"^/G2M/rest/organizers/([^/]+)$")
+_GROUP_ORGANIZERS = re.compile(r"^/G2M/rest/groups/([^/]+)/organizers$")
+
+
+def _compile_filter(expression: Optional[str]):
+    """
+    Parse the filter expressions Manager builds: terms of the form (field="value") or (field="(?i)value") joined
+    by & or |, with backslash-escaped values
+    """
+    if not expression:
+        return None
+
+    terms = [(field, bool(insensitive), _ESCAPE.sub(r"\1", value))
+             for field, insensitive, value in _TERM.findall(expression)]
+    combine = any if "|" in expression else all
+
+    def matches(user: Dict) -> bool:
+        def match(field, insensitive, value):
+            actual = user.get(field)
+            if actual is None:
+                return False
+            return str(actual).lower() == value.lower() if insensitive else str(actual) == value
+
+        return combine(match(*term) for term in terms)
+
+    return matches, terms, combine
+
+
+class MockGoToServer:
+    """
+    Threaded HTTP server emulating the GoTo endpoints. Use as a context manager or call start()/stop().
+    """
+
+    def __init__(self, users: int = 100000, groups: int = 50, latency: float = 0.0, jitter: float = 0.0,
+                 max_page_size: int = 100, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: float = 0.0, host: str = "127.0.0.1", port: int = 0, seed: int = 0):
+        """
+        :param users: Size of the synthetic directory
+        :param groups: Number of groups users are spread over
+        :param latency: Seconds every request is delayed by
+        :param jitter: Extra random delay of up to this many seconds
+        :param max_page_size: Largest page the server returns, whatever pageSize asks for
+        :param error_rate: Probability of answering a request with 502
+        :param throttle_rate: Probability of answering a request with 429
+        :param retry_after: Retry-After sent with injected 429s
+        """
+        self.user_count = users
+        self.group_count = groups
+        self.latency = latency
+        self.jitter = jitter
+        self.max_page_size = max_page_size
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+
+        self.requests = 0
+        self.statuses: Counter = Counter()
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._overrides: Dict[str, Dict] = {}
+        self._extra: List[str] = []
+        self._deleted = set()
+        self._emails: Dict[str, str] = {}
+        self._next_key = itertools.count(KEY_BASE + users)
+        self._tokens = itertools.count(1)
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without TCP_NODELAY delayed ACKs add ~40 ms per request
+            disable_nagle_algorithm = True
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+
+                status, payload, headers = server.handle(self.command, url.path, query, raw,
+                                                         self.headers.get("Content-Type") or "")
+
+                data = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://{host}:{self._server.server_port}"
+        self._thread: Optional[threading.Thread] = None
+
+    # LIFECYCLE
+########################################################################################################################
+    def start(self) -> "MockGoToServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    # DIRECTORY
+########################################################################################################################
+    def synthetic_user(self, index: int) -> Dict:
+        group = index % self.group_count
+        return {
+            "key": str(KEY_BASE + index),
+            "email": f"user{index}@example.com",
+            "firstName": "First",
+            "lastName": f"Last{index}",
+            "locale": "en_US",
+            "licenseKeys": ["1"],
+            "products": ["G2M"],
+            "groupKey": str(group),
+            "groupName": f"Group {group}",
+            "admin": False,
+            "status": "ACTIVE",
+        }
+
+    def user(self, key: str) -> Optional[Dict]:
+        if key in self._deleted:
+            return None
+        if key in self._overrides:
+            return self._overrides[key]
+        try:
+            index = int(key) - KEY_BASE
+        except ValueError:
+            return None
+        return self.synthetic_user(index) if 0 <= index < self.user_count else None
+
+    def _user_by_email(self, email: str) -> Optional[Dict]:
+        key = self._emails.get(email.lower())
+        if key is None:
+            match = re.fullmatch(r"user(\d+)@example\.com", email.lower())
+            key = str(KEY_BASE + int(match.group(1))) if match else None
+        user = self.user(key) if key is not None else None
+        return user if user is not None and user["email"].lower() == email.lower() else None
+
+    def _keys(self) -> Iterator[str]:
+        for index in range(self.user_count):
+            key = str(KEY_BASE + index)
+            if key not in self._deleted:
+                yield key
+        for key in self._extra:
+            if key not in self._deleted:
+                yield key
+
+    def _select_users(self, expression: Optional[str]) -> Tuple[Optional[List[Dict]], Optional[int]]:
+        """
+        :return: (matching users, None) for a filtered query, or (None, total) for the unfiltered directory
+        """
+        compiled = _compile_filter(expression)
+        if compiled is None:
+            return None, self.user_count + len(self._extra) - len(self._deleted)
+
+        matches, terms, combine = compiled
+        if all(field in ("key", "email") for field, _, _ in terms) and (combine is any or len(terms) == 1):
+            # Point lookups by key or email do not need a scan
+            found = [self.user(value) if field == "key" else self._user_by_email(value) for field, _, value in terms]
+            return [user for user in found if user is not None and matches(user)], None
+
+        return [user for user in map(self.user, self._keys()) if matches(user)], None
+
+    def _page_of_users(self, offset: int, page_size: int) -> List[Dict]:
+        if not self._deleted and offset < self.user_count:
+            end = min(offset + page_size, self.user_count)
+            page = [self._overrides.get(str(KEY_BASE + index)) or self.synthetic_user(index)
+                    for index in range(offset, end)]
+            extra = self._extra[:page_size - len(page)]
+            return page + [self._overrides[key] for key in extra]
+
+        keys = itertools.islice(self._keys(), offset, offset + page_size)
+        return [self.user(key) for key in keys]
+
+    # REQUEST HANDLING
+########################################################################################################################
+    def handle(self, method: str, path: str, query: Dict[str, str], raw: bytes,
+               content_type: str) -> Tuple[int, object, Dict[str, str]]:
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+
+        if roll < self.throttle_rate:
+            response = 429, {"errorCode": "TOO_MANY_REQUESTS"}, {"Retry-After": f"{self.retry_after:g}"}
+        elif roll < self.throttle_rate + self.error_rate:
+            response = 502, {"errorCode": "BAD_GATEWAY"}, {}
+        else:
+            body = json.loads(raw) if raw and content_type.startswith("application/json") else raw
+            with self._lock:
+                response = self._route(method, path, query, body)
+
+        with self._lock:
+            self.statuses[response[0]] += 1
+        return response
+
+    def _route(self, method: str, path: str, query: Dict[str, str], body) -> Tuple[int, object, Dict[str, str]]:
+        if method == "POST" and path == "/oauth/v2/token":
+            number = next(self._tokens)
+            return 200, {"access_token": f"mock-access-{number}", "refresh_token": f"mock-refresh-{number}",
+                         "expires_in": 3600, "account_key": ACCOUNT_KEY, "organizer_key": "mock-organizer"}, {}
+
+        match = _USERS.match(path)
+        if match:
+            return self._users(method, match.group(1), query, body)
+
+        if method == "GET" and _GROUPS.match(path):
+            groups = [{"groupKey": str(index), "groupName": f"Group {index}"} for index in range(self.group_count)]
+            offset, page_size = self._paging(query)
+            return 200, {"results": groups[offset:offset + page_size], "total": len(groups)}, {}
+
+        if method == "GET" and _LICENSES.match(path):
+            return 200, {"results": LICENSES}, {}
+
+        match = _ORGANIZERS.match(path)
+        if match and method in ("PUT", "DELETE"):
+            if self.user(match.group(1)) is None:
+                return 404, {"errorCode": "NOT_FOUND"}, {}
+            if method == "DELETE":
+                self._deleted.add(match.group(1))
+            else:
+                status = body.get("status")
+                self._update(match.group(1), {"status": status.upper()} if status in ("suspended", "active") else {})
+            return 204, None, {}
+
+        match = _GROUP_ORGANIZERS.match(path)
+        if match and method == "POST":
+            user = self._create(body.get("organizerEmail"), body.get("firstName"), body.get("lastName"))
+            if user is None:
+                return 409, {"errorCode": "CONFLICT"}, {}
+            self._update(user["key"], {"groupKey": match.group(1)})
+            return 201, [{"key": user["key"]}], {}
+
+        return 404, {"errorCode": "NOT_FOUND"}, {}
+
+    def _paging(self, query: Dict[str, str]) -> Tuple[int, int]:
+        return int(query.get("offset", 0)), min(int(query.get("pageSize", 25)), self.max_page_size)
+
+    def _users(self, method: str, key: Optional[str], query: Dict[str, str], body) -> Tuple[int, object, Dict]:
+        if method == "GET" and key is None:
+            offset, page_size = self._paging(query)
+            selected, total = self._select_users(query.get("filter"))
+            if selected is not None:
+                return 200, {"results": selected[offset:offset + page_size], "total": len(selected)}, {}
+            return 200, {"results": self._page_of_users(offset, page_size), "total": total}, {}
+
+        if method == "POST" and key is None:
+            user = self._create(body.get("email"), body.get("firstName"), body.get("lastName"),
+                                body.get("licenseKeys"))
+            if user is None:
+                return 409, {"errorCode": "CONFLICT"}, {}
+            return 200, {"key": user["key"]}, {}
+
+        if method == "PUT" and key is not None:
+            if self.user(key) is None:
+                return 404, {"errorCode": "NOT_FOUND"}, {}
+            self._update(key, body)
+            return 200, {}, {}
+
+        return 404, {"errorCode": "NOT_FOUND"}, {}
+
+    def _create(self, email: str, first_name: str, last_name: str, license_keys: Optional[List[str]] = None):
+        if email is None or self._user_by_email(email) is not None:
+            return None
+
+        key = str(next(self._next_key))
+        license_keys = license_keys or ["1"]
+        user = {"key": key, "email": email, "firstName": first_name, "lastName": last_name, "locale": "en_US",
+                "licenseKeys": license_keys, "products": _products(license_keys), "groupKey": "0",
+                "groupName": "Group 0", "admin": False, "status": "ACTIVE"}
+        self._overrides[key] = user
+        self._extra.append(key)
+        self._emails[email.lower()] = key
+        return user
+
+    def _update(self, key: str, fields: Dict):
+        user = dict(self.user(key))
+        user.update(fields)
+        if "licenseKeys" in fields:
+            user["products"] = _products(fields["licenseKeys"])
+        self._overrides[key] = user
+        self._emails[user["email"].lower()] = key
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--max-page-size", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockGoToServer(users=args.users, latency=args.latency, max_page_size=args.max_page_size,
+                            error_rate=args.error_rate, throttle_rate=args.throttle_rate, port=args.port)
+    print(f"Mock GoTo API with {args.users} users on {server.base_url} (account key {ACCOUNT_KEY})")
+    server._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
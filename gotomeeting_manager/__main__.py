@@ -1,13 +1,326 @@
+"""
+Command-line entry point for bulk work.
+
+    python -m gotomeeting_manager create users.csv --output created.ndjson --checkpoint created.checkpoint
+    python -m gotomeeting_manager update changes.jsonl --workers 16 --rps 10
+    python -m gotomeeting_manager suspend leavers.csv
+    python -m gotomeeting_manager export --output users.ndjson --filter status=active
+
+Input rows are read, processed and reported one at a time. create takes email, first_name, last_name and optionally
+products (comma-separated) and group_name. update takes key or email plus the fields to change, using the API's
+names or snake_case. suspend takes key or email. With --checkpoint, a job that is rerun with the same command skips
+the rows that already succeeded: rows that failed, or were in flight when the job was interrupted, run again.
+"""
+import argparse
+import csv
+import functools
+import json
+import logging
+import os
+import sys
+import time
+
+from typing import Callable, Dict, IO, Iterator, List, Optional
+
+from gotomeeting_manager.gotobulk import RequestBudget, run_bulk
+from gotomeeting_manager.gotocheckpoint import Checkpoint
+from gotomeeting_manager.gotoexceptions import CheckpointError, CredentialError, UserExistsError
+from gotomeeting_manager.gotojson import loads
 from gotomeeting_manager.gotomanager import Manager
-from config.shared_config import SharedConfig
+from gotomeeting_manager.gotoreconcile import DesiredUser, parse_products
+from gotomeeting_manager.gototransport import Transport
+
+_FIELD_NAMES = {
+    "first_name": "firstName",
+    "last_name": "lastName",
+    "group_key": "groupKey",
+    "license_keys": "licenseKeys",
+}
+
+
+# INPUT AND OUTPUT
+########################################################################################################################
+def read_records(path: str, input_format: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Stream records from a CSV file with a header row or from a JSON Lines file, one record at a time
+    :param path: File to read, or "-" for stdin
+    :param input_format: "csv" or "jsonl". Defaults to "csv" for *.csv files and "jsonl" otherwise
+    :return: Iterator of dicts. Empty CSV cells and blank lines are skipped
+    """
+    if input_format is None:
+        input_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+
+    f = sys.stdin if path == "-" else open(path, "r", newline="", encoding="utf-8")
+    try:
+        if input_format == "csv":
+            for row in csv.DictReader(f):
+                yield {name.strip(): value.strip() for name, value in row.items()
+                       if name and isinstance(value, str) and value.strip()}
+            return
+
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: invalid JSON: {e}") from e
+            if not isinstance(record, dict):
+                raise ValueError(f"{path}:{number}: expected a JSON object")
+            yield record
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class NdjsonWriter:
+    """
+    Writes one JSON document per line. Lines are flushed as they are written, so everything a checkpoint has
+    recorded is already on disk
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self._file = sys.stdout if path == "-" else open(path, "a" if append else "w", encoding="utf-8", buffering=1)
+
+    def write(self, record: Dict):
+        self._file.write(json.dumps(record, default=str) + "\n")
+
+    def close(self):
+        if self._file is sys.stdout:
+            self._file.flush()
+        else:
+            self._file.close()
+
+
+class Progress:
+    """
+    Periodic progress and throughput report on stderr
+    """
+
+    def __init__(self, interval: float = 5.0, skipped: int = 0, stream: Optional[IO] = None):
+        self.interval = interval
+        self.skipped = skipped
+        self.stream = stream if stream is not None else sys.stderr
+        self.done = 0
+        self.failed = 0
+        self._started = time.monotonic()
+        self._reported = self._started
+
+    def update(self, ok: bool):
+        self.done += 1
+        self.failed += not ok
+
+        now = time.monotonic()
+        if self.interval and now - self._reported >= self.interval:
+            self._reported = now
+            self.report()
+
+    def report(self, final: bool = False):
+        elapsed = time.monotonic() - self._started
+        rate = self.done / elapsed if elapsed else 0.0
+        skipped = f", {self.skipped} skipped from checkpoint" if self.skipped else ""
+        prefix = "Finished: " if final else ""
+        print(f"{prefix}{self.done} rows in {elapsed:.1f}s ({rate:.1f} rows/s), {self.failed} failed{skipped}",
+              file=self.stream, flush=True)
+
+
+# OPERATIONS
+########################################################################################################################
+def _user_key(manager: Manager, record: Dict) -> str:
+    if record.get("key"):
+        return str(record["key"])
+    if not record.get("email"):
+        raise ValueError("Row needs a key or an email")
+    return manager.get_user_by_email(email=record["email"]).key
+
+
+def create(manager: Manager, record: Dict, resumed: bool = False) -> Dict:
+    """
+    :param resumed: The job resumes from a checkpoint, so the row may have been created by the interrupted run after
+    its last checkpoint write. An existing user with the row's email and name then counts as created
+    """
+    user = DesiredUser.from_dict(record)
+    try:
+        key = manager.create_user(first_name=user.first_name, last_name=user.last_name, email=user.email,
+                                  products=list(user.products), confirm=False)[0].key
+    except UserExistsError:
+        if not resumed:
+            raise
+        existing = manager.get_user_by_email(email=user.email, use_directory=False)
+        if (existing.first_name, existing.last_name) != (user.first_name, user.last_name):
+            raise
+        key = existing.key
+
+    if user.group_name is not None:
+        manager.update_user(key, email=user.email, confirm=False, groupKey=manager.get_group_key(user.group_name))
+
+    return {"key": key}
+
+
+def update(manager: Manager, record: Dict) -> Dict:
+    fields = dict(record)
+    key = _user_key(manager, fields)
+    fields.pop("key", None)
+
+    email = fields.pop("email", None) or manager.get_user_by_key(key=key).email
+    products = parse_products(fields.pop("products", None)) or None
+
+    group_name = fields.pop("group_name", None) or fields.pop("groupName", None)
+    if group_name is not None:
+        fields["groupKey"] = manager.get_group_key(group_name)
+
+    fields = {_FIELD_NAMES.get(name, name): value for name, value in fields.items()}
+    manager.update_user(key, email=email, products=list(products) if products else None, confirm=False, **fields)
+
+    return {"key": key}
+
+
+def suspend(manager: Manager, record: Dict) -> Dict:
+    key = _user_key(manager, record)
+    manager.set_user_status(user_key=key, status="suspended")
+    return {"key": key}
+
+
+OPERATIONS: Dict[str, Callable[[Manager, Dict], Dict]] = {
+    "create": create,
+    "update": update,
+    "suspend": suspend,
+}
+
+
+# JOBS
+########################################################################################################################
+def run_job(manager: Manager, args) -> int:
+    """
+    Apply an operation to every input row on a worker pool, reporting each row's outcome as an NDJSON line
+    :return: Process exit code: 0 if every row succeeded, 1 otherwise
+    """
+    operation = OPERATIONS[args.command]
+    checkpoint = None
+    if args.checkpoint:
+        job = {"command": args.command, "input": os.path.abspath(args.input) if args.input != "-" else "-"}
+        checkpoint = Checkpoint(args.checkpoint, job=job)
+        if checkpoint.resumed and operation is create:
+            operation = functools.partial(create, resumed=True)
+
+    output = NdjsonWriter(args.output, append=checkpoint is not None and checkpoint.resumed)
+    progress = Progress(interval=args.progress_interval, skipped=checkpoint.completed if checkpoint else 0)
+    budget = RequestBudget(requests_per_second=args.rps)
+
+    # Built on the first group_name lookup, so jobs without groups never walk the groups
+    manager.enable_group_index(max_age=None)
+
+    def call(item):
+        _, record = item
+        budget.acquire()
+        return operation(manager, record)
+
+    rows = ((row, record) for row, record in enumerate(read_records(args.input, args.format))
+            if checkpoint is None or not checkpoint.is_done(row))
+
+    finished = False
+    try:
+        for result in run_bulk(call, rows, workers=args.workers):
+            row, record = result.item
+            outcome = {"row": row, "ok": result.ok}
+            if result.ok:
+                outcome.update(result.result)
+            else:
+                outcome.update(error=f"{type(result.error).__name__}: {result.error}", record=record)
+            output.write(outcome)
+
+            # Failed rows are recorded apart from successes, so they are retried when the job is run again
+            if checkpoint is not None:
+                if result.ok:
+                    checkpoint.mark(row)
+                else:
+                    checkpoint.fail(row)
+            progress.update(result.ok)
+        finished = True
+    finally:
+        output.close()
+        if checkpoint is not None:
+            # Also reached on Ctrl-C, so every success seen so far is written before exiting
+            checkpoint.finish(remove=finished and not progress.failed)
+        progress.report(final=True)
+
+    return 1 if progress.failed else 0
+
+
+def run_export(manager: Manager, args) -> int:
+    """
+    Stream every user, optionally filtered, to NDJSON
+    """
+    filter_values = dict(item.split("=", 1) for item in args.filter) or None
+    output = NdjsonWriter(args.output)
+    progress = Progress(interval=args.progress_interval)
+
+    try:
+        for user in manager.iter_users(page_size=args.page_size, filter_values=filter_values, stream=True):
+            output.write(user.to_dict())
+            progress.update(True)
+    finally:
+        output.close()
+        progress.report(final=True)
+
+    return 0
+
+
+# ARGUMENTS
+########################################################################################################################
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m gotomeeting_manager", description="Bulk GoTo user administration")
+    parser.add_argument("--config", default="./goto.creds", help="Credentials file")
+    parser.add_argument("--consumer-key", help="Defaults to $GOTO_CONSUMER_KEY")
+    parser.add_argument("--consumer-secret", help="Defaults to $GOTO_CONSUMER_SECRET")
+    parser.add_argument("--base-url", default="https://api.getgo.com")
+    parser.add_argument("--headless", action="store_true", default=None,
+                        help="Fail instead of opening a browser when the credentials need authorization")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress reports")
+    parser.add_argument("-v", "--verbose", action="store_true")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, description in (("create", "Create users"), ("update", "Update users"), ("suspend", "Suspend users")):
+        command = commands.add_parser(name, help=description)
+        command.add_argument("input", help="CSV or JSONL file, or - for stdin")
+        command.add_argument("--format", choices=("csv", "jsonl"), help="Defaults to the file extension")
+        command.add_argument("--output", default="-", help="NDJSON file receiving one result per row")
+        command.add_argument("--checkpoint", help="Progress file used to resume an interrupted job")
+        command.add_argument("--workers", type=int, default=8)
+        command.add_argument("--rps", type=float, help="Cap on rows started per second")
+
+    export = commands.add_parser("export", help="Export users to NDJSON")
+    export.add_argument("--output", default="-")
+    export.add_argument("--filter", action="append", default=[], metavar="FIELD=VALUE")
+    export.add_argument("--page-size", type=int, default=100)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    try:
+        transport = Transport(base_url=args.base_url, pool_size=max(10, getattr(args, "workers", 0)))
+        manager = Manager(consumer_key=args.consumer_key, consumer_secret=args.consumer_secret,
+                          path_to_config=args.config, transport=transport, headless=args.headless)
+    except (CredentialError, OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        return run_export(manager, args) if args.command == "export" else run_job(manager, args)
+    except (CheckpointError, OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        manager.close()
 
 
 if __name__ == "__main__":
-    conf = SharedConfig().config
-    manager = Manager(consumer_key=conf["gotomeeting"]["key"], consumer_secret=conf["gotomeeting"]["secret"])
-    # manager.create_user_in_group(firstname="Thomas",
-    #                              lastname="Scholtz",
-    #                              email="thomas@labs.epiuse.com",
-    #                              group_name="EPI-USE Labs")
-    # manager.get_user_by_email(email="thomas@labs.epiuse.com")
-    # manager.delete_user_by_key("thomas@labs.epiuse.com")
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,322 @@
+import asyncio
+import base64
+import functools
+import logging
+import os
+
+import aiohttp
+
+from typing import List, Dict, Optional, Tuple, Union
+from gotomeeting_manager.gotoexceptions import CredentialError, UserNotFoundError, GroupNotFoundError, \
+    UserExistsError, EmptyUpdateParametersError, HTTPError404
+
+from gotomeeting_manager.gotocredentials import CredentialStore, FileCredentialStore
+from gotomeeting_manager.gotofilters import Filter, compile_filter
+from gotomeeting_manager.gotojson import loads
+from gotomeeting_manager.gotolicenses import parse_license_codes, resolve_product_licenses
+from gotomeeting_manager.gotomanager import HEADLESS_MESSAGE, Manager
+from gotomeeting_manager.gotoratelimit import RateLimiter, endpoint_family
+from gotomeeting_manager.gotoresponses import UserResponse, GroupResponse
+from gotomeeting_manager.gototokens import TokenProvider
+from gotomeeting_manager.gototransport import Transport
+
+logger = logging.getLogger(__name__)
+
+# Endpoint family -> exception raised when a GET on it answers 404; other families raise HTTPError404
+_NOT_FOUND = {
+    "users": UserNotFoundError,
+    "organizers": UserNotFoundError,
+    "groups": GroupNotFoundError,
+}
+
+
+class AsyncManager:
+    """
+    asyncio counterpart of Manager.
+
+    Shares the credentials file with Manager and exposes the same users, groups and licenses surface as awaitable
+    methods. Requests go over a pooled aiohttp session and at most `max_concurrency` of them are in flight at once.
+
+    Tokens are owned by the same TokenProvider as Manager's. Refreshes run on an executor thread under the credential
+    store's lock, so coroutines, threads and other processes sharing the store never spend a refresh token twice.
+    """
+
+    def __init__(self, consumer_key: Optional[str] = None, consumer_secret: Optional[str] = None,
+                 path_to_config: str = "./goto.creds", base_url: str = "https://api.getgo.com",
+                 pool_size: int = 10, max_concurrency: int = 50, credential_store: Optional[CredentialStore] = None,
+                 rate_limiter: Optional[RateLimiter] = None, max_rate_limit_retries: int = 3,
+                 headless: Optional[bool] = None):
+
+        if consumer_key is None:
+            consumer_key = os.environ.get("GOTO_CONSUMER_KEY")
+            if consumer_key is None:
+                raise CredentialError("'Consumer Key' not specified and not set in $GOTO_CONSUMER_KEY")
+
+        if consumer_secret is None:
+            consumer_secret = os.environ.get("GOTO_CONSUMER_SECRET")
+            if consumer_secret is None:
+                raise CredentialError("'Consumer Secret' not specified and not set in $GOTO_CONSUMER_SECRET")
+
+        self._consumer_key = consumer_key
+        self._consumer_secret = consumer_secret
+        self._config_path = path_to_config
+        self._store = credential_store if credential_store is not None else FileCredentialStore(path_to_config)
+        self._base_url = base_url.rstrip("/")
+        self._pool_size = pool_size
+        self._max_concurrency = max_concurrency
+        if headless is None:
+            headless = os.environ.get("GOTO_HEADLESS", "").lower() in ("1", "true", "yes")
+        self._headless = headless
+        self._rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter.shared()
+        self._max_rate_limit_retries = max_rate_limit_retries
+
+        encoded_tokens = base64.b64encode(bytes(f"{self._consumer_key}:{self._consumer_secret}", "utf-8"))
+        self._token_headers = {
+            "Authorization": "Basic " + str(encoded_tokens, encoding="utf-8"),
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+
+        # The token endpoint is called from an executor thread, through the same provider Manager uses
+        self._token_transport = Transport(base_url=base_url, pool_size=1, rate_limiter=self._rate_limiter)
+        self._tokens = TokenProvider(transport=self._token_transport, token_headers=self._token_headers,
+                                     get_auth_code=self._get_auth_code, on_update=self._on_tokens_updated,
+                                     store=self._store, proactive_renewal=False)
+
+        self._config: Dict = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+
+        self._load_config()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._tokens.close()
+        self._token_transport.close()
+
+    # LOAD AND DUMP CONFIG
+########################################################################################################################
+    def _load_config(self):
+        config = self._store.load()
+        if config is None:
+            logger.info("No stored tokens found, running the interactive authorization")
+            self._tokens.refresh(force_cold_start=True)
+            return
+
+        self._config = config
+        self._tokens.load(config)
+
+    def _on_tokens_updated(self, tokens: Dict):
+        self._config.update(tokens)
+
+    # SESSION
+########################################################################################################################
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._pool_size, limit_per_host=self._pool_size)
+            self._session = aiohttp.ClientSession(base_url=self._base_url, connector=connector,
+                                                  headers={"Accept": "application/json"})
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._refresh_lock = asyncio.Lock()
+
+        return self._session
+
+    async def _request(self, method: str, path: str, expected_status: int = 200,
+                       authorize: bool = True, **kwargs) -> Optional[Dict]:
+        """
+        Send a request. A 401 refreshes the access token and retries the request once, like Manager.
+        """
+        session = self._get_session()
+        headers = kwargs.setdefault("headers", {})
+        stale_token = None
+
+        if authorize:
+            await self._refresh_tokens()
+            headers["Authorization"] = self._tokens.access_token
+
+        rate_limited = 0
+        while True:
+            await asyncio.sleep(self._rate_limiter.reserve(path))
+
+            async with self._semaphore:
+                async with session.request(method, path, **kwargs) as r:
+                    if self._rate_limiter.observe(path, r.status, r.headers) is not None and \
+                            rate_limited < self._max_rate_limit_retries:
+                        rate_limited += 1
+                        continue
+
+                    if r.status != 401 or not authorize or stale_token is not None:
+                        return await self._read_response(r, method, expected_status, path)
+
+            # Rejected token: coroutines that saw the same token share a single refresh
+            stale_token = headers["Authorization"]
+            await self._refresh_tokens(stale_token=stale_token)
+            headers["Authorization"] = self._tokens.access_token
+
+    @staticmethod
+    async def _read_response(r: aiohttp.ClientResponse, method: str, expected_status: int,
+                             path: str) -> Optional[Dict]:
+        if r.status == 404 and method == "GET":
+            raise _NOT_FOUND.get(endpoint_family(path), HTTPError404)(await r.text())
+
+        if r.status == 409 and method == "POST":
+            raise UserExistsError
+
+        if r.status != expected_status:
+            raise Manager._manage_exceptions(r.status)(await r.text())
+
+        if r.status == 204:
+            return None
+
+        return loads(await r.read())
+
+    def _account_url(self, resource: str) -> str:
+        return f"/admin/rest/v1/accounts/{self._config['account_key']}/{resource}"
+
+    # TOKEN API CALLS
+########################################################################################################################
+    async def _refresh_tokens(self, force_refresh: bool = False, stale_token: Optional[str] = None):
+        """
+        Renew the access token if it is due. Expiry is the TokenProvider's monotonic deadline, so the check costs a
+        clock read. Safe to await from many coroutines at once; only one of them performs the refresh while the rest
+        wait for it and reuse the new token.
+        :param force_refresh: Perform a cold start regardless of token age
+        :param stale_token: An access token the API rejected; renewed even if it has not expired yet
+        """
+        if not force_refresh and stale_token is None and self._tokens.expires_in > 0:
+            return
+
+        self._get_session()
+        if stale_token is None:
+            stale_token = self._tokens.access_token
+
+        async with self._refresh_lock:
+            if not force_refresh and self._tokens.access_token != stale_token:
+                return
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, functools.partial(self._tokens.refresh, stale_token=stale_token,
+                                                               force_cold_start=force_refresh))
+
+    def _get_auth_code(self) -> Tuple[str, str]:
+        """
+        Run the browser flow against this client's base_url. Called by the TokenProvider on an executor thread
+        :return: (auth_code, redirect_uri)
+        """
+        if self._headless:
+            raise CredentialError(HEADLESS_MESSAGE)
+
+        # The browser flow is only needed on a cold start, so its modules are imported here instead of at load time
+        from gotomeeting_manager.gotoauthreceiver import authorize
+
+        return authorize(base_url=self._base_url, client_id=self._consumer_key)
+
+    # Additional Functions
+########################################################################################################################
+    async def get_license_codes(self) -> Dict:
+        body = await self._request("GET", self._account_url("licenses"))
+
+        return parse_license_codes(body["results"])
+
+    async def get_corresponding_product_licenses(self, products: List[str]) -> List:
+        all_licenses = await self.get_license_codes()
+
+        return resolve_product_licenses(products=products, all_licenses=all_licenses)
+
+    # Users
+########################################################################################################################
+    async def get_users(self, page_size: int = 25, offset: int = 0,
+                        filter_values: Optional[Union[Dict, Filter]] = None) -> List[UserResponse]:
+
+        parameters = {
+            "pageSize": page_size,
+            "offset": offset
+        }
+
+        if filter_values is not None:
+            parameters.update({"filter": compile_filter(filter_values, resource="users")})
+
+        body = await self._request("GET", self._account_url("users"), params=parameters)
+
+        results = body.get("results", None)
+
+        if results is None:
+            raise UserNotFoundError
+
+        return [UserResponse.create_from_dict(user_data=response) for response in results]
+
+    async def create_user(self, first_name: str, last_name: str, email: str,
+                          products: Optional[List[str]] = None) -> List[UserResponse]:
+        """
+        Create a user
+        :param first_name: The user's first name
+        :param last_name: The user's last name
+        :param email: The user's email
+        :param products: Optional list containing all the products to assign to the user. Defaults to "G2M" only
+        :return:
+        """
+
+        if products is None:
+            products = ["G2M"]
+
+        licenses_to_assign = await self.get_corresponding_product_licenses(products=products)
+
+        data = {
+            "email": email,
+            "firstName": first_name,
+            "lastName": last_name,
+            "licenseKeys": licenses_to_assign
+        }
+
+        body = await self._request("POST", self._account_url("users"), json=data)
+
+        return await self.get_users(filter_values={"key": body["key"]})
+
+    async def update_user(self, user_key: str, email: str, products: Optional[List[str]] = None,
+                          **kwargs) -> List[UserResponse]:
+
+        parameters = {
+            "email": email
+        }
+
+        if products is not None:
+            licenses_to_assign = await self.get_corresponding_product_licenses(products=products)
+            parameters.update({"licenseKeys": licenses_to_assign})
+        elif not kwargs:
+            raise EmptyUpdateParametersError
+
+        parameters.update(**kwargs)
+
+        await self._request("PUT", self._account_url(f"users/{user_key}"), json=parameters)
+
+        return await self.get_users(filter_values={"key": user_key})
+
+    # GROUPS
+########################################################################################################################
+    async def get_groups(self, page_size: int = 25, offset: int = 0,
+                         filter_values: Optional[Union[Dict, Filter]] = None) -> List[GroupResponse]:
+
+        parameters = {
+            "pageSize": page_size,
+            "offset": offset
+        }
+
+        if filter_values is not None:
+            parameters.update({"filter": compile_filter(filter_values, resource="groups")})
+
+        body = await self._request("GET", self._account_url("groups"), params=parameters)
+
+        results = body.get("results", None)
+
+        if results is None:
+            raise GroupNotFoundError
+
+        return [GroupResponse.create_from_dict(group_data=response) for response in results]
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import secrets
+import threading
+import webbrowser
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from typing import Dict, Optional, Tuple
+
+from gotomeeting_manager.gotoexceptions import AuthorizationError, AuthorizationTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class PendingAuthorization:
+    """
+    An authorization waiting for the browser to be redirected back with its code.
+
+    Wait for the code with result() from a thread, or `await` the object from a coroutine. If no redirect arrives
+    within the timeout, both raise AuthorizationTimeoutError.
+    """
+
+    def __init__(self, state: str, redirect_uri: str, timeout: float):
+        self.state = state
+        self.redirect_uri = redirect_uri
+        self.timeout = timeout
+        self.future: Future = Future()
+
+        self._timer = threading.Timer(timeout, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self):
+        self.fail(AuthorizationTimeoutError(f"No authorization code received within {self.timeout:g} seconds"))
+
+    def resolve(self, code: str):
+        self._timer.cancel()
+        if not self.future.done():
+            self.future.set_result(code)
+
+    def fail(self, error: Exception):
+        self._timer.cancel()
+        if not self.future.done():
+            self.future.set_exception(error)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def add_done_callback(self, callback):
+        self.future.add_done_callback(lambda _: callback(self))
+
+    def result(self) -> str:
+        """
+        Block until the code arrives
+        :return: The authorization code
+        :raises AuthorizationTimeoutError: If the timeout passed without a redirect
+        :raises AuthorizationError: If the authorization server redirected back with an error
+        """
+        return self.future.result()
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+
+class AuthCodeReceiver:
+    """
+    Minimal loopback HTTP server that receives OAuth authorization redirects.
+
+    It listens on an ephemeral port by default, so processes that authorize at the same time do not collide. Each
+    expect() registers an authorization under a random `state`, and one receiver can serve several of them (for
+    example one per tenant) at once; the redirect's `state` tells them apart.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        :param host: Loopback address to listen on
+        :param port: Port to listen on. 0 picks a free ephemeral port
+        """
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                query = {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+                status, message = receiver._receive(query)
+
+                body = message.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.host = host
+        self.port = self._server.server_port
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, PendingAuthorization] = {}
+        self._thread = threading.Thread(target=self._server.serve_forever, name="goto-auth-receiver", daemon=True)
+        self._thread.start()
+
+    @property
+    def redirect_uri(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    def expect(self, timeout: float = 300) -> PendingAuthorization:
+        """
+        Register a new authorization. Pass its `state` and the receiver's redirect_uri in the authorize URL
+        :param timeout: Seconds to wait for the redirect
+        :return: The PendingAuthorization
+        """
+        pending = PendingAuthorization(state=secrets.token_urlsafe(16), redirect_uri=self.redirect_uri,
+                                       timeout=timeout)
+
+        with self._lock:
+            self._pending[pending.state] = pending
+
+        pending.add_done_callback(self._forget)
+        return pending
+
+    def _forget(self, pending: PendingAuthorization):
+        with self._lock:
+            self._pending.pop(pending.state, None)
+
+    def _receive(self, query: Dict[str, str]):
+        # A redirect must carry the state of a pending authorization; accepting one without it would let a third
+        # party complete the flow with their own code (login CSRF)
+        with self._lock:
+            pending = self._pending.get(query.get("state"))
+
+        if pending is None:
+            return 400, "Unknown or expired authorization request."
+
+        if "error" in query:
+            pending.fail(AuthorizationError(query.get("error_description") or query["error"]))
+            return 400, "Authorization failed. You can close this window now."
+
+        code = query.get("code")
+        if not code:
+            return 400, "The redirect did not contain an authorization code."
+
+        pending.resolve(code)
+        return 200, "Code received! You can close this window now."
+
+    def close(self):
+        """
+        Stop listening. Authorizations still pending fail with AuthorizationError
+        """
+        with self._lock:
+            pending = list(self._pending.values())
+
+        for authorization in pending:
+            authorization.fail(AuthorizationError("The authorization receiver was closed"))
+
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def begin_authorization(base_url: str, client_id: str, timeout: float = 300,
+                        receiver: Optional[AuthCodeReceiver] = None, port: int = 0,
+                        open_browser: bool = True) -> PendingAuthorization:
+    """
+    Start the browser OAuth flow without waiting for it
+    :param base_url: Scheme and host of the API the authorize URL is built on
+    :param client_id: The application's consumer key
+    :param timeout: Seconds to wait for the redirect
+    :param receiver: Receiver to register the authorization with. By default a receiver on `port` is started for
+    this authorization and stopped when it completes
+    :param port: Port of the default receiver. 0 picks a free ephemeral port
+    :param open_browser: Open the authorize URL in a browser tab. Otherwise log it
+    :return: PendingAuthorization
+    """
+    if receiver is None:
+        receiver = AuthCodeReceiver(port=port)
+        pending = receiver.expect(timeout=timeout)
+        pending.add_done_callback(lambda _: threading.Thread(target=receiver.close, daemon=True).start())
+    else:
+        pending = receiver.expect(timeout=timeout)
+
+    url = base_url.rstrip("/") + "/oauth/v2/authorize?" + urlencode({
+        "client_id": client_id,
+        "response_type": "code",
+        "redirect_uri": pending.redirect_uri,
+        "state": pending.state,
+    })
+
+    if open_browser:
+        webbrowser.open_new_tab(url)
+    else:
+        logger.warning("Open this URL to authorize: %s", url)
+
+    return pending
+
+
+def authorize(base_url: str, client_id: str, timeout: float = 300, port: int = 0) -> Tuple[str, str]:
+    """
+    Run the browser OAuth flow and wait for its code
+    :return: (auth_code, redirect_uri), as expected by TokenProvider's get_auth_code
+    """
+    pending = begin_authorization(base_url=base_url, client_id=client_id, timeout=timeout, port=port)
+
+    logger.info("Waiting for authorization code", extra={"redirect_uri": pending.redirect_uri})
+    auth_code = pending.result()
+    logger.info("Authorization code received")
+
+    return auth_code, pending.redirect_uri
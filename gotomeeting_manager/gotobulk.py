@@ -0,0 +1,86 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional
+
+
+class BulkResult(NamedTuple):
+    """
+    Outcome of one item of a bulk operation. Exactly one of `result` and `error` is set.
+    """
+    index: int
+    item: Any
+    result: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class RequestBudget:
+    """
+    Spaces out calls so that no more than `requests_per_second` start in any second, across all threads
+    """
+
+    def __init__(self, requests_per_second: Optional[float] = None):
+        self.requests_per_second = requests_per_second
+        self._interval = 1 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self._interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self._interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def run_bulk(function: Callable[[Any], Any], items: Iterable, workers: int = 8,
+             max_pending: Optional[int] = None) -> Iterator[BulkResult]:
+    """
+    Apply `function` to every item on a thread pool and yield a BulkResult per item as soon as it finishes. Items
+    are pulled from the iterable lazily, so at most `max_pending` of them are held in memory at a time.
+    :param function: Called with one item; its return value becomes BulkResult.result
+    :param items: Any iterable, consumed incrementally
+    :param workers: Number of concurrent calls
+    :param max_pending: Maximum number of submitted but unfinished items. Defaults to twice the worker count
+    :return: Iterator of BulkResult in completion order
+    """
+    if max_pending is None:
+        max_pending = workers * 2
+
+    def call(index: int, item: Any) -> BulkResult:
+        try:
+            return BulkResult(index=index, item=item, result=function(item))
+        except Exception as e:
+            return BulkResult(index=index, item=item, error=e)
+
+    iterator = enumerate(items)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        exhausted = False
+
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    index, item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(call, index, item))
+
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
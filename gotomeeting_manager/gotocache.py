@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict
+
+from typing import Any, Dict, Hashable, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+from gotomeeting_manager.gotoratelimit import endpoint_family
+
+# Endpoint family -> seconds a cached response is served without asking the API. Families without a TTL are not
+# cached; the oauth and G2M organizer endpoints are never read through the cache
+DEFAULT_TTLS: Dict[str, float] = {
+    "licenses": 300,
+    "groups": 60,
+    "users": 30,
+}
+
+# Endpoint family written to -> families whose cached reads the write may have changed
+_INVALIDATES: Dict[str, Tuple[str, ...]] = {
+    "users": ("users", "groups"),
+    "organizers": ("users", "groups"),
+    "groups": ("groups", "users"),
+    "licenses": ("licenses", "users"),
+}
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    family: str
+    size: int
+    expires_at: float
+    etag: Optional[str] = None
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+class ResponseCache:
+    """
+    LRU cache of decoded API responses, bounded by entry count and by the total size of the response bodies.
+
+    Entries are keyed by request path (which contains the account key) and parameters, and expire after the TTL of
+    their endpoint family. An expired entry that carried an ETag is kept so that it can be revalidated with
+    If-None-Match. Cached values are shared between callers, so Manager caches the undecoded response bytes and
+    decodes a fresh body on every hit.
+
+    Subclass it and override get/put/invalidate to plug in another store.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 ttls: Optional[Mapping[str, float]] = None):
+        """
+        :param max_entries: Maximum number of cached responses
+        :param max_bytes: Maximum total size of the cached response bodies
+        :param ttls: Endpoint family -> TTL in seconds, overriding DEFAULT_TTLS family by family
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(path: str, params: Optional[Mapping] = None) -> Hashable:
+        return path, tuple(sorted((params or {}).items()))
+
+    def cacheable(self, path: str) -> bool:
+        return self.ttls.get(endpoint_family(path), 0) > 0
+
+    # ENTRIES
+########################################################################################################################
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        :return: The entry for `key`, fresh or awaiting revalidation, or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry.fresh:
+                self.hits += 1
+            elif entry.etag is None:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, path: str, value: Any, size: int, etag: Optional[str] = None):
+        family = endpoint_family(path)
+        ttl = self.ttls.get(family, 0)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+
+        entry = CacheEntry(value=value, family=family, size=size, expires_at=time.monotonic() + ttl, etag=etag)
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def revalidated(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Restart the TTL of an entry the API confirmed with 304 Not Modified
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            self.revalidations += 1
+            entry = entry._replace(expires_at=time.monotonic() + self.ttls.get(entry.family, 0))
+            self._entries[key] = entry
+            return entry
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    # INVALIDATION
+########################################################################################################################
+    def invalidate(self, families: Optional[Iterable[str]] = None):
+        """
+        Drop the entries of the given endpoint families, or every entry
+        """
+        with self._lock:
+            if families is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+
+            families = set(families)
+            for key in [key for key, entry in self._entries.items() if entry.family in families]:
+                self._remove(key)
+
+    def invalidate_after_write(self, path: str):
+        """
+        Drop the entries whose content a successful write to `path` may have changed
+        """
+        self.invalidate(_INVALIDATES.get(endpoint_family(path), ()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+            }
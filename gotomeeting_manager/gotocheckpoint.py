@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+
+from typing import Dict
+
+from gotomeeting_manager.gotoexceptions import CheckpointError
+
+
+class Checkpoint:
+    """
+    Progress file of a bulk job, so a job that dies can resume where it stopped instead of replaying every row.
+
+    Rows finish out of order on a worker pool, so the file records a watermark below which every row is finished plus
+    the few finished rows above it. Rows that failed are finished too, so the watermark passes them, but they are kept
+    in a separate set and retried on resume. Up to `max_failed` failures are kept that way; past it, further failures
+    hold the watermark back and the done rows above them accumulate, so the file grows with the input again. It is
+    rewritten atomically at most every `flush_interval` seconds and by finish(); rows that were in flight when the job
+    died are replayed on resume, so operations recorded here should tolerate running twice.
+    """
+
+    def __init__(self, path: str, job: Dict, flush_interval: float = 1.0, max_failed: int = 1000):
+        """
+        :param path: Checkpoint file. Loaded if it exists
+        :param job: Description of the job (command, input, ...). Resuming a different job is refused
+        :param flush_interval: Seconds between writes of the file
+        :param max_failed: Most failed rows the watermark may pass
+        :raises CheckpointError: If the file belongs to a different job or cannot be read
+        """
+        self.path = path
+        self.job = job
+        self.flush_interval = flush_interval
+        self.max_failed = max_failed
+
+        self.watermark = 0
+        self._done = set()
+        self._failed = set()
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CheckpointError(f"Cannot read checkpoint {self.path}: {e}") from e
+
+        if state.get("job") != self.job:
+            raise CheckpointError(f"Checkpoint {self.path} belongs to a different job: {state.get('job')}")
+
+        self.watermark = state.get("watermark", 0)
+        self._done = set(state.get("done", ()))
+        self._failed = set(state.get("failed", ()))
+        self._loaded = True
+
+    @property
+    def resumed(self) -> bool:
+        """
+        Whether an earlier run of the job left this file, even if none of its rows were recorded
+        """
+        return self._loaded
+
+    @property
+    def completed(self) -> int:
+        """
+        Number of rows recorded as done
+        """
+        return self.watermark + len(self._done) - sum(1 for row in self._failed if row < self.watermark)
+
+    @property
+    def failed(self) -> int:
+        """
+        Number of failed rows that will be retried on resume
+        """
+        return len(self._failed)
+
+    def is_done(self, row: int) -> bool:
+        return row not in self._failed and (row < self.watermark or row in self._done)
+
+    def mark(self, row: int):
+        """
+        Record a row as done, and write the file if the flush interval has passed
+        """
+        with self._lock:
+            self._failed.discard(row)
+            if row >= self.watermark:
+                self._done.add(row)
+            self._advance()
+
+    def fail(self, row: int):
+        """
+        Record a row as failed, so it is retried on resume without holding the watermark back
+        """
+        with self._lock:
+            if row in self._failed or len(self._failed) >= self.max_failed:
+                return
+            self._failed.add(row)
+            self._advance()
+
+    def _advance(self):
+        while self.watermark in self._done or self.watermark in self._failed:
+            self._done.discard(self.watermark)
+            self.watermark += 1
+
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self._write()
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def _write(self):
+        state = {"job": self.job, "watermark": self.watermark, "done": sorted(self._done),
+                 "failed": sorted(self._failed)}
+        temporary = f"{self.path}.tmp"
+
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+        self._flushed_at = time.monotonic()
+
+    def finish(self, remove: bool = True):
+        """
+        Mark the job as finished: remove the file, or write it a last time if `remove` is False
+        """
+        with self._lock:
+            if remove:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+            else:
+                self._write()
+
@@ -0,0 +1,190 @@
+import abc
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import msgpack
+
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialStore(abc.ABC):
+    """
+    Where a Manager persists its OAuth tokens.
+
+    Several Managers, possibly in different processes, may share one store. Token refreshes take the store's
+    exclusive lock, and `changed()` lets a Manager notice that another one already refreshed so it can adopt the new
+    tokens instead of requesting its own.
+    """
+
+    @abc.abstractmethod
+    def load(self) -> Optional[Dict]:
+        """
+        :return: The stored config, or None if nothing has been stored yet
+        """
+
+    @abc.abstractmethod
+    def save(self, config: Dict):
+        pass
+
+    def changed(self) -> bool:
+        """
+        :return: Whether the store was written by someone else since this instance last loaded or saved it
+        """
+        return False
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Hold the store's exclusive lock for a read-refresh-write cycle
+        """
+        yield
+
+
+class FileCredentialStore(CredentialStore):
+    """
+    msgpack file store. Writes go to a temporary file in the same directory which is then renamed over the original,
+    so readers never see a truncated file, and refreshes are serialised with an advisory lock on a sidecar
+    `.lock` file. Pointing `path` at a tmpfs such as /dev/shm keeps the store in shared memory.
+    """
+
+    def __init__(self, path: str = "./goto.creds"):
+        self.path = Path(path)
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+        self._version: Optional[Tuple[int, int]] = None
+
+    @staticmethod
+    def _file_version(stat: os.stat_result) -> Tuple[int, int]:
+        # Every save renames a new file into place, so the inode changes even if the mtime resolution is coarse
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _stat_version(self) -> Optional[Tuple[int, int]]:
+        try:
+            return self._file_version(os.stat(self.path))
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> Optional[Dict]:
+        try:
+            with open(self.path, "rb") as file:
+                self._version = self._file_version(os.fstat(file.fileno()))
+                return msgpack.unpack(stream=file, raw=False)
+        except FileNotFoundError:
+            return None
+        except (ValueError, msgpack.UnpackException):
+            logger.warning("Credential file %s is corrupt, ignoring it", self.path)
+            return None
+
+    def save(self, config: Dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=self.path.name + ".", suffix=".tmp", dir=self.path.parent)
+
+        try:
+            with os.fdopen(fd, "wb") as file:
+                msgpack.pack(o=config, stream=file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        self._version = self._stat_version()
+
+    def changed(self) -> bool:
+        return self._stat_version() != self._version
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        self._lock_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(self._lock_path, "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:  # pragma: no cover - Windows
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:  # pragma: no cover - Windows
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SQLiteCredentialStore(CredentialStore):
+    """
+    SQLite store. Several named credential sets can live in one database file, and refreshes are serialised with an
+    immediate write transaction.
+    """
+
+    def __init__(self, path: str = "./goto.creds.sqlite", name: str = "default"):
+        self.path = path
+        self.name = name
+        self._version: Optional[int] = None
+
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS credentials "
+                                 "(name TEXT PRIMARY KEY, data BLOB NOT NULL, version INTEGER NOT NULL)")
+        self._thread_lock = threading.RLock()
+        self._in_transaction = False
+
+    def _current_version(self) -> Optional[int]:
+        row = self._connection.execute("SELECT version FROM credentials WHERE name = ?", (self.name,)).fetchone()
+        return row[0] if row is not None else None
+
+    def load(self) -> Optional[Dict]:
+        with self._thread_lock:
+            row = self._connection.execute("SELECT data, version FROM credentials WHERE name = ?",
+                                           (self.name,)).fetchone()
+            if row is None:
+                return None
+
+            self._version = row[1]
+            return msgpack.unpackb(row[0], raw=False)
+
+    def save(self, config: Dict):
+        with self._thread_lock:
+            version = (self._current_version() or 0) + 1
+            self._connection.execute("INSERT OR REPLACE INTO credentials (name, data, version) VALUES (?, ?, ?)",
+                                     (self.name, msgpack.packb(config), version))
+            self._version = version
+
+    def changed(self) -> bool:
+        with self._thread_lock:
+            return self._current_version() != self._version
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        with self._thread_lock:
+            if self._in_transaction:
+                yield
+                return
+
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._in_transaction = True
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            else:
+                self._connection.execute("COMMIT")
+            finally:
+                self._in_transaction = False
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,142 @@
+import threading
+import time
+
+from typing import Dict, Iterator, List, Optional, TYPE_CHECKING
+
+from gotomeeting_manager.gotogroups import GroupIndex
+from gotomeeting_manager.gotoresponses import UserResponse, GroupResponse
+
+if TYPE_CHECKING:
+    from gotomeeting_manager.gotomanager import Manager
+
+
+class Directory:
+    """
+    In-memory snapshot of the account's users and groups with hash indexes by user key, lowercase email and group
+    key. Groups are held in a GroupIndex, refreshed together with the users.
+
+    The snapshot is rebuilt from the paginated users and groups endpoints when it is older than `max_age` seconds
+    (on the next lookup), or explicitly with refresh(). Writes made through the Manager keep it up to date in between.
+    """
+
+    def __init__(self, manager: "Manager", max_age: Optional[float] = 300, page_size: int = 100,
+                 groups: Optional[GroupIndex] = None):
+        """
+        :param manager: Manager used to fetch the snapshot
+        :param max_age: Seconds after which the next lookup rebuilds the snapshot. None never rebuilds automatically
+        :param page_size: Page size used while walking users and groups
+        :param groups: GroupIndex to keep up to date with the snapshot, e.g. the Manager's. Defaults to a new one
+        """
+        self._manager = manager
+        self.max_age = max_age
+        self.page_size = page_size
+
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+
+        self._by_key: Dict[str, UserResponse] = {}
+        self._by_email: Dict[str, UserResponse] = {}
+        self._by_group: Dict[str, Dict[str, UserResponse]] = {}
+        self.groups = groups if groups is not None else GroupIndex(manager=manager, max_age=None, page_size=page_size)
+
+    # LOADING
+########################################################################################################################
+    def refresh(self):
+        """
+        Rebuild the snapshot from the API. Lookups keep using the previous snapshot until the new one is complete.
+        """
+        # Compact the long-lived snapshot so it does not keep every raw API dict alive
+        users = [user.compact() for user in self._manager.iter_users(page_size=self.page_size)]
+        self.groups.refresh()
+
+        by_key, by_email, by_group = {}, {}, {}
+        for user in users:
+            self._index(user, by_key, by_email, by_group)
+
+        with self._lock:
+            self._by_key, self._by_email, self._by_group = by_key, by_email, by_group
+            self._loaded_at = time.monotonic()
+
+    @property
+    def age(self) -> Optional[float]:
+        """
+        Seconds since the snapshot was built, or None if it has not been built yet
+        """
+        return None if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    def _is_stale(self) -> bool:
+        age = self.age
+        return age is None or (self.max_age is not None and age >= self.max_age)
+
+    def _ensure_fresh(self):
+        if not self._is_stale():
+            return
+
+        # Threads arriving while a rebuild is running wait for it instead of starting their own
+        with self._refresh_lock:
+            if self._is_stale():
+                self.refresh()
+
+    @staticmethod
+    def _index(user: UserResponse, by_key: Dict, by_email: Dict, by_group: Dict):
+        by_key[user.key] = user
+        if user.email is not None:
+            by_email[user.email.lower()] = user
+        if user.group_key is not None:
+            by_group.setdefault(user.group_key, {})[user.key] = user
+
+    def _unindex(self, user: UserResponse):
+        self._by_key.pop(user.key, None)
+        if user.email is not None and self._by_email.get(user.email.lower()) is user:
+            del self._by_email[user.email.lower()]
+        if user.group_key is not None:
+            self._by_group.get(user.group_key, {}).pop(user.key, None)
+
+    # UPDATES
+########################################################################################################################
+    def upsert(self, user: UserResponse):
+        """
+        Add or replace a single user without rebuilding the snapshot
+        """
+        with self._lock:
+            previous = self._by_key.get(user.key)
+            if previous is not None:
+                self._unindex(previous)
+            self._index(user, self._by_key, self._by_email, self._by_group)
+
+    def remove(self, user_key: str):
+        with self._lock:
+            previous = self._by_key.get(user_key)
+            if previous is not None:
+                self._unindex(previous)
+
+    # LOOKUPS
+########################################################################################################################
+    def by_key(self, user_key: str) -> Optional[UserResponse]:
+        self._ensure_fresh()
+        return self._by_key.get(user_key)
+
+    def by_email(self, email: str) -> Optional[UserResponse]:
+        self._ensure_fresh()
+        return self._by_email.get(email.lower())
+
+    def in_group(self, group_key: str) -> List[UserResponse]:
+        self._ensure_fresh()
+        return list(self._by_group.get(group_key, {}).values())
+
+    def group_key(self, group_name: str) -> Optional[str]:
+        self._ensure_fresh()
+        return self.groups.group_key(group_name)
+
+    def group(self, group_key: str) -> Optional[GroupResponse]:
+        self._ensure_fresh()
+        return self.groups.group(group_key)
+
+    def __len__(self) -> int:
+        self._ensure_fresh()
+        return len(self._by_key)
+
+    def __iter__(self) -> Iterator[UserResponse]:
+        self._ensure_fresh()
+        return iter(list(self._by_key.values()))
@@ -6,6 +6,10 @@ class HTTPError400(HTTPError):
     pass
 
 
+class HTTPError401(HTTPError):
+    pass
+
+
 class HTTPError403(HTTPError):
     pass
 
@@ -18,6 +22,10 @@ class HTTPError409(HTTPError):
     pass
 
 
+class HTTPError429(HTTPError):
+    pass
+
+
 class HTTPError500(HTTPError):
     pass
 
@@ -34,10 +42,22 @@ class GroupNotFoundError(Exception):
     pass
 
 
+class CircuitOpenError(Exception):
+    pass
+
+
 class CredentialError(Exception):
     pass
 
 
+class AuthorizationError(CredentialError):
+    pass
+
+
+class AuthorizationTimeoutError(AuthorizationError):
+    pass
+
+
 class InvalidFilterError(Exception):
     pass
 
@@ -48,3 +68,29 @@ class UserExistsError(Exception):
 
 class EmptyUpdateParametersError(Exception):
     pass
+
+
+class ReconcileError(Exception):
+    pass
+
+
+class DependencyFailedError(ReconcileError):
+    pass
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def exception_for_status(code: int) -> type:
+    exceptions = {
+        400: HTTPError400,
+        401: HTTPError401,
+        403: HTTPError403,
+        404: HTTPError404,
+        409: HTTPError409,
+        429: HTTPError429,
+        500: HTTPError500,
+        502: HTTPError502,
+    }
+    return exceptions.get(code, HTTPError)
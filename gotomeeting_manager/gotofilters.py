@@ -0,0 +1,195 @@
+import abc
+import re
+from urllib.parse import quote
+
+from typing import Iterable, Iterator, List, Mapping, Optional, Sequence, Union
+
+from gotomeeting_manager.gotoexceptions import InvalidFilterError
+
+# Fields the admin API can filter on, per resource
+USER_FIELDS = frozenset({"key", "email", "firstName", "lastName", "status", "groupKey", "groupName", "locale",
+                         "admin", "licenseKeys", "products"})
+GROUP_FIELDS = frozenset({"groupKey", "groupName", "key", "name"})
+
+_FIELDS = {"users": USER_FIELDS, "groups": GROUP_FIELDS}
+
+# Filter values are matched as regular expressions, so literal values have their metacharacters escaped
+_REGEX_SPECIAL = re.compile(r"([\\.^$|?*+()\[\]{}])")
+_CONTROL = re.compile(r"[\x00-\x1f\x7f]")
+
+
+def escape_value(value) -> str:
+    """
+    Escape a literal value for use inside a quoted filter term
+    :raises InvalidFilterError: For values that cannot be expressed in a filter
+    """
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    elif not isinstance(value, (str, int)):
+        raise InvalidFilterError(f"Filter values must be strings, numbers or booleans, not {type(value).__name__}")
+
+    value = str(value)
+    if _CONTROL.search(value):
+        raise InvalidFilterError(f"Filter value {value!r} contains control characters")
+
+    return _REGEX_SPECIAL.sub(r"\\\1", value).replace('"', '\\"')
+
+
+class Filter(abc.ABC):
+    """
+    A filter expression node. Combine nodes with & (all must match) and | (any may match); render() produces the
+    API's filter syntax.
+    """
+
+    @abc.abstractmethod
+    def render(self) -> str:
+        pass
+
+    @abc.abstractmethod
+    def fields(self) -> Iterator[str]:
+        pass
+
+    def __and__(self, other: "Filter") -> "Filter":
+        return AllOf(self, other)
+
+    def __or__(self, other: "Filter") -> "Filter":
+        return AnyOf(self, other)
+
+    def __str__(self) -> str:
+        return self.render()
+
+
+class Term(Filter):
+    """
+    field equals value; case-insensitively unless case_sensitive is set
+    """
+
+    def __init__(self, field: str, value, case_sensitive: bool = False):
+        if not isinstance(field, str) or not re.fullmatch(r"[A-Za-z][A-Za-z0-9_]*", field):
+            raise InvalidFilterError(f"Invalid filter field {field!r}")
+
+        self.field = field
+        self.value = value
+        self.case_sensitive = case_sensitive
+        self._escaped = escape_value(value)
+
+    def render(self) -> str:
+        prefix = "" if self.case_sensitive else "(?i)"
+        return f'({self.field}="{prefix}{self._escaped}")'
+
+    def fields(self) -> Iterator[str]:
+        yield self.field
+
+
+class _Group(Filter):
+    operator = ""
+
+    def __init__(self, *filters: Filter):
+        if not filters:
+            raise InvalidFilterError("A filter group needs at least one term")
+        for node in filters:
+            if not isinstance(node, Filter):
+                raise InvalidFilterError(f"Expected a Filter, got {type(node).__name__}")
+
+        # Flatten nested groups of the same kind so no redundant parentheses are produced
+        self.filters: List[Filter] = []
+        for node in filters:
+            self.filters.extend(node.filters if type(node) is type(self) else [node])
+
+    def render(self) -> str:
+        rendered = [node.render() if isinstance(node, Term) or len(self.filters) == 1 else f"({node.render()})"
+                    for node in self.filters]
+        return f" {self.operator} ".join(rendered)
+
+    def fields(self) -> Iterator[str]:
+        for node in self.filters:
+            yield from node.fields()
+
+
+class AllOf(_Group):
+    operator = "&"
+
+
+class AnyOf(_Group):
+    operator = "|"
+
+
+def eq(field: str, value, case_sensitive: bool = False) -> Term:
+    return Term(field, value, case_sensitive=case_sensitive)
+
+
+def one_of(field: str, values: Iterable, case_sensitive: bool = False) -> Filter:
+    """
+    IN-list: field equals any of the values
+    """
+    terms = [Term(field, value, case_sensitive=case_sensitive) for value in dict.fromkeys(values)]
+    if not terms:
+        raise InvalidFilterError(f"Empty list of values for {field!r}")
+    return AnyOf(*terms)
+
+
+def from_dict(filter_values: Mapping) -> Filter:
+    """
+    Build a filter from a field -> value mapping: fields are ANDed and matched case-insensitively, and a list, tuple
+    or set value matches any of its items
+    """
+    if not filter_values:
+        raise InvalidFilterError("Empty filter")
+
+    return AllOf(*[one_of(field, value) if isinstance(value, (list, tuple, set, frozenset)) else eq(field, value)
+                 for field, value in filter_values.items()])
+
+
+def compile_filter(filter_values: Union[Mapping, Filter, str], resource: Optional[str] = None) -> str:
+    """
+    Render a filter for the `filter` query parameter
+    :param filter_values: A field -> value mapping, a Filter, or an already rendered expression (passed through)
+    :param resource: "users" or "groups" to validate the field names against that resource
+    :raises InvalidFilterError: For unknown fields, empty filters or values that cannot be expressed
+    """
+    if isinstance(filter_values, str):
+        if not filter_values.strip():
+            raise InvalidFilterError("Empty filter")
+        return filter_values
+
+    node = filter_values if isinstance(filter_values, Filter) else from_dict(filter_values)
+
+    known = _FIELDS.get(resource)
+    if known is not None:
+        unknown = sorted(set(node.fields()) - known)
+        if unknown:
+            raise InvalidFilterError(f"Cannot filter {resource} on {', '.join(unknown)}")
+
+    return node.render()
+
+
+def encoded_length(expression: str) -> int:
+    return len(quote(expression, safe=""))
+
+
+def pack_one_of(field: str, values: Sequence, max_values: int = 50, max_length: int = 1800,
+                case_sensitive: bool = False) -> Iterator[List]:
+    """
+    Split values into chunks whose IN-list filter stays within max_values terms and max_length URL-encoded
+    characters, so a lookup of many values needs as few requests as the server's query-length limit allows
+    :return: Iterator of value chunks
+    """
+    separator = encoded_length(" | ")
+    chunk, length = [], 0
+
+    for value in values:
+        term = encoded_length(Term(field, value, case_sensitive=case_sensitive).render())
+        if term > max_length:
+            raise InvalidFilterError(f"Filter value {value!r} alone exceeds the {max_length} character limit")
+
+        added = term if not chunk else term + separator
+        if chunk and (len(chunk) >= max_values or length + added > max_length):
+            yield chunk
+            chunk, length, added = [], 0, term
+
+        chunk.append(value)
+        length += added
+
+    if chunk:
+        yield chunk
+
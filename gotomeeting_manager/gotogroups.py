@@ -0,0 +1,187 @@
+import threading
+import time
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, TYPE_CHECKING
+
+from gotomeeting_manager.gotoresponses import GroupResponse
+
+if TYPE_CHECKING:
+    from gotomeeting_manager.gotomanager import Manager
+
+
+class GroupIndex:
+    """
+    In-memory index of the account's groups: group name -> group key, group key -> GroupResponse, and the inverted
+    user key -> group keys map built from each group's user keys.
+
+    The index is built by walking every groups page once. Later refreshes (on the next lookup once it is older than
+    `max_age` seconds, or explicitly with refresh()) re-index only the groups that were added, renamed, removed or
+    whose membership changed, so resolving group names and answering membership queries stays in memory.
+    """
+
+    def __init__(self, manager: "Manager", max_age: Optional[float] = 300, page_size: int = 100):
+        """
+        :param manager: Manager used to walk the groups
+        :param max_age: Seconds after which the next lookup refreshes the index. None never refreshes automatically
+        :param page_size: Page size used while walking groups
+        """
+        self._manager = manager
+        self.max_age = max_age
+        self.page_size = page_size
+
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+
+        self._groups: Dict[str, GroupResponse] = {}
+        self._keys_by_name: Dict[str, str] = {}
+        self._members: Dict[str, FrozenSet[str]] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+
+    # LOADING
+########################################################################################################################
+    def refresh(self) -> Dict[str, int]:
+        """
+        Walk every groups page and apply the differences to the index
+        :return: Number of groups "added", "updated" and "removed"
+        """
+        groups = {group.key: group.compact() for group in self._manager.iter_groups(page_size=self.page_size)}
+        changes = {"added": 0, "updated": 0, "removed": 0}
+
+        with self._lock:
+            for group_key in set(self._groups) - set(groups):
+                self._unindex(group_key)
+                changes["removed"] += 1
+
+            for group_key, group in groups.items():
+                members = frozenset(group.user_keys or ())
+                previous = self._groups.get(group_key)
+                if previous is not None:
+                    if previous.name == group.name and self._members.get(group_key) == members:
+                        continue
+                    self._unindex(group_key)
+                    changes["updated"] += 1
+                else:
+                    changes["added"] += 1
+                self._index(group, members)
+
+            self._loaded_at = time.monotonic()
+
+        return changes
+
+    @property
+    def age(self) -> Optional[float]:
+        """
+        Seconds since the last refresh, or None if the index has not been built yet
+        """
+        return None if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    def _is_stale(self) -> bool:
+        age = self.age
+        return age is None or (self.max_age is not None and age >= self.max_age)
+
+    def _ensure_fresh(self):
+        if not self._is_stale():
+            return
+
+        # Threads arriving while a refresh is running wait for it instead of starting their own
+        with self._refresh_lock:
+            if self._is_stale():
+                self.refresh()
+
+    def _index(self, group: GroupResponse, members: FrozenSet[str]):
+        self._groups[group.key] = group
+        if group.name is not None:
+            self._keys_by_name[group.name] = group.key
+        self._members[group.key] = members
+        for user_key in members:
+            self._by_user.setdefault(user_key, set()).add(group.key)
+
+    def _unindex(self, group_key: str):
+        group = self._groups.pop(group_key, None)
+        if group is not None and self._keys_by_name.get(group.name) == group_key:
+            del self._keys_by_name[group.name]
+
+        for user_key in self._members.pop(group_key, ()):
+            group_keys = self._by_user.get(user_key)
+            if group_keys is not None:
+                group_keys.discard(group_key)
+                if not group_keys:
+                    del self._by_user[user_key]
+
+    # UPDATES
+########################################################################################################################
+    def upsert(self, group: GroupResponse):
+        """
+        Add or replace a single group without walking every page
+        """
+        with self._lock:
+            self._unindex(group.key)
+            self._index(group, frozenset(group.user_keys or ()))
+
+    def remove(self, group_key: str):
+        with self._lock:
+            self._unindex(group_key)
+
+    def add_member(self, group_key: str, user_key: str):
+        """
+        Record a user added to a group through the Manager, until the next refresh reads it back
+        """
+        with self._lock:
+            if group_key not in self._groups:
+                return
+            self._members[group_key] = self._members[group_key] | {user_key}
+            self._by_user.setdefault(user_key, set()).add(group_key)
+
+    # LOOKUPS
+########################################################################################################################
+    def group_key(self, group_name: str) -> Optional[str]:
+        self._ensure_fresh()
+        with self._lock:
+            return self._keys_by_name.get(group_name)
+
+    def group(self, group_key: str) -> Optional[GroupResponse]:
+        self._ensure_fresh()
+        with self._lock:
+            return self._groups.get(group_key)
+
+    def by_name(self, group_name: str) -> Optional[GroupResponse]:
+        self._ensure_fresh()
+        with self._lock:
+            group_key = self._keys_by_name.get(group_name)
+            return self._groups.get(group_key) if group_key is not None else None
+
+    def members(self, group_key: str) -> FrozenSet[str]:
+        """
+        :return: Keys of the users in the group
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return self._members.get(group_key, frozenset())
+
+    def is_member(self, user_key: str, group_key: str) -> bool:
+        self._ensure_fresh()
+        with self._lock:
+            return group_key in self._by_user.get(user_key, ())
+
+    def groups_of(self, user_key: str) -> List[GroupResponse]:
+        self._ensure_fresh()
+        with self._lock:
+            return [self._groups[group_key] for group_key in self._by_user.get(user_key, ())]
+
+    def groups_of_users(self, user_keys: Iterable[str]) -> Dict[str, List[GroupResponse]]:
+        """
+        :return: Dict of every user key to the groups it belongs to
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return {user_key: [self._groups[group_key] for group_key in self._by_user.get(user_key, ())]
+                    for user_key in user_keys}
+
+    def __len__(self) -> int:
+        self._ensure_fresh()
+        return len(self._groups)
+
+    def __contains__(self, group_key: str) -> bool:
+        self._ensure_fresh()
+        return group_key in self._groups
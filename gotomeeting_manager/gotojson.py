@@ -0,0 +1,139 @@
+import codecs
+import json
+
+from typing import Any, Dict, Iterable, Iterator
+
+import requests
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_CONTINUATION = "0123456789.eE+-"
+
+
+def loads(data: bytes) -> Any:
+    """
+    Parse a JSON document with the fastest available backend (orjson when installed, otherwise the standard library)
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode(response: requests.Response) -> Any:
+    """
+    Parse a response body exactly once. Callers should keep the result rather than calling response.json() again.
+    """
+    return loads(response.content)
+
+
+class ResultsStream:
+    """
+    Incremental decoder for a JSON object whose `key` member is an array, such as the `results` of a page.
+
+    Iterating yields the array's items one by one as soon as their bytes have arrived, so parsing overlaps the
+    transfer of the rest of the body. The object's other members are available in `fields` once iteration is done.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], key: str = "results"):
+        self.key = key
+        self.fields: Dict[str, Any] = {}
+        self.count = 0
+
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    # BUFFER
+########################################################################################################################
+    def _read_more(self):
+        if self._eof:
+            raise json.JSONDecodeError("Unexpected end of JSON body", self._buffer, self._position)
+
+        # Drop what has already been consumed before growing the buffer
+        self._buffer = self._buffer[self._position:]
+        self._position = 0
+
+        try:
+            chunk = next(self._chunks)
+            self._buffer += self._utf8.decode(chunk)
+        except StopIteration:
+            self._buffer += self._utf8.decode(b"", final=True)
+            self._eof = True
+
+    def _peek(self) -> str:
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in _WHITESPACE:
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            self._read_more()
+
+    def _expect(self, characters: str) -> str:
+        character = self._peek()
+        if character not in characters:
+            raise json.JSONDecodeError(f"Expected one of {characters!r}", self._buffer, self._position)
+        self._position += 1
+        return character
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._read_more()
+                continue
+
+            # A number cut by a chunk boundary ("3." of "3.5") still decodes; wait until it is terminated
+            if not self._eof and (end == len(self._buffer) or self._buffer[end] in _NUMBER_CONTINUATION):
+                self._read_more()
+                continue
+
+            self._position = end
+            return value
+
+    # PARSING
+########################################################################################################################
+    def __iter__(self) -> Iterator[Any]:
+        self._expect("{")
+        if self._peek() == "}":
+            self._position += 1
+            return
+
+        while True:
+            name = self._value()
+            self._expect(":")
+
+            if name == self.key and self._peek() == "[":
+                self._position += 1
+                if self._peek() == "]":
+                    self._position += 1
+                else:
+                    while True:
+                        item = self._value()
+                        self.count += 1
+                        yield item
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self.fields[name] = self._value()
+
+            if self._expect(",}") == "}":
+                return
+
+
+def stream_results(response: requests.Response, key: str = "results", chunk_size: int = 64 * 1024) -> ResultsStream:
+    """
+    Stream the items of a response's `key` array while the body is still downloading. The request must have been
+    sent with stream=True.
+    """
+    return ResultsStream(response.iter_content(chunk_size=chunk_size), key=key)
@@ -0,0 +1,145 @@
+import threading
+import time
+
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional
+
+
+def parse_license_codes(results: List[Dict]) -> Dict[str, str]:
+    """
+    Build a product -> license key map from the results of the licenses endpoint
+    """
+    license_dict = {}
+
+    for license_type in results:
+        # Bundled licenses also list G2M; key them by the product they add on top of it
+        products = [product for product in license_type["products"] if product != "G2M"] \
+            if len(license_type["products"]) == 2 else license_type["products"]
+        license_dict.update({products[0]: license_type["key"]})
+
+    return license_dict
+
+
+def granted_products(products: Iterable[str]) -> FrozenSet[str]:
+    """
+    The products a user ends up with: webinar and training licenses include meetings, so the API reports G2M
+    alongside G2W or G2T even when it was not asked for
+    """
+    granted = frozenset(products)
+    if granted & {"G2T", "G2W"}:
+        granted |= {"G2M"}
+    return granted
+
+
+def resolve_product_licenses(products: List[str], all_licenses: Dict[str, str]) -> List[str]:
+    """
+    Map a list of products onto the license keys that grant them
+    """
+    invalid_product_flag = False
+
+    for product in products:
+        if product not in all_licenses.keys():
+            invalid_product_flag = True
+
+    assert invalid_product_flag is False, "Invalid product specified, or no licenses for specified product exist"
+
+    if ("G2T" in products) or ("G2W" in products):
+        products = [product for product in products if product != "G2M"]
+
+    product_licenses = [all_licenses[product] for product in products]
+
+    return product_licenses
+
+
+class LicenseCatalog:
+    """
+    Time-limited cache of the account's product -> license key map.
+
+    Entries younger than `ttl` seconds are served from memory. Once an entry is within `refresh_ahead` seconds of
+    expiring, the next read triggers a single background refresh and keeps serving the current map meanwhile. Reads
+    after expiry (or after invalidate()) fetch synchronously.
+    """
+
+    def __init__(self, fetch: Callable[[], Dict[str, str]], ttl: float = 3600, refresh_ahead: float = 300):
+        """
+        :param fetch: Callable returning a fresh product -> license key map
+        :param ttl: Seconds a fetched map stays valid. 0 disables caching
+        :param refresh_ahead: Seconds before expiry at which a background refresh starts
+        """
+        self._fetch = fetch
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+
+        self._licenses: Optional[Dict[str, str]] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self) -> Dict[str, str]:
+        """
+        :return: The product -> license key map, fetched if missing or expired
+        """
+        licenses = self._licenses
+        age = time.monotonic() - self._fetched_at
+
+        if licenses is None or age >= self.ttl:
+            return self._refresh()
+
+        if age >= self.ttl - self.refresh_ahead:
+            self._refresh_in_background()
+
+        return licenses
+
+    def resolve(self, products: List[str]) -> List[str]:
+        """
+        Map a list of products onto the license keys that grant them
+        :param products: Product codes, e.g. ["G2M", "G2W"]
+        :return: List of license keys
+        """
+        return resolve_product_licenses(products=products, all_licenses=self.get())
+
+    def refresh(self) -> Dict[str, str]:
+        """
+        Fetch the map now, regardless of its age
+        """
+        with self._lock:
+            return self._store(self._fetch())
+
+    def invalidate(self):
+        """
+        Drop the cached map so the next read fetches it again
+        """
+        with self._lock:
+            self._licenses = None
+            self._fetched_at = 0.0
+
+    def _refresh(self) -> Dict[str, str]:
+        with self._lock:
+            # Another thread may have refreshed while this one waited for the lock
+            if self._licenses is not None and time.monotonic() - self._fetched_at < self.ttl:
+                return self._licenses
+
+            return self._store(self._fetch())
+
+    def _store(self, licenses: Dict[str, str]) -> Dict[str, str]:
+        self._licenses = licenses
+        self._fetched_at = time.monotonic()
+        return licenses
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                licenses = self._fetch()
+                with self._lock:
+                    self._store(licenses)
+            except Exception:
+                # The foreground path fetches synchronously once the entry actually expires
+                pass
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
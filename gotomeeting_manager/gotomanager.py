@@ -1,36 +1,65 @@
 import requests
-import msgpack
-from pathlib import Path
-import datetime
 import base64
-from queue import Queue
+import logging
+from pathlib import Path
 import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
-from flask import Flask, escape, request
-import webbrowser
-
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, Union, TYPE_CHECKING
 from gotomeeting_manager.gotoexceptions import CredentialError, HTTPError400, HTTPError403, HTTPError404, \
     HTTPError409, HTTPError500, HTTPError502, UserNotFoundError, GroupNotFoundError, UserExistsError, \
-    EmptyUpdateParametersError
-
-from gotomeeting_manager.goto_auth_server import AuthServerThread
-from gotomeeting_manager.gotoresponses import UserResponse, GroupResponse
+    EmptyUpdateParametersError, InvalidFilterError, exception_for_status
+
+from gotomeeting_manager.gotoresponses import UserResponse, GroupResponse, LazyUserResponse
+from gotomeeting_manager.gotocredentials import CredentialStore, FileCredentialStore
+from gotomeeting_manager.gototokens import TokenProvider
+from gotomeeting_manager.gotodirectory import Directory
+from gotomeeting_manager.gotogroups import GroupIndex
+from gotomeeting_manager.gotoreconcile import DesiredUser, Plan, Reconciler
+from gotomeeting_manager.gotomirror import DirectoryMirror
+from gotomeeting_manager.gotobulk import BulkResult, RequestBudget, run_bulk
+from gotomeeting_manager.gotolicenses import LicenseCatalog, parse_license_codes, resolve_product_licenses
+from gotomeeting_manager.gototransport import Transport
+from gotomeeting_manager.gotojson import decode, loads, stream_results
+from gotomeeting_manager.gotoratelimit import RateLimiter
+from gotomeeting_manager.gotoretry import RetryPolicy
+from gotomeeting_manager.gotosingleflight import SingleFlight
+from gotomeeting_manager.gotocache import ResponseCache
+from gotomeeting_manager.gotometrics import Instrumentation, MetricsCollector, RequestEvent, endpoint_name
+from gotomeeting_manager.gotofilters import Filter, compile_filter, one_of, pack_one_of
+
+if TYPE_CHECKING:
+    from gotomeeting_manager.gotoauthreceiver import AuthCodeReceiver, PendingAuthorization
+
+logger = logging.getLogger(__name__)
+
+HEADLESS_MESSAGE = "No usable tokens in the credential store and interactive authorization is disabled (headless mode)"
+
+
+class PageTiming(NamedTuple):
+    offset: int
+    attempt: int
+    elapsed: float
+    count: int
+    error: Optional[Exception] = None
 
 
 class Manager:
 
-    _config = {
-        "organizer_key": str,
-        "account_key": str,
-        "access_token": str,
-        "refresh_token": str,
-        "last_refreshed": str,
-    }
+    # Persisted fields: organizer_key, account_key, access_token, refresh_token, last_refreshed, expires_in,
+    # refresh_token_age
+    _config: Dict
     _config_path: str
 
     def __init__(self, consumer_key: Optional[str] = None, consumer_secret: Optional[str] = None,
-                 path_to_config: str = "./goto.creds"):
+                 path_to_config: str = "./goto.creds", transport: Optional[Transport] = None, pool_size: int = 10,
+                 license_ttl: float = 3600, proactive_token_renewal: bool = True,
+                 credential_store: Optional[CredentialStore] = None, rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None, coalesce_requests: bool = True,
+                 response_cache: Optional[ResponseCache] = None, headless: Optional[bool] = None,
+                 redirect_port: int = 0, authorization_timeout: float = 300,
+                 instrumentation: Optional[Instrumentation] = None):
 
         if consumer_key is None:
             consumer_key = os.environ.get("GOTO_CONSUMER_KEY")
@@ -42,258 +71,523 @@ class Manager:
             if consumer_secret is None:
                 raise CredentialError("'Consumer Secret' not specified and not set in $GOTO_CONSUMER_SECRET")
 
+        if headless is None:
+            headless = os.environ.get("GOTO_HEADLESS", "").lower() in ("1", "true", "yes")
+
         self._consumer_key = consumer_key
         self._consumer_secret = consumer_secret
         self._config_path = path_to_config
+        self._headless = headless
+        self._redirect_port = redirect_port
+        self._authorization_timeout = authorization_timeout
+
+        encoded_tokens = base64.b64encode(bytes(f"{self._consumer_key}:{self._consumer_secret}", "utf-8"))
+        self._token_headers = {
+            "Authorization": "Basic " + str(encoded_tokens, encoding="utf-8"),
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+
+        if transport is None:
+            transport = Transport(pool_size=pool_size, rate_limiter=rate_limiter, retry_policy=retry_policy)
+        self._transport = transport
+        self._licenses = LicenseCatalog(fetch=self._fetch_license_codes, ttl=license_ttl)
+        self._store = credential_store if credential_store is not None else FileCredentialStore(path_to_config)
+        self._tokens = TokenProvider(transport=self._transport, token_headers=self._token_headers,
+                                     get_auth_code=self._get_auth_token, on_update=self._on_tokens_updated,
+                                     store=self._store, proactive_renewal=proactive_token_renewal)
+        self._inflight = SingleFlight() if coalesce_requests else None
+        self.response_cache = response_cache
+        self.instrumentation = instrumentation
+        self._config = {}
+        self.directory: Optional[Directory] = None
+        self.group_index: Optional[GroupIndex] = None
+        self.mirror: Optional[DirectoryMirror] = None
         self._load_config()
 
     # LOAD AND DUMP CONFIG
 ########################################################################################################################
     def _load_config(self):
-        config_file = Path(self._config_path)
-        if config_file.exists():
-            # Open project specific config
-            with open(config_file, "rb") as file:
-                self._config = msgpack.unpack(stream=file, raw=False)
+        config = self._store.load()
+        if config is not None:
+            self._config = config
+            self._tokens.load(self._config)
+            self._transport.set_authorization(self._tokens.access_token)
 
         else:
-            print("Tokens not found!")
-            print("Creating new file...")
+            logger.info("No stored tokens found, creating new credentials", extra={"path": self._config_path})
             self._cold_start()
 
     def _dump_config(self):
-        config_file = Path(self._config_path)
-        with open(config_file, "wb+") as file:
-            msgpack.pack(o=self._config, stream=file)
+        self._store.save(self._config)
 
     # TOKEN API CALLS
 ########################################################################################################################
 
     def _cold_start(self):
-        print("Performing cold start")
-        auth_code = self._get_auth_token()
-        self._request_tokens(auth_code=auth_code)
+        logger.info("Performing cold start")
+        self._tokens.refresh(force_cold_start=True)
 
-    def _get_auth_token(self) -> str:
+    def _get_auth_token(self) -> Tuple[str, str]:
         """
         Retrieves single-use authentication token which is used to request initial access and refresh tokens
-        :return: auth_code: str
+        :return: (auth_code, redirect_uri)
         """
+        if self._headless:
+            raise CredentialError(HEADLESS_MESSAGE)
 
-        print("Creating authentication web server...")
-        app = Flask("Auth_app")
-        queue = Queue(maxsize=1)
-
-        @app.route('/')
-        def get_auth_code():
-            code = request.args.get("code")
-            queue.put(escape(code))
-            return "Code received! You can close this window now."
+        from gotomeeting_manager.gotoauthreceiver import authorize
 
-        server = AuthServerThread(app)
+        return authorize(base_url=self._transport.base_url, client_id=self._consumer_key,
+                         timeout=self._authorization_timeout, port=self._redirect_port)
 
-        try:
-            server.start()
-
-            print("Running app...")
-            base_url = f"https://api.getgo.com/oauth/v2/authorize?client_id={self._consumer_key}&response_type=code"
-            webbrowser.open_new_tab(base_url)
+    def begin_authorization(self, timeout: Optional[float] = None, receiver: Optional["AuthCodeReceiver"] = None,
+                            open_browser: bool = True) -> "PendingAuthorization":
+        """
+        Start the browser OAuth flow without waiting for it. The returned PendingAuthorization can be waited on with
+        result() or awaited from a coroutine, and is passed to complete_authorization() once the user has signed in.
+        :param timeout: Seconds to wait for the redirect. Defaults to the Manager's authorization_timeout
+        :param receiver: Receiver to register the authorization with, so several tenants can share one port. By
+        default a receiver on an ephemeral port is started for this authorization and stopped when it completes
+        :param open_browser: Open the authorize URL in a browser tab. Otherwise print it
+        :return: PendingAuthorization
+        """
+        if self._headless:
+            raise CredentialError(HEADLESS_MESSAGE)
 
-            print("Waiting for code...")
-            auth_code = queue.get(timeout=60)
+        # The browser flow is only needed on a cold start, so its modules are imported here instead of at load time
+        from gotomeeting_manager.gotoauthreceiver import begin_authorization
 
-            print("Code received!")
-            server.shutdown()
+        return begin_authorization(base_url=self._transport.base_url, client_id=self._consumer_key,
+                                   timeout=timeout or self._authorization_timeout, receiver=receiver,
+                                   port=self._redirect_port, open_browser=open_browser)
 
-            return auth_code
+    def complete_authorization(self, pending: "PendingAuthorization"):
+        """
+        Exchange the code of a finished authorization for tokens and store them
+        :param pending: Returned by begin_authorization()
+        """
+        self._tokens.exchange_code(auth_code=pending.result(), redirect_uri=pending.redirect_uri)
 
-        except KeyboardInterrupt:
-            server.shutdown()
+    def _request_tokens(self, auth_code: str):
+        self._tokens.exchange_code(auth_code=auth_code)
 
-        except TimeoutError:
-            server.shutdown()
-            print("Timeout reached. Could not receive the code.")
+    def _on_tokens_updated(self, tokens: Dict):
+        self._config.update(tokens)
+        self._transport.set_authorization(tokens["access_token"])
+        if self.instrumentation is not None:
+            self.instrumentation.token_refreshed()
 
-        except Exception:
-            server.shutdown()
+    def _refresh_tokens(self, force_refresh: bool = False):
+        """
+        Make sure the access token is current
+        :param force_refresh: Run the interactive authorization flow even if the refresh token is still valid
+        """
+        if force_refresh:
+            self._tokens.refresh(force_cold_start=True)
+        else:
+            self._tokens.ensure_fresh()
 
-    def _request_tokens(self, auth_code: str):
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Send an authorized API request. A 401 refreshes the access token and retries the request once.
+        With instrumentation attached, its hooks see every call; without it (and without debug logging) the call is
+        not timed at all.
+        """
+        instrumentation = self.instrumentation
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if instrumentation is None and not debug:
+            return self._send(method, path, **kwargs)
 
-        encoded_tokens = base64.b64encode(bytes(f"{self._consumer_key}:{self._consumer_secret}", "utf-8"))
+        endpoint = endpoint_name(path)
+        if instrumentation is not None:
+            instrumentation.before_request(method, endpoint)
 
-        base_url = "https://api.getgo.com/oauth/v2/token"
+        token = self._tokens.access_token
+        start = time.perf_counter()
+        r = error = None
 
-        headers = {
-            "Authorization": "Basic " + str(encoded_tokens, encoding="utf-8"),
-            "Accept": "application/json",
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
+        try:
+            r = self._send(method, path, **kwargs)
+            return r
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            event = RequestEvent(endpoint=endpoint, method=method, status=r.status_code if r is not None else None,
+                                 latency=time.perf_counter() - start,
+                                 response_bytes=self._response_size(r, stream=kwargs.get("stream", False)),
+                                 retries=getattr(r, "retries", 0), token_refreshed=token != self._tokens.access_token,
+                                 error=error)
+            if debug:
+                logger.debug("%s %s -> %s in %.3fs", method, endpoint, event.status, event.latency,
+                             extra=event._asdict())
+            if instrumentation is not None:
+                instrumentation.after_request(event)
 
-        data = {
-            "grant_type": "authorization_code",
-            "code": auth_code
-        }
+    @staticmethod
+    def _response_size(r: Optional[requests.Response], stream: bool) -> int:
+        if r is None:
+            return 0
+        length = r.headers.get("Content-Length")
+        if length is not None:
+            return int(length)
+        # A streamed body is still unread; reading it here would defeat streaming
+        return 0 if stream else len(r.content)
+
+    def _send(self, method: str, path: str, **kwargs) -> requests.Response:
+        self._tokens.ensure_fresh()
+        token = self._tokens.access_token
+
+        r = self._transport.request(method, path, **kwargs)
+
+        if r.status_code == 401:
+            r.close()
+            self._tokens.refresh(stale_token=token)
+            r = self._transport.request(method, path, **kwargs)
+            r.retries = getattr(r, "retries", 0) + 1
+
+        if method != "GET" and r.status_code < 300:
+            if self.response_cache is not None:
+                self.response_cache.invalidate_after_write(path)
+            if self.mirror is not None:
+                self._update_mirror(method, path, kwargs.get("json"), r)
 
-        r = requests.post(url=base_url, headers=headers, data=data)
+        return r
 
-        if r.status_code != 200:
-            raise self._manage_exceptions(r.status_code)(r.text)
+    # API CALLS
 
-        self._config["account_key"] = r.json()["account_key"]
-        self._config["organizer_key"] = r.json()["organizer_key"]
-        self._config["access_token"] = r.json()["access_token"]
-        self._config["refresh_token"] = r.json()["refresh_token"]
-        self._config["last_refreshed"] = datetime.datetime.now().strftime("%m/%d/%Y, %H:%M:%S")
+    # Additional Functions
+########################################################################################################################
+    def _account_url(self, resource: str) -> str:
+        return f"/admin/rest/v1/accounts/{self._config['account_key']}/{resource}"
 
-        self._dump_config()
+    @staticmethod
+    def _create_filter_expression(**kwargs) -> str:
+        return compile_filter(kwargs)
 
-    def _refresh_tokens(self, force_refresh: bool = False):
+    @staticmethod
+    def _create_any_filter_expression(key: str, values: Iterable[str]) -> str:
+        return compile_filter(one_of(key, values, case_sensitive=True))
 
-        # Calculate time since last refresh
-        time_since_refresh = (datetime.datetime.now() -
-                              datetime.datetime.strptime(self._config["last_refreshed"], "%m/%d/%Y, %H:%M:%S")).seconds
+    def _page_parameters(self, page_size: int, offset: int,
+                         filter_values: Optional[Union[Dict, Filter, str]] = None,
+                         resource: Optional[str] = None) -> Dict:
+        parameters = {
+            "pageSize": page_size,
+            "offset": offset
+        }
 
-        # Check whether tokens have been refreshed within the last 25 days and performs cold start if not
-        # Can also be overridden with the force_refresh flag
-        if (time_since_refresh >= 25 * 24 * 3600) or force_refresh:
-            self._cold_start()
+        if filter_values is not None:
+            parameters.update({"filter": compile_filter(filter_values, resource=resource)})
 
-        # Check whether tokens have been refreshed in the last 45 minutes and refreshes them if not
-        elif time_since_refresh >= 2700:
-            print("Refreshing access token")
+        return parameters
 
-            encoded_tokens = base64.b64encode(bytes(f"{self._consumer_key}:{self._consumer_secret}", "utf-8"))
+    def _get_json(self, path: str, params: Optional[Dict] = None, not_found: Optional[type] = None):
+        """
+        GET and decode an API resource. Identical concurrent calls (same path, parameters and access token) share a
+        single in-flight request, and with a response cache attached, fresh cached bodies are served without a
+        request. The cache holds the undecoded bytes, so every hit returns a body of its own; callers coalesced onto
+        one request share its decoded body, which models never write into.
+        :param not_found: Exception raised on a 404
+        :return: The decoded response body
+        """
+        cache = self.response_cache
+        cache_key = entry = None
 
-            base_url = "https://api.getgo.com/oauth/v2/token"
+        if cache is not None and cache.cacheable(path):
+            cache_key = cache.key(path, params)
+            entry = cache.get(cache_key)
+            if entry is not None and entry.fresh:
+                return loads(entry.value)
 
-            headers = {
-                "Authorization": "Basic " + str(encoded_tokens, encoding="utf-8"),
-                "Accept": "application/json",
-                "Content-Type": "application/x-www-form-urlencoded",
-            }
+        def fetch():
+            headers = {"If-None-Match": entry.etag} if entry is not None else None
+            r = self._request("GET", path, params=params, headers=headers)
 
-            data = {
-                "grant_type": "refresh_token",
-                "refresh_token": self._config["refresh_token"]
-            }
+            if r.status_code == 304 and entry is not None:
+                if cache.revalidated(cache_key) is None:
+                    cache.put(cache_key, path, entry.value, size=entry.size, etag=entry.etag)
+                return loads(entry.value)
 
-            r = requests.post(url=base_url, headers=headers, data=data)
+            if r.status_code == 404 and not_found is not None:
+                raise not_found
 
             if r.status_code != 200:
                 raise self._manage_exceptions(r.status_code)(r.text)
 
-            self._config["account_key"] = r.json()["account_key"]
-            self._config["organizer_key"] = r.json()["organizer_key"]
-            self._config["access_token"] = r.json()["access_token"]
-            self._config["refresh_token"] = r.json()["refresh_token"]
-            self._config["last_refreshed"] = datetime.datetime.now().strftime("%m/%d/%Y, %H:%M:%S")
+            content = r.content
+            if cache_key is not None:
+                cache.put(cache_key, path, content, size=len(content), etag=r.headers.get("ETag"))
+            return loads(content)
 
-            self._dump_config()
+        if self._inflight is None:
+            return fetch()
 
-    # API CALLS
+        key = (path, tuple(sorted((params or {}).items())), self._tokens.access_token)
+        return self._inflight.do(key, fetch)
 
-    # Additional Functions
-########################################################################################################################
-    @staticmethod
-    def _create_filter_expression(**kwargs):
-        # TODO: Finish filter method
-        filter_list = []
-        for key, value in kwargs.items():
-            filter_list.append(f"({key}=\"(?i){value}\")")
+    def _page_response(self, resource: str, page_size: int, offset: int,
+                       filter_values: Optional[Union[Dict, Filter, str]] = None, not_found: type = UserNotFoundError,
+                       stream: bool = False) -> requests.Response:
+        """
+        Request a single page of a paginated admin resource and check its status
+        :param resource: Resource under the account, e.g. "users" or "groups"
+        :param stream: Leave the body unread so it can be decoded while it downloads
+        :return: The successful response
+        """
+        parameters = self._page_parameters(page_size=page_size, offset=offset, filter_values=filter_values,
+                                           resource=resource)
+        r = self._request("GET", self._account_url(resource), params=parameters, stream=stream)
 
-        filter_expression = " & ".join(filter_list)
+        if r.status_code == 404:
+            r.close()
+            raise not_found
 
-        return filter_expression
+        if r.status_code != 200:
+            raise self._manage_exceptions(r.status_code)(r.text)
 
-    def get_license_codes(self) -> Dict:
-        self._refresh_tokens()
+        return r
 
-        base_url = f"https://api.getgo.com/admin/rest/v1/accounts/{self._config['account_key']}/licenses"
+    def _get_page(self, resource: str, page_size: int, offset: int,
+                  filter_values: Optional[Union[Dict, Filter, str]] = None,
+                  not_found: type = UserNotFoundError) -> Dict:
+        """
+        Fetch a single raw page of a paginated admin resource
+        :param resource: Resource under the account, e.g. "users" or "groups"
+        :return: The decoded response body
+        """
+        parameters = self._page_parameters(page_size=page_size, offset=offset, filter_values=filter_values,
+                                           resource=resource)
+        return self._get_json(self._account_url(resource), params=parameters, not_found=not_found)
 
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": self._config["access_token"]
-        }
+    def _iter_pages(self, resource: str, page_size: int, filter_values: Optional[Union[Dict, Filter, str]] = None,
+                    prefetch: bool = True, not_found: type = UserNotFoundError,
+                    stream: bool = False) -> Iterator[Dict]:
+        """
+        Yield the raw items of every page of a paginated admin resource. At most two pages are held in memory: the
+        one being consumed and, with prefetch enabled, the next one being downloaded in the background. With stream
+        enabled, items are decoded and yielded while their page is still downloading instead (prefetch is ignored).
+        """
+        if stream:
+            yield from self._iter_streamed_pages(resource=resource, page_size=page_size, filter_values=filter_values,
+                                                 not_found=not_found)
+            return
 
-        r = requests.get(url=base_url, headers=headers)
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
 
-        license_dict = {}
+        def fetch(page_offset: int, size: int) -> Future:
+            if executor is not None:
+                return executor.submit(self._get_page, resource, size, page_offset, filter_values, not_found)
 
-        for license_type in r.json()["results"]:
-            if len(license_type["products"]) == 2:
-                license_type["products"].remove("G2M")
-                license_dict.update({license_type["products"][0]: license_type["key"]})
-            else:
-                license_dict.update({license_type["products"][0]: license_type["key"]})
+            future = Future()
+            future.set_result(self._get_page(resource, size, page_offset, filter_values, not_found))
+            return future
 
-        return license_dict
+        offset = 0
+        pending = fetch(offset, page_size)
 
-    def get_corresponding_product_licenses(self, products: List[str]) -> List:
+        try:
+            while True:
+                page = pending.result()
+                results = page.get("results") or []
+                total = page.get("total")
 
-        self._refresh_tokens()
+                next_offset = offset + len(results)
+                done = not results or (total is not None and next_offset >= total)
 
-        invalid_product_flag = False
+                # The server clamps pageSize to its own maximum; follow it so offsets stay contiguous
+                if results and len(results) < page_size and not done:
+                    page_size = len(results)
 
-        all_licenses = self.get_license_codes()
+                if not done:
+                    pending = fetch(next_offset, page_size)
 
-        for product in products:
-            if product not in all_licenses.keys():
-                invalid_product_flag = True
+                yield from results
 
-        assert invalid_product_flag is False, "Invalid product specified, or no licenses for specified product exist"
+                if done:
+                    return
 
-        if ("G2T" in products) or ("G2W" in products):
-            products.remove("G2M")
+                offset = next_offset
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
 
-        product_licenses = [all_licenses[product] for product in products]
+    def _iter_streamed_pages(self, resource: str, page_size: int,
+                             filter_values: Optional[Union[Dict, Filter, str]] = None,
+                             not_found: type = UserNotFoundError) -> Iterator[Dict]:
+        offset = 0
 
-        return product_licenses
+        while True:
+            r = self._page_response(resource=resource, page_size=page_size, offset=offset,
+                                    filter_values=filter_values, not_found=not_found, stream=True)
+            page = stream_results(r)
 
-    # Users
-########################################################################################################################
-    def get_users(self, page_size: int = 25, offset: int = 0,  filter_values: Optional[Dict] = None):
+            try:
+                yield from page
+            finally:
+                r.close()
 
-        self._refresh_tokens()
+            total = page.fields.get("total")
+            next_offset = offset + page.count
 
-        base_url = f"https://api.getgo.com/admin/rest/v1/accounts/{self._config['account_key']}/users"
+            if not page.count or (total is not None and next_offset >= total):
+                return
 
-        headers = {
-            "Accept": "application/json",
-            "Authorization": self._config["access_token"],
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
+            # The server clamps pageSize to its own maximum; follow it so offsets stay contiguous
+            if page.count < page_size:
+                page_size = page.count
 
-        parameters = {
-            "pageSize": page_size,
-            "offset": offset
-        }
+            offset = next_offset
 
-        if filter_values is not None:
-            parameters.update({"filter": self._create_filter_expression(**filter_values)})
+    def _fetch_license_codes(self) -> Dict:
+        return parse_license_codes(self._get_json(self._account_url("licenses"))["results"])
 
-        r = requests.get(url=base_url, headers=headers, params=parameters)
+    def get_license_codes(self, use_cache: bool = True) -> Dict:
+        """
+        Get the account's product -> license key map
+        :param use_cache: Serve the map from the license cache when it is still fresh
+        :return: Dict
+        """
+        if not use_cache:
+            return dict(self._licenses.refresh())
 
-        if r.status_code == 404:
-            raise UserNotFoundError
+        return dict(self._licenses.get())
 
-        if r.status_code != 200:
-            raise self._manage_exceptions(r.status_code)(r.text)
+    def get_corresponding_product_licenses(self, products: List[str]) -> List:
+
+        return self._licenses.resolve(products=products)
+
+    def invalidate_license_cache(self):
+        """
+        Drop the cached license catalog, e.g. after licenses were bought or removed
+        """
+        self._licenses.invalidate()
+
+    # Users
+########################################################################################################################
+    def get_users(self, page_size: int = 25, offset: int = 0,  filter_values: Optional[Union[Dict, Filter]] = None,
+                  max_staleness: Optional[float] = None):
+        """
+        Get one page of users
+        :param page_size: Number of users per page
+        :param offset: Index of the first user to return
+        :param filter_values: Optional Filter, or field -> value dict matched case-insensitively where a list value
+        matches any of its items
+        :param max_staleness: With a mirror attached, answer from it if its last sync is at most this many seconds
+        old. Defaults to the mirror's own bound; 0 always reads the API
+        :return: List of UserResponse
+        """
+        if self._mirror_can_answer(filter_values, max_staleness, resource="users"):
+            return self.mirror.get_users(page_size=page_size, offset=offset, filter_values=filter_values)
+
+        page = self._get_page(resource="users", page_size=page_size, offset=offset, filter_values=filter_values,
+                              not_found=UserNotFoundError)
 
-        results = r.json().get("results", None)
+        results = page.get("results", None)
 
         if results is None:
             raise UserNotFoundError
 
+        return UserResponse.from_page(results)
+
+    def iter_items(self, resource: str, page_size: int = 100, filter_values: Optional[Union[Dict, Filter]] = None,
+                   prefetch: bool = True, stream: bool = False) -> Iterator[Dict]:
+        """
+        Lazily walk every item of an admin resource as the API returns it, one page at a time
+        :param resource: "users" or "groups"
+        :param page_size: Requested page size. Shrinks to the server's limit if the server returns smaller pages
+        :param filter_values: Optional filter applied to every page
+        :param prefetch: Fetch the next page in the background while the current one is being consumed
+        :param stream: Decode items while each page is still downloading, without holding a whole page in memory
+        :return: Iterator of the items' JSON objects
+        """
+        not_found = GroupNotFoundError if resource == "groups" else UserNotFoundError
+        return self._iter_pages(resource=resource, page_size=page_size, filter_values=filter_values,
+                                prefetch=prefetch, not_found=not_found, stream=stream)
+
+    def iter_users(self, page_size: int = 100, filter_values: Optional[Union[Dict, Filter]] = None,
+                   prefetch: bool = True, stream: bool = False) -> Iterator[UserResponse]:
+        """
+        Lazily walk every user in the account, one page at a time
+        :param page_size: Requested page size. Shrinks to the server's limit if the server returns smaller pages
+        :param filter_values: Optional filter applied to every page
+        :param prefetch: Fetch the next page in the background while the current one is being consumed
+        :param stream: Decode users while each page is still downloading, without holding a whole page in memory
+        :return: Iterator of UserResponse
+        """
+        for response in self.iter_items(resource="users", page_size=page_size, filter_values=filter_values,
+                                        prefetch=prefetch, stream=stream):
+            yield UserResponse.create_from_dict(user_data=response)
+
+    def fetch_all_users(self, parallelism: int = 4, page_size: int = 100, max_retries: int = 2,
+                        filter_values: Optional[Union[Dict, Filter]] = None,
+                        timings: Optional[List[PageTiming]] = None) -> List[UserResponse]:
+        """
+        Fetch the full user directory by requesting page ranges concurrently
+        :param parallelism: Number of pages fetched at the same time
+        :param page_size: Requested page size. Follows the server's limit if the first page comes back smaller
+        :param max_retries: How many times a failed page is retried before the error is raised
+        :param filter_values: Optional filter applied to every page
+        :param timings: Optional list that receives a PageTiming for every page attempt, for tuning parallelism
+        :return: All users in offset order, deduplicated by key
+        """
+
+        def fetch(offset: int, attempt: int) -> List[Dict]:
+            start = time.perf_counter()
+            try:
+                results = self._get_page(resource="users", page_size=page_size, offset=offset,
+                                         filter_values=filter_values).get("results") or []
+            except Exception as e:
+                if timings is not None:
+                    timings.append(PageTiming(offset, attempt, time.perf_counter() - start, 0, e))
+                raise
+
+            if timings is not None:
+                timings.append(PageTiming(offset, attempt, time.perf_counter() - start, len(results)))
+            return results
+
+        first_page = self._get_page(resource="users", page_size=page_size, offset=0, filter_values=filter_values)
+        total = first_page.get("total")
+
+        if total is None:
+            # Without a total count the ranges cannot be planned up front
+            return list(self.iter_users(page_size=page_size, filter_values=filter_values))
+
+        pages = {0: first_page.get("results") or []}
+        page_size = max(len(pages[0]), 1) if len(pages[0]) < page_size else page_size
+
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            attempts = {offset: 0 for offset in range(len(pages[0]), total, page_size)}
+            futures = {executor.submit(fetch, offset, 0): offset for offset in attempts}
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    offset = futures.pop(future)
+                    try:
+                        pages[offset] = future.result()
+                    except Exception:
+                        if attempts[offset] >= max_retries:
+                            raise
+                        attempts[offset] += 1
+                        futures[executor.submit(fetch, offset, attempts[offset])] = offset
+
         users = []
+        seen = set()
 
-        for response in results:
-            users.append(UserResponse.create_from_dict(user_data=response))
+        for offset in sorted(pages):
+            for response in pages[offset]:
+                key = response.get("key")
+                if key in seen:
+                    continue
+                seen.add(key)
+                users.append(UserResponse.create_from_dict(user_data=response))
 
         return users
 
     def create_user(self, first_name: str, last_name: str, email: str,
-                    products: Optional[List[str]] = None) -> List[UserResponse]:
+                    products: Optional[List[str]] = None, confirm: bool = True,
+                    lazy: bool = False) -> List[UserResponse]:
 
         """
         Create a user
@@ -301,6 +595,10 @@ class Manager:
         :param last_name: The user's last name
         :param email: The user's email
         :param products: Optional list containing all the products to assign to the user. Defaults to "G2M" only
+        :param confirm: Read the created user back from the API. If False, the returned user is built from the
+        submitted fields and the response body, saving a round trip
+        :param lazy: With confirm=False, return a LazyUserResponse that fetches the server state only when a field
+        that is not known locally is read
         :return:
         """
 
@@ -309,26 +607,106 @@ class Manager:
 
         assert products != "", "No product specified"
 
-        self._refresh_tokens()
-
         licenses_to_assign = self.get_corresponding_product_licenses(products=products)
 
-        base_url = f"https://api.getgo.com/admin/rest/v1/accounts/{self._config['account_key']}/users"
+        body = self._post_user(first_name=first_name, last_name=last_name, email=email,
+                               license_keys=licenses_to_assign)
 
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": self._config["access_token"]
-        }
+        if not confirm:
+            submitted = {"email": email, "firstName": first_name, "lastName": last_name,
+                         "licenseKeys": licenses_to_assign, "products": products}
+            return [self._written_user(submitted=submitted, body=body, lazy=lazy)]
+
+        user = self.get_users(filter_values={"key": body["key"]}, max_staleness=0)
+
+        return user
+
+    def _written_user(self, submitted: Dict, body: Dict, lazy: bool) -> UserResponse:
+        """
+        Build the response for a write from what was submitted, overlaid with whatever the server echoed back
+        """
+        user_data = dict(submitted)
+        user_data.update(body)
+
+        if not lazy:
+            return UserResponse.create_from_dict(user_data=user_data)
+
+        user_key = user_data["key"]
+        return LazyUserResponse(user_data=user_data,
+                                loader=lambda: self.get_users(filter_values={"key": user_key}, max_staleness=0)[0])
+
+    def confirm_users(self, user_keys: Iterable[str], chunk_size: int = 50) -> Dict[str, UserResponse]:
+        """
+        Read back many written users with one filtered request per chunk of keys instead of one request per user
+        :param user_keys: Keys of the users to read
+        :param chunk_size: Number of keys ORed into a single filter
+        :return: Dict of user key to UserResponse. Keys the server did not return are absent
+        """
+        users = self.get_users_by(keys=user_keys, max_values=chunk_size, parallelism=1)
+        return {key: user for key, user in users.items() if user is not None}
+
+    def get_users_by(self, emails: Optional[Iterable[str]] = None, keys: Optional[Iterable[str]] = None,
+                     max_values: int = 50, max_filter_length: int = 1800,
+                     parallelism: int = 4) -> Dict[str, Optional[UserResponse]]:
+        """
+        Look up many users by email or by key. The values are packed into as few IN-list filters as the query-length
+        limit allows, and the filtered requests run concurrently
+        :param emails: Emails to look up, matched case-insensitively
+        :param keys: User keys to look up, matched exactly
+        :param max_values: Most values ORed into a single filter
+        :param max_filter_length: Most URL-encoded characters in a single filter
+        :param parallelism: Number of filtered requests in flight at the same time
+        :return: Dict of every distinct input value, in input order, to its UserResponse, or None if no user matched
+        :raises InvalidFilterError: Unless exactly one of emails and keys is given, or for values that cannot be
+        expressed in a filter
+        """
+        if (emails is None) == (keys is None):
+            raise InvalidFilterError("Pass either emails or keys")
+
+        field, values, case_sensitive = ("email", emails, False) if emails is not None else ("key", keys, True)
+        values = list(dict.fromkeys(str(value) for value in values))
+
+        def normalise(value) -> str:
+            return str(value) if case_sensitive else str(value).lower()
+
+        def fetch(chunk: List[str]) -> List[Dict]:
+            expression = one_of(field, chunk, case_sensitive=case_sensitive)
+            return list(self._iter_pages(resource="users", page_size=len(chunk), filter_values=expression,
+                                         prefetch=False))
+
+        chunks = list(pack_one_of(field, values, max_values=max_values, max_length=max_filter_length,
+                                  case_sensitive=case_sensitive))
+
+        if len(chunks) <= 1 or parallelism <= 1:
+            pages = map(fetch, chunks)
+        else:
+            with ThreadPoolExecutor(max_workers=min(parallelism, len(chunks))) as executor:
+                pages = list(executor.map(fetch, chunks))
+
+        # The server may return more than was asked for, so results are matched back on the field itself
+        found = {}
+        for page in pages:
+            for user_data in page:
+                if user_data.get(field) is not None:
+                    found[normalise(user_data[field])] = UserResponse.create_from_dict(user_data=user_data)
+
+        if self.directory is not None:
+            for user in found.values():
+                self.directory.upsert(user)
+
+        return {value: found.get(normalise(value)) for value in values}
+
+    def _post_user(self, first_name: str, last_name: str, email: str, license_keys: List[str]) -> Dict:
+        base_url = self._account_url("users")
 
         data = {
             "email": email,
             "firstName": first_name,
             "lastName": last_name,
-            "licenseKeys": licenses_to_assign
+            "licenseKeys": license_keys
         }
 
-        r = requests.post(url=base_url, headers=headers, json=data)
+        r = self._request("POST", base_url, json=data)
 
         if r.status_code == 409:
             raise UserExistsError
@@ -336,18 +714,57 @@ class Manager:
         if r.status_code != 200:
             raise self._manage_exceptions(r.status_code)(r.text)
 
-        user_key = r.json()["key"]
+        return decode(r)
 
-        user = self.get_users(filter_values={"key": user_key})
+    def create_users(self, users: Iterable[Dict], workers: int = 8, requests_per_second: Optional[float] = None,
+                     refetch: bool = False) -> Iterator[BulkResult]:
+        """
+        Create many users concurrently
+        :param users: Iterable of dicts with "first_name", "last_name", "email" and optionally "products" (defaults
+        to ["G2M"]). Consumed lazily
+        :param workers: Number of users created at the same time
+        :param requests_per_second: Optional cap on the rate of create requests across all workers
+        :param refetch: Read every created user back from the API. Otherwise BulkResult.result is the new user key
+        :return: Iterator of BulkResult in completion order; failures (e.g. UserExistsError) are reported in
+        BulkResult.error instead of being raised
+        """
+        budget = RequestBudget(requests_per_second=requests_per_second)
+        all_licenses = self.get_license_codes()
 
-        return user
+        def create(user: Dict) -> Union[str, UserResponse]:
+            license_keys = resolve_product_licenses(products=user.get("products") or ["G2M"],
+                                                    all_licenses=all_licenses)
+
+            budget.acquire()
+            user_key = self._post_user(first_name=user["first_name"], last_name=user["last_name"],
+                                       email=user["email"], license_keys=license_keys)["key"]
 
-    def update_user(self, user_key: str, email: str, products: Optional[List[str]] = None, **kwargs) -> List[UserResponse]:
+            if not refetch:
+                return user_key
+
+            budget.acquire()
+            return self.get_users(filter_values={"key": user_key}, max_staleness=0)[0]
+
+        return run_bulk(create, users, workers=workers)
+
+    def update_user(self, user_key: str, email: str, products: Optional[List[str]] = None, confirm: bool = True,
+                    lazy: bool = False, **kwargs) -> List[UserResponse]:
+        """
+        Update a user
+        :param user_key: Key of the user to update
+        :param email: The user's email
+        :param products: Optional list of products replacing the user's current products
+        :param confirm: Read the updated user back from the API. If False, the returned user is built from the
+        submitted fields and the response body, saving a round trip
+        :param lazy: With confirm=False, return a LazyUserResponse that fetches the server state only when a field
+        that is not known locally is read
+        :param kwargs: Further user fields to update, named as in the API
+        :return:
+        """
 
         parameters = {
             "email": email
         }
-        print(parameters)
 
         if products is not None:
             licenses_to_assign = self.get_corresponding_product_licenses(products=products)
@@ -357,66 +774,241 @@ class Manager:
 
         parameters.update(**kwargs)
 
-        base_url = f"https://api.getgo.com/admin/rest/v1/accounts/{self._config['account_key']}/users/{user_key}"
+        base_url = self._account_url(f"users/{user_key}")
+        logger.debug("Updating user", extra={"user_key": user_key, "fields": sorted(parameters)})
 
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": self._config["access_token"]
-        }
-        print(parameters)
-
-        r = requests.put(url=base_url, headers=headers, json=parameters)
+        r = self._request("PUT", base_url, json=parameters)
 
         if r.status_code != 200:
             raise self._manage_exceptions(r.status_code)(r.text)
 
-        user = self.get_users(filter_values={"key": user_key})
+        # The write may have changed the email the Directory indexes the user by. An unconfirmed write is only known in
+        # part, so the user is dropped and read again on the next lookup
+        if not confirm:
+            if self.directory is not None:
+                self.directory.remove(user_key)
+            submitted = dict(parameters, key=user_key)
+            if products is not None:
+                submitted["products"] = products
+            body = decode(r) if r.content else {}
+            return [self._written_user(submitted=submitted, body=body if isinstance(body, dict) else {}, lazy=lazy)]
+
+        user = self.get_users(filter_values={"key": user_key}, max_staleness=0)
+
+        if self.directory is not None:
+            if user:
+                self.directory.upsert(user[0])
+            else:
+                self.directory.remove(user_key)
 
         return user
 
-    # GROUPS
-########################################################################################################################
-    def get_groups(self, page_size: int = 25, offset: int = 0,
-                   filter_values: Optional[Dict] = None) -> List[GroupResponse]:
+    def get_user_by_email(self, email: str, use_directory: bool = True) -> UserResponse:
+        """
+        Look up a single user by email
+        :param email: The user's email, matched case-insensitively
+        :param use_directory: Answer from the attached Directory or mirror, if any, instead of the API
+        :return: UserResponse
+        """
+        if use_directory and self.directory is not None:
+            user = self.directory.by_email(email)
+            if user is not None:
+                return user
 
-        self._refresh_tokens()
+        users = self.get_users(page_size=1, filter_values={"email": email}, max_staleness=None if use_directory else 0)
 
-        base_url = f"https://api.getgo.com/admin/rest/v1/accounts/{self._config['account_key']}/groups"
+        if not users:
+            raise UserNotFoundError
 
-        headers = {
-            "Accept": "application/json",
-            "Authorization": self._config["access_token"],
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
+        if self.directory is not None:
+            self.directory.upsert(users[0])
 
-        parameters = {
-            "pageSize": page_size,
-            "offset": offset
-        }
+        return users[0]
 
-        if filter_values is not None:
-            parameters.update({"filter": self._create_filter_expression(**filter_values)})
+    def get_user_by_key(self, key: str, use_directory: bool = True) -> UserResponse:
+        """
+        Look up a single user by key
+        :param key: The user's key
+        :param use_directory: Answer from the attached Directory or mirror, if any, instead of the API
+        :return: UserResponse
+        """
+        if use_directory and self.directory is not None:
+            user = self.directory.by_key(key)
+            if user is not None:
+                return user
 
-        r = requests.get(url=base_url, headers=headers, params=parameters)
+        users = self.get_users(page_size=1, filter_values={"key": key}, max_staleness=None if use_directory else 0)
 
-        if r.status_code == 404:
+        if not users:
             raise UserNotFoundError
 
-        if r.status_code != 200:
-            raise self._manage_exceptions(r.status_code)(r.text)
+        if self.directory is not None:
+            self.directory.upsert(users[0])
 
-        results = r.json().get("results", None)
+        return users[0]
+
+    def enable_directory(self, max_age: Optional[float] = 300) -> Directory:
+        """
+        Attach an in-memory Directory so lookups by email or key no longer need a request
+        :param max_age: Seconds after which the directory is rebuilt on the next lookup
+        :return: The attached Directory
+        """
+        # One group index serves both, so the groups are walked and kept up to date once
+        self.directory = Directory(manager=self, max_age=max_age, groups=self.group_index)
+        self.group_index = self.directory.groups
+        return self.directory
+
+    # MIRROR
+########################################################################################################################
+    def enable_mirror(self, path: Optional[str] = None, max_staleness: float = 300,
+                      sync: bool = True) -> DirectoryMirror:
+        """
+        Attach an on-disk SQLite mirror of users, groups and licenses that get_users/get_groups answer from while it
+        is fresh enough
+        :param path: Database file. Defaults to goto.mirror.sqlite next to the credentials file
+        :param max_staleness: Default bound, in seconds, on how old the last sync may be for reads to use the mirror
+        :param sync: Bring the mirror up to date now
+        :return: The attached DirectoryMirror
+        """
+        if path is None:
+            path = str(Path(self._config_path).with_name("goto.mirror.sqlite"))
+
+        self.mirror = DirectoryMirror(path=path, max_staleness=max_staleness)
+
+        if sync:
+            self.mirror.sync(self)
+
+        return self.mirror
+
+    def _mirror_can_answer(self, filter_values: Optional[Dict], max_staleness: Optional[float],
+                           resource: str) -> bool:
+        return self.mirror is not None and max_staleness != 0 and self.mirror.is_fresh(max_staleness) and \
+            self.mirror.supports(filter_values, resource=resource)
+
+    def _update_mirror(self, method: str, path: str, body: Optional[Dict], r: requests.Response):
+        """
+        Apply a successful write to the mirror's rows, so reads it answers do not contradict the write until the next
+        sync
+        """
+        users_path = self._account_url("users")
+        try:
+            if path == users_path and method == "POST":
+                user_key = decode(r)["key"]
+            elif path.startswith(users_path + "/"):
+                user_key = path[len(users_path) + 1:]
+            elif path.startswith("/G2M/rest/organizers/"):
+                user_key = path[len("/G2M/rest/organizers/"):]
+            elif path.startswith("/G2M/rest/groups/") and path.endswith("/organizers") and method == "POST":
+                group_key = path[len("/G2M/rest/groups/"):-len("/organizers")]
+                user_key = decode(r)[0]["key"]
+                body = {"email": body.get("organizerEmail"), "firstName": body.get("firstName"),
+                        "lastName": body.get("lastName"), "groupKey": group_key,
+                        "products": [body.get("productType")]}
+            else:
+                return
+        except (KeyError, IndexError, TypeError, ValueError):
+            # The caller reports the unexpected body; the row is corrected by the next sync
+            return
+
+        if method == "DELETE":
+            self.mirror.delete_user(user_key)
+            return
+
+        fields = dict(body or {})
+        if path.startswith("/G2M/rest/organizers/"):
+            if "status" not in fields:
+                # A product was added; the resulting products are only known to the API
+                self._refetch_mirror_user(user_key)
+                return
+            fields = {"status": fields["status"].upper()}
+        elif "licenseKeys" in fields:
+            fields["products"] = self.mirror.products_for_licenses(fields["licenseKeys"])
+        if method == "POST":
+            fields.setdefault("status", "ACTIVE")
+
+        self.mirror.upsert_user(user_key, fields)
+
+    def _refetch_mirror_user(self, user_key: str):
+        page = self._get_page(resource="users", page_size=1, offset=0, filter_values={"key": user_key},
+                              not_found=UserNotFoundError)
+        results = page.get("results") or []
+        if results:
+            self.mirror.upsert_user(user_key, results[0], replace=True)
+        else:
+            self.mirror.delete_user(user_key)
+
+    # GROUPS
+########################################################################################################################
+    def get_groups(self, page_size: int = 25, offset: int = 0, filter_values: Optional[Union[Dict, Filter]] = None,
+                   max_staleness: Optional[float] = None) -> List[GroupResponse]:
+        """
+        Get one page of groups
+        :param page_size: Number of groups per page
+        :param offset: Index of the first group to return
+        :param filter_values: Optional Filter, or field -> value dict matched case-insensitively where a list value
+        matches any of its items
+        :param max_staleness: With a mirror attached, answer from it if its last sync is at most this many seconds
+        old. Defaults to the mirror's own bound
+        :return: List of GroupResponse
+        """
+        if self._mirror_can_answer(filter_values, max_staleness, resource="groups"):
+            return self.mirror.get_groups(page_size=page_size, offset=offset, filter_values=filter_values)
+
+        page = self._get_page(resource="groups", page_size=page_size, offset=offset, filter_values=filter_values,
+                              not_found=GroupNotFoundError)
+
+        results = page.get("results", None)
 
         if results is None:
             raise GroupNotFoundError
 
-        groups = []
+        return GroupResponse.from_page(results)
+
+    def iter_groups(self, page_size: int = 100, filter_values: Optional[Union[Dict, Filter]] = None,
+                    prefetch: bool = True, stream: bool = False) -> Iterator[GroupResponse]:
+        """
+        Lazily walk every group in the account, one page at a time
+        :param page_size: Requested page size. Shrinks to the server's limit if the server returns smaller pages
+        :param filter_values: Optional filter applied to every page
+        :param prefetch: Fetch the next page in the background while the current one is being consumed
+        :param stream: Decode groups while each page is still downloading, without holding a whole page in memory
+        :return: Iterator of GroupResponse
+        """
+        for response in self.iter_items(resource="groups", page_size=page_size, filter_values=filter_values,
+                                        prefetch=prefetch, stream=stream):
+            yield GroupResponse.create_from_dict(group_data=response)
+
+    def enable_group_index(self, max_age: Optional[float] = 300) -> GroupIndex:
+        """
+        Attach an in-memory GroupIndex so group names and memberships resolve without a request
+        :param max_age: Seconds after which the index is refreshed on the next lookup
+        :return: The attached GroupIndex. With a Directory attached, this is the Directory's index
+        """
+        if self.directory is not None:
+            self.group_index = self.directory.groups
+            self.group_index.max_age = max_age
+        else:
+            self.group_index = GroupIndex(manager=self, max_age=max_age)
+        return self.group_index
+
+    def get_group_key(self, group_name: str) -> str:
+        """
+        Resolve a group name to its key, from the attached Directory or GroupIndex if any, otherwise by walking the
+        group pages until the name is found
+        :param group_name: Exact group name
+        :return: The group key
+        """
+        if self.directory is not None:
+            group_key = self.directory.group_key(group_name)
+        elif self.group_index is not None:
+            group_key = self.group_index.group_key(group_name)
+        else:
+            group_key = next((group.key for group in self.iter_groups() if group.name == group_name), None)
 
-        for response in r.json():
-            groups.append(GroupResponse.create_from_dict(group_data=response))
+        if group_key is None:
+            raise GroupNotFoundError
 
-        return groups
+        return group_key
 
 ########################################################################################################################
     # DEPRECATED
@@ -499,24 +1091,9 @@ class Manager:
     # DEPRECATED
     def create_user_in_group(self, first_name: str, last_name: str, email: str, group_name: str,
                              product: str = "G2M") -> UserResponse:
-        self._refresh_tokens()
+        group_key = self.get_group_key(group_name)
 
-        groups = self.get_groups()
-        group_key = None
-        for group in groups:
-            if group.name == group_name:
-                group_key = group.key
-
-        if group_key is None:
-            raise GroupNotFoundError
-
-        base_url = "https://api.getgo.com/G2M/rest/groups/" + str(group_key) + "/organizers"
-
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": self._config["access_token"]
-        }
+        base_url = f"/G2M/rest/groups/{group_key}/organizers"
 
         data = {
             "organizerEmail": email,
@@ -525,39 +1102,38 @@ class Manager:
             "productType": product
         }
 
-        r = requests.post(url=base_url, headers=headers, json=data)
+        r = self._request("POST", base_url, json=data)
 
         if r.status_code != 201:
             raise self._manage_exceptions(r.status_code)(r.text)
 
         try:
-            key = r.json()[0]["key"]
+            key = decode(r)[0]["key"]
         except KeyError:
             raise UserNotFoundError
 
-        user = self.get_user_by_key(key=key)
+        if self.group_index is not None:
+            self.group_index.add_member(group_key, key)
+
+        user = self.get_user_by_key(key=key, use_directory=False)
 
         return user
 
     def delete_user(self, email: str) -> requests.Response:
 
-        self._refresh_tokens()
-
         # Get the requested user's key using the provided email
-        user_key = self.get_user_by_email(email).organizer_key
+        user_key = self.get_user_by_email(email).key
 
-        base_url = "https://api.getgo.com/G2M/rest/organizers/" + str(user_key)
+        base_url = f"/G2M/rest/organizers/{user_key}"
 
-        headers = {
-            "Accept": "application/json",
-            "Authorization": self._config["access_token"]
-        }
-
-        r = requests.delete(url=base_url, headers=headers)
+        r = self._request("DELETE", base_url)
 
         if r.status_code != 204:
             raise self._manage_exceptions(r.status_code)(r.text)
 
+        if self.directory is not None:
+            self.directory.remove(user_key)
+
         return r
 
     def suspend_user(self, email: str, force_refresh: bool = False) -> UserResponse:
@@ -565,65 +1141,103 @@ class Manager:
         self._refresh_tokens(force_refresh=force_refresh)
 
         # Get the requested user's key using the provided email
-        user_key = self.get_user_by_email(email=email).organizer_key
+        user_key = self.get_user_by_email(email=email).key
 
-        base_url = f"https://api.getgo.com/G2M/rest/organizers/{user_key}"
+        self.set_user_status(user_key=user_key, status="suspended")
 
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": self._config["access_token"]
-        }
+        return self.get_user_by_email(email=email, use_directory=False)
+
+    def set_user_status(self, user_key: str, status: str, product: str = "G2M"):
+        """
+        Suspend or reactivate a user with a single request
+        :param user_key: Key of the user
+        :param status: "suspended" or "active"
+        :param product: Product the status applies to
+        """
+        base_url = f"/G2M/rest/organizers/{user_key}"
 
         data = {
-            "status": "suspended",
-            "productType": "G2M"
+            "status": status,
+            "productType": product
         }
 
-        r = requests.put(url=base_url, headers=headers, json=data)
+        r = self._request("PUT", base_url, json=data)
 
         if r.status_code != 204:
             raise self._manage_exceptions(r.status_code)(r.text)
 
-        return self.get_user_by_email(email=email)
+        if self.directory is not None:
+            self.directory.remove(user_key)
 
     def update_user_products(self, email: str, products: List[str]) -> UserResponse:
 
-        self._refresh_tokens()
+        user_key = self.get_user_by_email(email=email).key
 
-        user_key = self.get_user_by_email(email=email).organizer_key
-
-        base_url = f"https://api.getgo.com/G2M/rest/organizers/{user_key}"
-
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": self._config["access_token"]
-        }
+        base_url = f"/G2M/rest/organizers/{user_key}"
 
         for product in products:
             data = {
                 "productType": str(product)
             }
 
-            r = requests.put(url=base_url, headers=headers, json=data)
+            r = self._request("PUT", base_url, json=data)
 
             if r.status_code != 204:
                 raise self._manage_exceptions(r.status_code)(r.text)
 
-        return self.get_user_by_email(email=email)
+        return self.get_user_by_email(email=email, use_directory=False)
 
-    # MANAGE EXCEPTIONS
+    # RECONCILIATION
 ########################################################################################################################
+    def reconcile_users(self, desired: Iterable[Union[DesiredUser, Dict]], dry_run: bool = False,
+                        suspend_missing: bool = False, workers: int = 8,
+                        requests_per_second: Optional[float] = None) -> Tuple[Plan, List[BulkResult]]:
+        """
+        Bring the account's users, products and groups in line with a desired state, writing only the differences
+        :param desired: Iterable of DesiredUser, or dicts with "email", "first_name", "last_name" and optionally
+        "products", "group_name", "active" and "key"
+        :param dry_run: Plan and report the actions without writing anything
+        :param suspend_missing: Suspend active users that are absent from the desired state
+        :param workers: Number of writes run at the same time
+        :param requests_per_second: Optional cap on the rate of writes across all workers
+        :return: The Plan and a BulkResult per action in plan order; failures are reported, not raised
+        """
+        reconciler = Reconciler(manager=self, suspend_missing=suspend_missing, workers=workers,
+                                requests_per_second=requests_per_second)
+        return reconciler.reconcile(desired, dry_run=dry_run)
 
-    def _manage_exceptions(self, code):
-        exceptions = {
-            400: HTTPError400,
-            403: HTTPError403,
-            404: HTTPError404,
-            409: HTTPError409,
-            500: HTTPError500,
-            502: HTTPError502,
-        }
-        return exceptions[code]
+    # TRANSPORT
+########################################################################################################################
+
+    def enable_metrics(self, collector: Optional[MetricsCollector] = None) -> MetricsCollector:
+        """
+        Attach a MetricsCollector to the Manager's instrumentation, creating the instrumentation if needed
+        :param collector: Collector to attach, e.g. one shared by several Managers. Defaults to a new one
+        :return: The attached MetricsCollector; call export_prometheus() or snapshot() on it
+        """
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation()
+
+        return (collector if collector is not None else MetricsCollector()).attach(self.instrumentation)
+
+    @property
+    def retry_stats(self) -> Dict[str, float]:
+        """
+        Counters of the transport's retry engine: requests, attempts, retries, failures, rejected, backoff_time and
+        elapsed
+        """
+        return self._transport.retry_stats.snapshot()
 
+    def close(self):
+        """
+        Stop background token renewal and close the pooled connections held by the transport
+        """
+        self._tokens.close()
+        self._transport.close()
+
+    # MANAGE EXCEPTIONS
+########################################################################################################################
+
+    @staticmethod
+    def _manage_exceptions(code):
+        return exception_for_status(code)
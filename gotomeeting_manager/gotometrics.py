@@ -0,0 +1,205 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_ENDPOINT_PARTS = (
+    (re.compile(r"^https?://[^/]+"), ""),
+    (re.compile(r"\?.*$"), ""),
+    (re.compile(r"/accounts/[^/]+"), "/accounts/{account}"),
+    (re.compile(r"/(users|organizers|groups)/[^/]+"), r"/\1/{key}"),
+)
+
+
+def endpoint_name(path: str) -> str:
+    """
+    Turn a request path or URL into a low-cardinality endpoint name by replacing account and resource keys with
+    placeholders, e.g. /admin/rest/v1/accounts/{account}/users/{key}
+    """
+    for pattern, replacement in _ENDPOINT_PARTS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+class RequestEvent(NamedTuple):
+    """
+    What happened on one Manager API call
+    """
+    endpoint: str
+    method: str
+    status: Optional[int]
+    latency: float
+    response_bytes: int
+    retries: int
+    token_refreshed: bool
+    error: Optional[Exception] = None
+
+
+class Instrumentation:
+    """
+    Pre/post request hooks for Manager API calls.
+
+    Before-hooks are called with (method, endpoint) as a call starts; after-hooks with a RequestEvent once it has
+    finished or failed. A Manager without instrumentation skips all of this.
+    """
+
+    def __init__(self):
+        self._before: List[Callable[[str, str], None]] = []
+        self._after: List[Callable[[RequestEvent], None]] = []
+        self._on_token_refresh: List[Callable[[], None]] = []
+
+    def add_hooks(self, before: Optional[Callable[[str, str], None]] = None,
+                  after: Optional[Callable[[RequestEvent], None]] = None,
+                  on_token_refresh: Optional[Callable[[], None]] = None):
+        if before is not None:
+            self._before.append(before)
+        if after is not None:
+            self._after.append(after)
+        if on_token_refresh is not None:
+            self._on_token_refresh.append(on_token_refresh)
+
+    def before_request(self, method: str, endpoint: str):
+        for hook in self._before:
+            hook(method, endpoint)
+
+    def after_request(self, event: RequestEvent):
+        for hook in self._after:
+            hook(event)
+
+    def token_refreshed(self):
+        for hook in self._on_token_refresh:
+            hook()
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus style
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append(("+Inf" if bound == float("inf") else f"{bound:g}", total))
+        return result
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class MetricsCollector:
+    """
+    Built-in after-hook that aggregates request counters, latency histograms, bytes received, retries and token
+    refreshes per endpoint and method. export_prometheus() renders them in the Prometheus text format; snapshot()
+    returns plain data points for other collectors, e.g. an OpenTelemetry bridge.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, prefix: str = "goto"):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+        self._bytes: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._retries: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._errors: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._token_refreshes = 0
+
+    def attach(self, instrumentation: Instrumentation) -> "MetricsCollector":
+        instrumentation.add_hooks(after=self.record, on_token_refresh=self.record_token_refresh)
+        return self
+
+    def record(self, event: RequestEvent):
+        key = (event.endpoint, event.method)
+        with self._lock:
+            status = str(event.status) if event.status is not None else "error"
+            self._requests[key + (status,)] += 1
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = Histogram(self.buckets)
+            histogram.observe(event.latency)
+            self._bytes[key] += event.response_bytes
+            self._retries[key] += event.retries
+            if event.error is not None:
+                self._errors[key + (type(event.error).__name__,)] += 1
+
+    def record_token_refresh(self):
+        with self._lock:
+            self._token_refreshes += 1
+
+    # EXPORT
+########################################################################################################################
+    def snapshot(self) -> List[Dict]:
+        """
+        :return: One dict per data point with "name", "type", "labels" and "value" (a histogram's value is a dict of
+        "buckets", "sum" and "count")
+        """
+        p = self.prefix
+        with self._lock:
+            points = [{"name": f"{p}_requests_total", "type": "counter",
+                       "labels": {"endpoint": endpoint, "method": method, "status": status}, "value": value}
+                      for (endpoint, method, status), value in self._requests.items()]
+            points += [{"name": f"{p}_request_duration_seconds", "type": "histogram",
+                        "labels": {"endpoint": endpoint, "method": method},
+                        "value": {"buckets": histogram.cumulative(), "sum": histogram.sum, "count": histogram.count}}
+                       for (endpoint, method), histogram in self._latency.items()]
+            points += [{"name": f"{p}_response_bytes_total", "type": "counter",
+                        "labels": {"endpoint": endpoint, "method": method}, "value": value}
+                       for (endpoint, method), value in self._bytes.items()]
+            points += [{"name": f"{p}_request_retries_total", "type": "counter",
+                        "labels": {"endpoint": endpoint, "method": method}, "value": value}
+                       for (endpoint, method), value in self._retries.items()]
+            points += [{"name": f"{p}_request_errors_total", "type": "counter",
+                        "labels": {"endpoint": endpoint, "method": method, "error": error}, "value": value}
+                       for (endpoint, method, error), value in self._errors.items()]
+            points.append({"name": f"{p}_token_refreshes_total", "type": "counter", "labels": {},
+                           "value": self._token_refreshes})
+        return points
+
+    def export_prometheus(self) -> str:
+        """
+        :return: The metrics in the Prometheus text exposition format
+        """
+        lines = []
+        typed = set()
+
+        for point in self.snapshot():
+            name, labels = point["name"], point["labels"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} {point['type']}")
+                typed.add(name)
+
+            if point["type"] != "histogram":
+                series = f"{name}{{{_labels(**labels)}}}" if labels else name
+                lines.append(f"{series} {point['value']}")
+                continue
+
+            value = point["value"]
+            for bound, count in value["buckets"]:
+                lines.append(f"{name}_bucket{{{_labels(**labels, le=bound)}}} {count}")
+            lines.append(f"{name}_sum{{{_labels(**labels)}}} {value['sum']}")
+            lines.append(f"{name}_count{{{_labels(**labels)}}} {value['count']}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,333 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, TYPE_CHECKING
+
+from gotomeeting_manager.gotolicenses import granted_products
+from gotomeeting_manager.gotoresponses import UserResponse, GroupResponse
+
+if TYPE_CHECKING:
+    from gotomeeting_manager.gotomanager import Manager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    key TEXT PRIMARY KEY,
+    email TEXT,
+    email_lower TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    status TEXT,
+    group_key TEXT,
+    group_name TEXT,
+    data TEXT NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_email_lower ON users (email_lower);
+CREATE INDEX IF NOT EXISTS users_status ON users (status);
+CREATE INDEX IF NOT EXISTS users_group_key ON users (group_key);
+
+CREATE TABLE IF NOT EXISTS user_products (
+    user_key TEXT NOT NULL,
+    product TEXT NOT NULL,
+    PRIMARY KEY (user_key, product)
+);
+CREATE INDEX IF NOT EXISTS user_products_product ON user_products (product);
+
+CREATE TABLE IF NOT EXISTS groups (
+    key TEXT PRIMARY KEY,
+    name TEXT,
+    data TEXT NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS groups_name ON groups (name);
+
+CREATE TABLE IF NOT EXISTS licenses (
+    product TEXT PRIMARY KEY,
+    license_key TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# API filter field -> indexed users column, compared case-insensitively like the API's (?i) filters
+_USER_FILTER_COLUMNS = {
+    "key": "key",
+    "email": "email_lower",
+    "status": "status",
+    "groupKey": "group_key",
+    "groupName": "group_name",
+    "firstName": "first_name",
+    "lastName": "last_name",
+}
+
+_GROUP_FILTER_COLUMNS = {
+    "groupKey": "key",
+    "groupName": "name",
+}
+
+
+class SyncStats(NamedTuple):
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int
+
+
+def _digest(data: Dict) -> str:
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class DirectoryMirror:
+    """
+    On-disk SQLite mirror of the account's users, groups and licenses.
+
+    sync() walks the API and rewrites only the rows whose content changed, deleting rows that disappeared. Reads are
+    answered from indexed columns. A Manager with an attached mirror serves get_users/get_groups from it while the
+    last sync is at most `max_staleness` seconds old.
+    """
+
+    def __init__(self, path: str, max_staleness: float = 300):
+        """
+        :param path: SQLite database file
+        :param max_staleness: Seconds after a sync during which the Manager answers reads from the mirror
+        """
+        self.path = path
+        self.max_staleness = max_staleness
+
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    # STATE
+########################################################################################################################
+    @property
+    def synced_at(self) -> Optional[float]:
+        """
+        Wall-clock time of the last completed sync, as a UNIX timestamp
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM meta WHERE name = 'synced_at'").fetchone()
+        return float(row[0]) if row is not None else None
+
+    @property
+    def age(self) -> Optional[float]:
+        synced_at = self.synced_at
+        return None if synced_at is None else time.time() - synced_at
+
+    def is_fresh(self, max_staleness: Optional[float] = None) -> bool:
+        age = self.age
+        bound = self.max_staleness if max_staleness is None else max_staleness
+        return age is not None and age <= bound
+
+    # SYNC
+########################################################################################################################
+    def sync(self, manager: "Manager", page_size: int = 100) -> Dict[str, SyncStats]:
+        """
+        Bring the mirror up to date with the API, rewriting only changed rows
+        :param manager: Manager used to walk the API
+        :param page_size: Page size used while walking users and groups
+        :return: SyncStats per table
+        """
+        stats = {
+            "users": self._sync_users(manager.iter_items(resource="users", page_size=page_size)),
+            "groups": self._sync_groups(manager.iter_items(resource="groups", page_size=page_size)),
+        }
+        self._sync_licenses(manager.get_license_codes(use_cache=False))
+
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('synced_at', ?)",
+                                     (str(time.time()),))
+
+        return stats
+
+    def _write_users(self, batch: List[Dict]):
+        rows, products = [], []
+        for user in batch:
+            email = user.get("email")
+            rows.append((user.get("key"), email, email.lower() if email is not None else None,
+                         user.get("firstName"), user.get("lastName"), user.get("status"), user.get("groupKey"),
+                         user.get("groupName"), json.dumps(user), _digest(user)))
+            products.extend((user.get("key"), product) for product in user.get("products") or [])
+
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO users (key, email, email_lower, first_name, last_name, status, group_key, "
+            "group_name, data, hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._connection.executemany("DELETE FROM user_products WHERE user_key = ?",
+                                     [(user.get("key"),) for user in batch])
+        self._connection.executemany("INSERT OR IGNORE INTO user_products (user_key, product) VALUES (?, ?)",
+                                     products)
+
+    def _delete_users(self, keys: List[tuple]):
+        self._connection.executemany("DELETE FROM users WHERE key = ?", keys)
+        self._connection.executemany("DELETE FROM user_products WHERE user_key = ?", keys)
+
+    def _sync_users(self, users: Iterable[Dict]) -> SyncStats:
+        return self._sync_table("users", "key", users, self._write_users, self._delete_users)
+
+    def _sync_groups(self, groups: Iterable[Dict]) -> SyncStats:
+        def write(batch: List[Dict]):
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO groups (key, name, data, hash) VALUES (?, ?, ?, ?)",
+                [(group.get("groupKey"), group.get("groupName"), json.dumps(group), _digest(group))
+                 for group in batch])
+
+        def delete(keys: List[tuple]):
+            self._connection.executemany("DELETE FROM groups WHERE key = ?", keys)
+
+        return self._sync_table("groups", "groupKey", groups, write, delete)
+
+    def _sync_table(self, table: str, key_field: str, items: Iterable[Dict], write, delete,
+                    batch_size: int = 500) -> SyncStats:
+        """
+        Diff a stream of API items against the stored row hashes, writing changed rows in batches
+        """
+        with self._lock:
+            hashes = dict(self._connection.execute(f"SELECT key, hash FROM {table}"))
+
+        inserted = updated = unchanged = 0
+        seen = set()
+        batch = []
+
+        for item in items:
+            key = item.get(key_field)
+            seen.add(key)
+
+            if hashes.get(key) == _digest(item):
+                unchanged += 1
+                continue
+
+            if key in hashes:
+                updated += 1
+            else:
+                inserted += 1
+
+            batch.append(item)
+            if len(batch) >= batch_size:
+                with self._lock, self._connection:
+                    write(batch)
+                batch = []
+
+        deleted = [(key,) for key in hashes if key not in seen]
+
+        with self._lock, self._connection:
+            if batch:
+                write(batch)
+            delete(deleted)
+
+        return SyncStats(inserted=inserted, updated=updated, deleted=len(deleted), unchanged=unchanged)
+
+    def _sync_licenses(self, licenses: Dict[str, str]):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM licenses")
+            self._connection.executemany("INSERT INTO licenses (product, license_key) VALUES (?, ?)",
+                                         list(licenses.items()))
+
+    # WRITES
+########################################################################################################################
+    def upsert_user(self, user_key: str, fields: Dict, replace: bool = False):
+        """
+        Apply a write made through the Manager to a single user row, without waiting for the next sync
+        :param user_key: Key of the written user
+        :param fields: User fields as named in the API
+        :param replace: Replace the stored user instead of merging the fields into it
+        """
+        with self._lock, self._connection:
+            row = None if replace else \
+                self._connection.execute("SELECT data FROM users WHERE key = ?", (user_key,)).fetchone()
+            user = json.loads(row[0]) if row is not None else {}
+            user.update(fields)
+            user["key"] = user_key
+            self._write_users([user])
+
+    def delete_user(self, user_key: str):
+        with self._lock, self._connection:
+            self._delete_users([(user_key,)])
+
+    def products_for_licenses(self, license_keys: Iterable[str]) -> List[str]:
+        """
+        Invert the mirrored product -> license map, so a license write can update a row's products
+        """
+        license_keys = set(license_keys)
+        return sorted(granted_products(product for product, license_key in self.get_license_codes().items()
+                                       if license_key in license_keys))
+
+    # QUERIES
+########################################################################################################################
+    @staticmethod
+    def _where(filter_values: Optional[Dict], columns: Dict[str, str]) -> Optional[tuple]:
+        """
+        Translate simple equality and IN-list filters onto indexed columns
+        :return: (clause, parameters), or None if a filter cannot be answered from the mirror
+        """
+        if not filter_values:
+            return "", []
+
+        clauses, parameters = [], []
+        for field, value in filter_values.items():
+            column = columns.get(field)
+            if column is None:
+                return None
+
+            # A list of values matches any of them, like the API's IN-list filters
+            values = list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+            if not values:
+                return None
+            placeholders = ", ".join("?" * len(values))
+
+            if column == "email_lower":
+                clauses.append(f"email_lower IN ({placeholders})")
+                parameters.extend(str(item).lower() for item in values)
+            else:
+                clauses.append(f"{column} COLLATE NOCASE IN ({placeholders})")
+                parameters.extend(str(item) for item in values)
+
+        return " WHERE " + " AND ".join(clauses), parameters
+
+    def supports(self, filter_values: Optional[Dict], resource: str = "users") -> bool:
+        columns = _USER_FILTER_COLUMNS if resource == "users" else _GROUP_FILTER_COLUMNS
+        return filter_values is None or (isinstance(filter_values, dict) and
+                                         self._where(filter_values, columns) is not None)
+
+    def get_users(self, page_size: int = 25, offset: int = 0,
+                  filter_values: Optional[Dict] = None) -> List[UserResponse]:
+        where, parameters = self._where(filter_values, _USER_FILTER_COLUMNS)
+
+        # Pages are ordered by key: INSERT OR REPLACE gives a rewritten row a new rowid, so rowid order would move a
+        # changed user past the page a caller is about to read
+        with self._lock:
+            rows = self._connection.execute(f"SELECT data FROM users{where} ORDER BY key LIMIT ? OFFSET ?",
+                                            parameters + [page_size, offset]).fetchall()
+
+        return [UserResponse.create_from_dict(user_data=json.loads(row[0])) for row in rows]
+
+    def get_users_with_product(self, product: str) -> List[UserResponse]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT users.data FROM users JOIN user_products ON users.key = user_products.user_key "
+                "WHERE user_products.product = ? ORDER BY users.key", (product,)).fetchall()
+
+        return [UserResponse.create_from_dict(user_data=json.loads(row[0])) for row in rows]
+
+    def get_groups(self, page_size: int = 25, offset: int = 0,
+                   filter_values: Optional[Dict] = None) -> List[GroupResponse]:
+        where, parameters = self._where(filter_values, _GROUP_FILTER_COLUMNS)
+
+        with self._lock:
+            rows = self._connection.execute(f"SELECT data FROM groups{where} ORDER BY key LIMIT ? OFFSET ?",
+                                            parameters + [page_size, offset]).fetchall()
+
+        return [GroupResponse.create_from_dict(group_data=json.loads(row[0])) for row in rows]
+
+    def get_license_codes(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._connection.execute("SELECT product, license_key FROM licenses"))
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,241 @@
+import email.utils
+import re
+import threading
+import time
+
+from typing import Dict, Mapping, NamedTuple, Optional
+
+
+class RateLimit(NamedTuple):
+    """
+    Ceiling for one endpoint family: a sustained `rate` in requests per second with bursts of up to `burst` requests
+    """
+    rate: float
+    burst: int
+
+
+# Endpoint family -> ceiling. The API's published limits are per account, so the ceilings are deliberately modest
+DEFAULT_LIMITS: Dict[str, RateLimit] = {
+    "users": RateLimit(rate=10, burst=20),
+    "licenses": RateLimit(rate=5, burst=5),
+    "groups": RateLimit(rate=5, burst=10),
+    "organizers": RateLimit(rate=5, burst=10),
+    "oauth": RateLimit(rate=1, burst=5),
+    "default": RateLimit(rate=5, burst=10),
+}
+
+_FAMILIES = (
+    (re.compile(r"/oauth/"), "oauth"),
+    (re.compile(r"/admin/rest/v\d+/accounts/[^/]+/users"), "users"),
+    (re.compile(r"/admin/rest/v\d+/accounts/[^/]+/licenses"), "licenses"),
+    (re.compile(r"/admin/rest/v\d+/accounts/[^/]+/groups"), "groups"),
+    (re.compile(r"/G2M/rest/"), "organizers"),
+)
+
+
+def endpoint_family(path: str) -> str:
+    """
+    Classify a request path or URL into the endpoint family whose bucket it draws from
+    """
+    for pattern, family in _FAMILIES:
+        if pattern.search(path):
+            return family
+    return "default"
+
+
+def _header(headers: Mapping[str, str], *names: str) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait according to a Retry-After header, which is either a number of seconds or an HTTP date
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _reset_delay(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds until a rate-limit window resets. Servers send either a delay or a UNIX timestamp
+    """
+    if value is None:
+        return None
+    try:
+        reset = float(value)
+    except ValueError:
+        return None
+    if reset > 1e9:
+        reset -= time.time()
+    return max(reset, 0.0)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. The sustained rate adapts to the server: it is halved on every 429 and recovers
+    additively on successful responses, up to the configured ceiling.
+    """
+
+    def __init__(self, rate: float, burst: int, min_rate: float = 0.1, recovery: float = 0.05):
+        """
+        :param rate: Ceiling on the sustained rate, in requests per second
+        :param burst: Bucket capacity
+        :param min_rate: Floor the rate is never backed off below
+        :param recovery: Fraction of the ceiling regained per successful response after a back-off
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min(min_rate, rate)
+        self.recovery = recovery
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if now > self._updated:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self) -> float:
+        """
+        Take a token, possibly on credit
+        :return: Seconds the caller must wait before sending its request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            delay = max(self._updated - now, 0.0)
+            if self._tokens < 0:
+                delay += -self._tokens / self.rate
+            return delay
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float):
+        """
+        Hand out no tokens for the next `seconds`, e.g. as instructed by a Retry-After header
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, now + seconds)
+
+    def limit_remaining(self, remaining: float, reset: Optional[float]):
+        """
+        Align the bucket with the server's view of the current window
+        :param remaining: Requests the server still allows in this window
+        :param reset: Seconds until the window resets, if known
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, remaining)
+        if remaining <= 0 and reset:
+            self.pause(reset)
+
+    def back_off(self):
+        with self._lock:
+            self.rate = max(self.rate / 2, self.min_rate)
+
+    def recover(self):
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.rate + self.max_rate * self.recovery, self.max_rate)
+
+
+class RateLimiter:
+    """
+    Client-side rate limiter with one TokenBucket per endpoint family.
+
+    By default every Transport and AsyncManager in the process uses the same limiter (see shared()), so threads and
+    Manager instances draw from common buckets. Responses feed back into the buckets: Retry-After pauses a family,
+    rate-limit headers cap its remaining tokens and every 429 halves its sustained rate.
+    """
+
+    _shared: Optional["RateLimiter"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, limits: Optional[Mapping[str, RateLimit]] = None, default_retry_after: float = 1.0):
+        """
+        :param limits: Endpoint family -> RateLimit, overriding DEFAULT_LIMITS family by family
+        :param default_retry_after: Pause applied on a 429 that carries no Retry-After header
+        """
+        merged = dict(DEFAULT_LIMITS)
+        if limits is not None:
+            merged.update(limits)
+
+        self.default_retry_after = default_retry_after
+        self._buckets = {family: TokenBucket(rate=limit.rate, burst=limit.burst) for family, limit in merged.items()}
+
+    @classmethod
+    def shared(cls) -> "RateLimiter":
+        """
+        The process-wide limiter used by default
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def bucket(self, path: str) -> TokenBucket:
+        family = endpoint_family(path)
+        return self._buckets.get(family) or self._buckets["default"]
+
+    def reserve(self, path: str) -> float:
+        """
+        Take a token for a request to `path` without blocking, for callers that wait asynchronously
+        :return: Seconds to wait before sending the request
+        """
+        return self.bucket(path).reserve()
+
+    def acquire(self, path: str):
+        """
+        Block until a request to `path` may be sent
+        """
+        self.bucket(path).acquire()
+
+    def observe(self, path: str, status: int, headers: Mapping[str, str]) -> Optional[float]:
+        """
+        Feed a response back into the bucket of its endpoint family
+        :return: For a 429, the number of seconds the family is paused; otherwise None
+        """
+        bucket = self.bucket(path)
+
+        remaining = _header(headers, "X-RateLimit-Remaining", "RateLimit-Remaining")
+        if remaining is not None:
+            try:
+                bucket.limit_remaining(float(remaining),
+                                       _reset_delay(_header(headers, "X-RateLimit-Reset", "RateLimit-Reset")))
+            except ValueError:
+                pass
+
+        if status != 429:
+            bucket.recover()
+            return None
+
+        delay = _retry_after(headers.get("Retry-After"))
+        if delay is None:
+            delay = self.default_retry_after
+
+        bucket.back_off()
+        bucket.pause(delay)
+        return delay
@@ -0,0 +1,434 @@
+import logging
+from collections import Counter
+
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union, TYPE_CHECKING
+
+from gotomeeting_manager.gotobulk import BulkResult, RequestBudget, run_bulk
+from gotomeeting_manager.gotoexceptions import DependencyFailedError, GroupNotFoundError, ReconcileError
+from gotomeeting_manager.gotogroups import GroupIndex
+from gotomeeting_manager.gotolicenses import granted_products, resolve_product_licenses
+from gotomeeting_manager.gotoresponses import UserResponse
+
+if TYPE_CHECKING:
+    from gotomeeting_manager.gotomanager import Manager
+
+logger = logging.getLogger(__name__)
+
+CREATE = "create"
+UPDATE = "update"
+LICENSES = "licenses"
+SUSPEND = "suspend"
+ACTIVATE = "activate"
+
+
+def parse_products(products: Union[str, Iterable[str], None]) -> Tuple[str, ...]:
+    """
+    Normalise a product list given as a sequence or as a comma- or semicolon-separated string
+    """
+    if products is None:
+        return ()
+    if isinstance(products, str):
+        products = products.replace(";", ",").split(",")
+    return tuple(product.strip() for product in products if product and product.strip())
+
+
+class DesiredUser(NamedTuple):
+    """
+    A user as the source of truth wants it to exist. Users are matched to the live directory by `key` when it is
+    given (which lets the email change), otherwise by email, case-insensitively.
+    """
+    email: str
+    first_name: str
+    last_name: str
+    products: Tuple[str, ...] = ("G2M",)
+    group_name: Optional[str] = None
+    active: bool = True
+    key: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DesiredUser":
+        """
+        Build from a dict using either the attribute names or the API's JSON names (firstName, lastName, groupName)
+        :raises ReconcileError: If the email, first name or last name is missing
+        """
+        first_name = data.get("first_name", data.get("firstName"))
+        last_name = data.get("last_name", data.get("lastName"))
+        if not data.get("email") or not first_name or not last_name:
+            raise ReconcileError(f"{data.get('email') or 'A row'} needs an email, a first name and a last name")
+
+        products = parse_products(data.get("products")) or ("G2M",)
+
+        active = data.get("active", True)
+        if isinstance(active, str):
+            active = active.strip().lower() not in ("", "0", "false", "no", "suspended")
+
+        return cls(email=data["email"], first_name=first_name, last_name=last_name, products=products,
+                   group_name=data.get("group_name", data.get("groupName")) or None, active=bool(active),
+                   key=data.get("key") or None)
+
+
+class Action(NamedTuple):
+    """
+    One write of a reconciliation plan.
+
+    `fields` holds the user fields to write, named as in the API, and `products` the full product list for license
+    changes (None if the licenses stay). Actions of the same `level` are independent of each other; an action only
+    runs once every action in `depends_on` (indexes into the plan) has succeeded.
+    """
+    kind: str
+    email: str
+    user_key: Optional[str] = None
+    fields: Optional[Dict] = None
+    products: Optional[Tuple[str, ...]] = None
+    depends_on: Tuple[int, ...] = ()
+    level: int = 0
+
+
+class Plan:
+    """
+    The minimal set of writes that turns the live directory into the desired state, plus the desired users that
+    could not be planned (unknown groups or products, duplicates, email swaps) in `errors`
+    """
+
+    def __init__(self, actions: List[Action], errors: List[Tuple[object, Exception]], unchanged: int):
+        self.actions = actions
+        self.errors = errors
+        self.unchanged = unchanged
+
+    def levels(self) -> List[List[int]]:
+        """
+        :return: Action indexes grouped by level, in the order the levels run
+        """
+        levels: Dict[int, List[int]] = {}
+        for index, action in enumerate(self.actions):
+            levels.setdefault(action.level, []).append(index)
+        return [levels[level] for level in sorted(levels)]
+
+    def summary(self) -> Dict[str, int]:
+        """
+        :return: Number of actions per kind, plus "unchanged" and "errors"
+        """
+        counts = Counter(action.kind for action in self.actions)
+        return dict(counts, unchanged=self.unchanged, errors=len(self.errors))
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def __iter__(self) -> Iterator[Action]:
+        return iter(self.actions)
+
+
+def _is_active(user: UserResponse) -> bool:
+    return (user.status or "ACTIVE").upper() != "SUSPENDED"
+
+
+class Reconciler:
+    """
+    Desired-state reconciliation of users, products and groups.
+
+    plan() diffs a stream of desired users against the live directory (one full walk of the users plus the license
+    and group catalogs) and produces only the writes needed: creates, field updates, license changes, suspensions and
+    reactivations. apply() runs a plan on a worker pool. Writes that free license seats run before writes that take
+    them, and a user that takes over another user's email waits until that user has been renamed.
+    """
+
+    def __init__(self, manager: "Manager", suspend_missing: bool = False, workers: int = 8,
+                 requests_per_second: Optional[float] = None, page_size: int = 100):
+        """
+        :param manager: Manager used to read the live directory and write the changes
+        :param suspend_missing: Suspend active live users that are absent from the desired state. Users named by a
+        row that failed validation are never suspended, and nothing is if such a row names no user at all
+        :param workers: Number of writes run at the same time
+        :param requests_per_second: Optional cap on the rate of writes across all workers
+        :param page_size: Page size used while reading the live directory
+        """
+        self._manager = manager
+        self.suspend_missing = suspend_missing
+        self.workers = workers
+        self.requests_per_second = requests_per_second
+        self.page_size = page_size
+
+    # PLAN
+########################################################################################################################
+    def plan(self, desired: Iterable[Union[DesiredUser, Dict]]) -> Plan:
+        """
+        Diff the desired state against the live directory
+        :param desired: Iterable of DesiredUser or dicts accepted by DesiredUser.from_dict
+        :return: The Plan
+        """
+        live = self._manager.fetch_all_users(page_size=self.page_size)
+        by_key = {user.key: user for user in live}
+        by_email = {user.email.lower(): user for user in live if user.email is not None}
+        licenses = self._manager.get_license_codes()
+        groups = self._manager.group_index
+        if groups is None:
+            groups = GroupIndex(manager=self._manager, max_age=None, page_size=self.page_size)
+
+        actions: List[Action] = []
+        errors: List[Tuple[object, Exception]] = []
+        valid, seen_emails = [], set()
+        unchanged = 0
+
+        for record in desired:
+            try:
+                user = record if isinstance(record, DesiredUser) else DesiredUser.from_dict(record)
+                if not user.first_name or not user.last_name:
+                    raise ReconcileError(f"{user.email} needs a first name and a last name")
+                if user.email.lower() in seen_emails:
+                    raise ReconcileError(f"{user.email} is listed more than once")
+                seen_emails.add(user.email.lower())
+
+                license_keys = resolve_product_licenses(products=list(user.products), all_licenses=licenses)
+                group_key = None
+                if user.group_name is not None:
+                    group_key = groups.group_key(user.group_name)
+                    if group_key is None:
+                        raise GroupNotFoundError(user.group_name)
+            except (AssertionError, KeyError, ReconcileError, GroupNotFoundError) as e:
+                errors.append((record, e))
+                continue
+            valid.append((user, sorted(license_keys), group_key))
+
+        # Users matched by key take precedence, so a user renamed away from an email does not also match the desired
+        # user that now has it
+        matched = {user.key for user, _, _ in valid if user.key in by_key}
+
+        # A row that failed validation still names a user who is meant to exist; never plan to suspend them
+        unidentified = False
+        for record, _ in errors:
+            current = self._live_user(record, by_key, by_email)
+            if current is not None:
+                matched.add(current.key)
+            elif not self._names_user(record):
+                unidentified = True
+
+        for user, license_keys, group_key in valid:
+            if user.key is not None:
+                current = by_key.get(user.key)
+            else:
+                current = by_email.get(user.email.lower())
+                if current is not None and current.key in matched:
+                    current = None
+
+            if current is None:
+                if user.active:
+                    actions.append(Action(kind=CREATE, email=user.email,
+                                          fields={"firstName": user.first_name, "lastName": user.last_name,
+                                                  **({"groupKey": group_key} if group_key else {})},
+                                          products=user.products))
+                else:
+                    unchanged += 1
+                continue
+
+            matched.add(current.key)
+            planned = self._diff(user, current, license_keys, group_key)
+            actions.extend(planned)
+            unchanged += not planned
+
+        if self.suspend_missing and unidentified:
+            errors.append((None, ReconcileError("Not suspending missing users: a row with errors names no user")))
+        elif self.suspend_missing:
+            actions.extend(Action(kind=SUSPEND, email=user.email, user_key=user.key) for user in live
+                           if user.key not in matched and _is_active(user))
+
+        return self._order(actions, errors, unchanged, by_email)
+
+    @staticmethod
+    def _identity(record) -> Tuple[Optional[str], Optional[str]]:
+        if isinstance(record, DesiredUser):
+            return record.key, record.email
+        if isinstance(record, dict):
+            key, email = record.get("key"), record.get("email")
+            return (str(key) if key else None), (email if isinstance(email, str) and email else None)
+        return None, None
+
+    @classmethod
+    def _names_user(cls, record) -> bool:
+        return any(cls._identity(record))
+
+    @classmethod
+    def _live_user(cls, record, by_key: Dict[str, UserResponse],
+                   by_email: Dict[str, UserResponse]) -> Optional[UserResponse]:
+        key, email = cls._identity(record)
+        if key is not None and key in by_key:
+            return by_key[key]
+        return by_email.get(email.lower()) if email is not None else None
+
+    @staticmethod
+    def _diff(user: DesiredUser, current: UserResponse, license_keys: List[str],
+              group_key: Optional[str]) -> List[Action]:
+        if not user.active:
+            return [Action(kind=SUSPEND, email=current.email, user_key=current.key)] if _is_active(current) else []
+
+        actions = []
+        if not _is_active(current):
+            actions.append(Action(kind=ACTIVATE, email=user.email, user_key=current.key))
+
+        fields = {}
+        if user.first_name is not None and user.first_name != current.first_name:
+            fields["firstName"] = user.first_name
+        if user.last_name is not None and user.last_name != current.last_name:
+            fields["lastName"] = user.last_name
+        if group_key is not None and group_key != current.group_key:
+            fields["groupKey"] = group_key
+        if (current.email or "").lower() != user.email.lower():
+            # update_user needs a field besides the email, so a rename rewrites the first name as well
+            fields.setdefault("firstName", user.first_name if user.first_name is not None else current.first_name)
+            fields["email"] = user.email
+
+        # Several licenses can grant the same product, so products are compared where the API reports them, with
+        # the meetings product that webinar and training licenses include
+        if current.products is not None:
+            products = user.products if granted_products(current.products) != granted_products(user.products) \
+                else None
+        else:
+            products = user.products if sorted(current.license_keys or ()) != license_keys else None
+
+        if fields or products is not None:
+            # A single PUT carries both the field and the license changes
+            actions.append(Action(kind=UPDATE if fields else LICENSES, email=user.email, user_key=current.key,
+                                  fields=fields, products=products))
+
+        return actions
+
+    def _order(self, actions: List[Action], errors: List[Tuple[object, Exception]], unchanged: int,
+               by_email: Dict[str, UserResponse]) -> Plan:
+        """
+        Work out dependencies and levels: writes that free license seats come first, and a write that claims an
+        email waits for the write that renames its current holder
+        """
+        keys_by_email = {email: user.key for email, user in by_email.items()}
+        renames = {}
+        for index, action in enumerate(actions):
+            if action.kind in (UPDATE, LICENSES) and "email" in action.fields:
+                renames[action.user_key] = index
+
+        def releases_seats(action: Action) -> bool:
+            return action.kind == SUSPEND or (action.products is not None and action.kind != CREATE)
+
+        seat_barrier = 1 if any(releases_seats(action) for action in actions) else 0
+
+        dependencies = []
+        for action in actions:
+            depends_on = ()
+            holder = keys_by_email.get(action.email.lower())
+            if action.kind in (CREATE, UPDATE) and holder is not None and holder != action.user_key:
+                if holder not in renames:
+                    errors.append((action, ReconcileError(f"{action.email} belongs to user {holder}, who keeps it")))
+                    depends_on = None
+                else:
+                    depends_on = (renames[holder],)
+            dependencies.append(depends_on)
+
+        levels: Dict[int, int] = {}
+
+        def level(index: int, visiting: frozenset) -> Optional[int]:
+            if index in levels:
+                return levels[index]
+            depends_on = dependencies[index]
+            if depends_on is None or index in visiting:
+                return None
+
+            action = actions[index]
+            result = seat_barrier if action.kind in (CREATE, ACTIVATE) else 0
+            for dependency in depends_on:
+                dependency_level = level(dependency, visiting | {index})
+                if dependency_level is None:
+                    return None
+                result = max(result, dependency_level + 1)
+
+            levels[index] = result
+            return result
+
+        kept, positions = [], {}
+        for index, action in enumerate(actions):
+            action_level = level(index, frozenset())
+            if action_level is None:
+                if dependencies[index] is not None:
+                    errors.append((action, ReconcileError(f"{action.email} cannot be ordered after the change that "
+                                                          f"frees it")))
+                continue
+            positions[index] = len(kept)
+            kept.append((index, action_level))
+
+        planned = [actions[index]._replace(level=action_level, depends_on=tuple(positions[dependency]
+                                                                                for dependency in dependencies[index]))
+                   for index, action_level in kept]
+        return Plan(actions=planned, errors=errors, unchanged=unchanged)
+
+    # APPLY
+########################################################################################################################
+    def apply(self, plan: Plan, dry_run: bool = False) -> Iterator[BulkResult]:
+        """
+        Run a plan level by level, with the actions of each level running concurrently
+        :param plan: Plan from plan()
+        :param dry_run: Report every action as done without writing anything
+        :return: Iterator of BulkResult per action, where BulkResult.index is the action's index in the plan.
+        Actions whose dependencies failed are reported with a DependencyFailedError
+        """
+        failed = set()
+        budget = RequestBudget(requests_per_second=self.requests_per_second)
+
+        def run(index: int):
+            action = plan.actions[index]
+            if dry_run:
+                logger.info("Dry run", extra={"action": action.kind, "email": action.email})
+                return None
+
+            budget.acquire()
+            return self._execute(action)
+
+        for level in plan.levels():
+            runnable = []
+            for index in level:
+                blocked = [dependency for dependency in plan.actions[index].depends_on if dependency in failed]
+                if blocked:
+                    failed.add(index)
+                    yield BulkResult(index=index, item=plan.actions[index],
+                                     error=DependencyFailedError(f"Depends on failed action {blocked[0]}"))
+                else:
+                    runnable.append(index)
+
+            for result in run_bulk(run, runnable, workers=self.workers):
+                index = result.item
+                if not result.ok:
+                    failed.add(index)
+                yield result._replace(index=index, item=plan.actions[index])
+
+    def _execute(self, action: Action):
+        manager = self._manager
+
+        if action.kind == CREATE:
+            fields = dict(action.fields)
+            group_key = fields.pop("groupKey", None)
+            user = manager.create_user(first_name=fields["firstName"], last_name=fields["lastName"],
+                                       email=action.email, products=list(action.products), confirm=False)[0]
+            if group_key is not None:
+                manager.update_user(user.key, email=action.email, confirm=False, groupKey=group_key)
+            return user.key
+
+        if action.kind in (UPDATE, LICENSES):
+            fields = {name: value for name, value in action.fields.items() if name != "email"}
+            products = list(action.products) if action.products is not None else None
+            manager.update_user(action.user_key, email=action.email, products=products, confirm=False, **fields)
+            return action.user_key
+
+        if action.kind == SUSPEND:
+            manager.set_user_status(action.user_key, "suspended")
+            return action.user_key
+
+        if action.kind == ACTIVATE:
+            manager.set_user_status(action.user_key, "active")
+            return action.user_key
+
+        raise ReconcileError(f"Unknown action {action.kind!r}")
+
+    def reconcile(self, desired: Iterable[Union[DesiredUser, Dict]],
+                  dry_run: bool = False) -> Tuple[Plan, List[BulkResult]]:
+        """
+        plan() then apply()
+        :return: The plan and the result of every action, in plan order
+        """
+        plan = self.plan(desired)
+        results = sorted(self.apply(plan, dry_run=dry_run), key=lambda result: result.index)
+        return plan, results
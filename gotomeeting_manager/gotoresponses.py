@@ -1,83 +1,240 @@
+import sys
+
 import requests
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class _Field:
+    """
+    Descriptor for a response field. While the model still references its raw API dict, the value is read from that
+    dict on access; once the model is compacted it lives in a slot of its own.
+    """
+
+    __slots__ = ("name", "json_key", "default", "slot")
+
+    def __init__(self, name: str, json_key: str, default, slot):
+        self.name = name
+        self.json_key = json_key
+        self.default = default
+        self.slot = slot
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        raw = instance._raw
+        if raw is None:
+            return self.slot.__get__(instance, owner)
+
+        value = raw.get(self.json_key, _MISSING)
+        if value is _MISSING:
+            return instance._missing(self)
+        return value
+
+    def __set__(self, instance, value):
+        raw = instance._writable_raw()
+        if raw is None:
+            self.slot.__set__(instance, value)
+        else:
+            raw[self.json_key] = value
+
+
+class _ResponseModel:
+    """
+    Memory-compact base for API response models.
+
+    Models built with create_from_dict()/from_page() keep a reference to the decoded JSON dict and read fields from it
+    lazily, which makes construction O(1). compact() copies the fields into slots and releases the dict, which is the
+    smaller representation for objects that are held for a long time.
+    """
+
+    __slots__ = ("_raw",)
+
+    # (attribute, JSON key, default) per field, in to_tuple() order
+    _fields: Tuple[Tuple[str, str, object], ...] = ()
+    # Low-cardinality string fields whose values are interned when compacting, so users share one copy
+    _shared: Tuple[str, ...] = ()
+    _compact_fields: Tuple[Tuple[str, object, object, bool], ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "_fields" in cls.__dict__:
+            compact_fields = []
+            for name, json_key, default in cls._fields:
+                slot = getattr(cls, "_v_" + name)
+                setattr(cls, name, _Field(name, json_key, default, slot))
+                compact_fields.append((json_key, default, slot, name in cls._shared))
+            cls._compact_fields = tuple(compact_fields)
+
+    def __init__(self, **kwargs):
+        self._raw = None
+        for name, _, default in self._fields:
+            getattr(type(self), "_v_" + name).__set__(self, kwargs.get(name, default))
+
+    @classmethod
+    def _wrap(cls, data: Dict):
+        instance = cls.__new__(cls)
+        instance._raw = data
+        return instance
+
+    @classmethod
+    def from_page(cls, results: List[Dict], compact: bool = False) -> List:
+        """
+        Build models for every item of a page of results
+        :param results: The "results" list of an API response
+        :param compact: Decode every field now and release the raw dicts
+        :return: List of models
+        """
+        if compact:
+            return [cls._wrap(data).compact() for data in results]
+
+        new = cls.__new__
+        models = []
+        append = models.append
+        for data in results:
+            instance = new(cls)
+            instance._raw = data
+            append(instance)
+        return models
 
+    def _missing(self, field: _Field):
+        return field.default
 
-class UserResponse:
+    def _writable_raw(self) -> Optional[Dict]:
+        """
+        The raw dict may be shared with other models (callers coalesced onto one request, cached pages), so the first
+        write compacts the model instead of writing into it
+        :return: A dict owned by this model to write fields into, or None to write into the slots
+        """
+        self.compact()
+        return None
+
+    def compact(self):
+        """
+        Copy every field into a slot and drop the reference to the raw API dict
+        :return: self
+        """
+        raw = self._raw
+        if raw is not None:
+            self._raw = None
+            for json_key, default, slot, shared in self._compact_fields:
+                value = raw.get(json_key, default)
+                if shared and type(value) is str:
+                    value = sys.intern(value)
+                slot.__set__(self, value)
+        return self
+
+    def to_tuple(self) -> Tuple:
+        raw = self._raw
+        if raw is None:
+            return tuple([slot.__get__(self) for _, _, slot, _ in self._compact_fields])
+        return tuple([raw.get(json_key, default) for json_key, default, _, _ in self._compact_fields])
+
+    def to_dict(self) -> Dict:
+        return dict(zip([name for name, _, _ in self._fields], self.to_tuple()))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name, _, _ in self._fields)})"
+
+
+class UserResponse(_ResponseModel):
+
+    _fields = (
+        ("key", "key", None),
+        ("first_name", "firstName", None),
+        ("last_name", "lastName", None),
+        ("email", "email", None),
+        ("group_key", "groupKey", None),
+        ("group_name", "groupName", None),
+        ("locale", "locale", None),
+        ("license_keys", "licenseKeys", None),
+        ("products", "products", None),
+        ("admin", "admin", False),
+        ("status", "status", None),
+    )
+    _shared = ("group_key", "group_name", "locale", "status")
+    __slots__ = tuple("_v_" + name for name, _, _ in _fields)
 
     def __init__(self, key, first_name, last_name, email, admin, locale, license_keys, group_key, group_name, products,
                  status):
-        self.key = key
-        self.first_name = first_name
-        self.last_name = last_name
-        self.email = email
-        self.group_key = group_key
-        self.group_name = group_name
-        self.locale = locale
-        self.license_keys = license_keys
-        self.products = products
-        self.admin = admin
-        self.status = status
+        super().__init__(key=key, first_name=first_name, last_name=last_name, email=email, admin=admin, locale=locale,
+                         license_keys=license_keys, group_key=group_key, group_name=group_name, products=products,
+                         status=status)
 
     @classmethod
     def create_from_dict(cls, user_data: Dict):
-        key = user_data.get("key", None)
-        first_name = user_data.get("firstName", None)
-        last_name = user_data.get("lastName", None)
-        email = user_data.get("email", None)
-        locale = user_data.get("locale", None)
-        license_keys = user_data.get("licenseKeys", None)
-        group_key = user_data.get("groupKey", None)
-        group_name = user_data.get("groupName", None)
-        admin = user_data.get("admin", False)
-        products = user_data.get("products", None)
-        status = user_data.get("status", None)
-
-        return cls(key=key, first_name=first_name, last_name=last_name, email=email, admin=admin, locale=locale,
-                   license_keys=license_keys, group_key=group_key, group_name=group_name, products=products,
-                   status=status)
+        """
+        Wrap a user dict from the API. The dict is referenced, not copied, and fields are decoded on access
+        """
+        return cls._wrap(user_data)
 
-    def to_dict(self) -> Dict:
-        user = {
-            "key": self.key,
-            "first_name": self.first_name,
-            "last_name": self.last_name,
-            "email": self.email,
-            "group_key": self.group_key,
-            "group_name": self.group_name,
-            "locale": self.locale,
-            "license_keys": self.license_keys,
-            "products": self.products,
-            "admin": self.admin,
-            "status": self.status
-        }
 
-        return user
+class LazyUserResponse(UserResponse):
+    """
+    UserResponse built from the fields known locally after a write. Reading a field that is not known triggers a
+    single fetch of the user's server state through `loader`.
+    """
 
+    __slots__ = ("_loader",)
 
-class GroupResponse:
+    def __init__(self, user_data: Dict, loader: Callable[[], UserResponse]):
+        self._raw = dict(user_data)
+        self._loader = loader
 
-    def __init__(self, key, name, user_keys, total_member_count):
-        self.key = key
-        self.name = name
-        self.user_keys = user_keys
-        self.total_member_count = total_member_count
+    def _writable_raw(self) -> Optional[Dict]:
+        # Built from a private copy, or from the loaded user
+        return self._raw
 
-    @classmethod
-    def create_from_dict(cls, group_data: Dict):
-        key = group_data.get("groupKey", None)
-        name = group_data.get("groupName", None)
-        user_keys = group_data.get("userKeys", None)
-        total_member_count = group_data.get("totalMemberCount", None)
+    def _missing(self, field: _Field):
+        if self._loader is None:
+            return field.default
+
+        self.load()
+        return getattr(self, field.name)
 
-        return cls(key=key, name=name, user_keys=user_keys, total_member_count=total_member_count)
+    def load(self) -> UserResponse:
+        """
+        Fetch the user's server state now, overwriting the locally known fields
+        """
+        user = self._loader()
+        self._loader = None
+        self._raw = {json_key: getattr(user, name) for name, json_key, _ in self._fields}
+        return self
+
+    def compact(self):
+        if self._loader is not None:
+            self.load()
+        return super().compact()
+
+    def to_tuple(self) -> Tuple:
+        if self._loader is not None:
+            self.load()
+        return super().to_tuple()
 
     def to_dict(self) -> Dict:
-        group = {
-            "key": self.key,
-            "name": self.name,
-            "user_keys": self.user_keys,
-            "total_member_count": self.total_member_count
-        }
+        if self._loader is not None:
+            self.load()
+        return super().to_dict()
+
 
-        return group
+class GroupResponse(_ResponseModel):
 
+    _fields = (
+        ("key", "groupKey", None),
+        ("name", "groupName", None),
+        ("user_keys", "userKeys", None),
+        ("total_member_count", "totalMemberCount", None),
+    )
+    __slots__ = tuple("_v_" + name for name, _, _ in _fields)
+
+    def __init__(self, key, name, user_keys, total_member_count):
+        super().__init__(key=key, name=name, user_keys=user_keys, total_member_count=total_member_count)
+
+    @classmethod
+    def create_from_dict(cls, group_data: Dict):
+        """
+        Wrap a group dict from the API. The dict is referenced, not copied, and fields are decoded on access
+        """
+        return cls._wrap(group_data)
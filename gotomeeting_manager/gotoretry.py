@@ -0,0 +1,171 @@
+import random
+import threading
+import time
+
+from typing import Dict, FrozenSet, Optional, Tuple
+
+import requests
+
+from gotomeeting_manager.gotoexceptions import CircuitOpenError
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before a failed request is sent again.
+
+    Only idempotent methods are retried by default; a POST is retried only when its caller marks it idempotent. The
+    wait before retry n is drawn uniformly from [0, min(max_backoff, backoff * 2 ** n)] ("full jitter"), so clients
+    that failed together do not retry in lockstep.
+    """
+
+    def __init__(self, max_attempts: int = 4, backoff: float = 0.5, max_backoff: float = 30,
+                 max_elapsed: Optional[float] = 120, retry_statuses: FrozenSet[int] = frozenset({500, 502, 503, 504}),
+                 idempotent_methods: FrozenSet[str] = IDEMPOTENT_METHODS):
+        """
+        :param max_attempts: Attempts per request, including the first. 1 disables retries
+        :param backoff: Base of the exponential backoff, in seconds
+        :param max_backoff: Upper bound of a single wait, in seconds
+        :param max_elapsed: No retry is started once this many seconds have passed since the first attempt
+        :param retry_statuses: Response statuses that are retried
+        :param idempotent_methods: Methods that are retried without being marked idempotent by the caller
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_elapsed = max_elapsed
+        self.retry_statuses = retry_statuses
+        self.idempotent_methods = idempotent_methods
+
+    def is_idempotent(self, method: str) -> bool:
+        return method.upper() in self.idempotent_methods
+
+    def delay(self, attempt: int) -> float:
+        """
+        :param attempt: Zero-based number of the attempt that just failed
+        :return: Seconds to wait before the next attempt
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def should_retry(self, attempt: int, started: float, idempotent: bool, status: Optional[int] = None,
+                     error: Optional[Exception] = None) -> bool:
+        if attempt + 1 >= self.max_attempts:
+            return False
+        if self.max_elapsed is not None and time.monotonic() - started >= self.max_elapsed:
+            return False
+
+        if error is not None:
+            # A connect timeout means the request never reached the server, so even a POST is safe to send again
+            return idempotent or isinstance(error, requests.ConnectTimeout)
+
+        return idempotent and status in self.retry_statuses
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    After `failure_threshold` consecutive failures (5xx responses or connection errors) the circuit opens and
+    requests fail fast with CircuitOpenError. After `reset_timeout` seconds a single probe request is let through;
+    its success closes the circuit again, its failure reopens it for another `reset_timeout`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    _registry: Dict[Tuple[str, int, float], "CircuitBreaker"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, host: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_host(cls, host: str, failure_threshold: int = 5, reset_timeout: float = 30) -> "CircuitBreaker":
+        """
+        The process-wide breaker for `host` with these settings, shared by every Transport talking to it with the same
+        settings. Transports configured differently get breakers of their own
+        """
+        key = (host, failure_threshold, reset_timeout)
+        with cls._registry_lock:
+            breaker = cls._registry.get(key)
+            if breaker is None:
+                breaker = cls._registry[key] = cls(host, failure_threshold=failure_threshold,
+                                                   reset_timeout=reset_timeout)
+            return breaker
+
+    def before_request(self):
+        """
+        :raises CircuitOpenError: If the circuit is open, or half-open with its probe already in flight
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return
+
+            raise CircuitOpenError(f"Circuit for {self.host} is {self.state}; failing fast")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class RetryStats:
+    """
+    Thread-safe counters of what the retry engine did
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.backoff_time = 0.0
+        self.elapsed = 0.0
+
+    def record(self, attempts: int, backoff_time: float, elapsed: float, failed: bool, rejected: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.attempts += attempts
+            self.retries += max(attempts - 1, 0)
+            self.failures += failed
+            self.rejected += rejected
+            self.backoff_time += backoff_time
+            self.elapsed += elapsed
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        :return: requests, attempts, retries, failures (requests that failed for good), rejected (failed fast by an
+        open circuit), backoff_time (seconds slept between attempts) and elapsed (seconds spent in requests)
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "backoff_time": self.backoff_time,
+                "elapsed": self.elapsed,
+            }
@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import Future
+
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for a key is in flight, further calls for the same key wait
+    for it and receive its result (or its exception) instead of running again.
+
+    Results are shared between the waiters, so they must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """
+        Run `function`, unless a call with the same key is already running, in which case wait for that one
+        :param key: Identity of the call
+        :param function: Called without arguments by the first caller only
+        :return: The result of the call
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = function()
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._calls[key]
+        future.set_result(result)
+        return result
@@ -0,0 +1,234 @@
+import datetime
+import logging
+import threading
+import time
+
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from gotomeeting_manager.gotocredentials import CredentialStore
+from gotomeeting_manager.gotoexceptions import exception_for_status
+from gotomeeting_manager.gotojson import decode
+from gotomeeting_manager.gototransport import Transport
+
+TIMESTAMP_FORMAT = "%m/%d/%Y, %H:%M:%S"
+
+# Refresh tokens are valid for 30 days; fall back to the interactive flow a few days early
+REFRESH_TOKEN_LIFETIME = 25 * 24 * 3600
+DEFAULT_ACCESS_TOKEN_LIFETIME = 3600
+
+logger = logging.getLogger(__name__)
+
+
+class TokenProvider:
+    """
+    Owns the OAuth access and refresh tokens of a Manager.
+
+    Expiry is tracked with monotonic deadlines derived from the token response, so checking a token on the hot path
+    is a single comparison. Concurrent callers that find the token due for renewal share one in-flight refresh, and
+    an optional background timer renews the token `renew_margin` seconds before it expires.
+
+    Refreshes hold the credential store's lock. If another process refreshed in the meantime, its tokens are adopted
+    from the store instead of spending (and invalidating) the rotated refresh token again. The interactive
+    authorization is the exception: it runs without either lock, which are only taken to save its result.
+    """
+
+    def __init__(self, transport: Transport, token_headers: Dict[str, str],
+                 get_auth_code: Callable[[], Union[str, Tuple[str, str]]], on_update: Callable[[Dict], None],
+                 store: CredentialStore, renew_margin: float = 900, proactive_renewal: bool = True):
+        """
+        :param transport: Transport used for the token endpoint
+        :param token_headers: Basic authorization headers for the token endpoint
+        :param get_auth_code: Callable running the interactive flow and returning a single-use auth code, or an
+        (auth code, redirect URI) pair when the authorize request named a redirect URI
+        :param on_update: Called with the full token config every time the tokens change
+        :param store: Credential store the tokens are persisted to
+        :param renew_margin: Seconds before access token expiry at which it is renewed
+        :param proactive_renewal: Renew the access token on a background timer instead of on first use after expiry
+        """
+        self._transport = transport
+        self._token_headers = token_headers
+        self._get_auth_code = get_auth_code
+        self._on_update = on_update
+        self._store = store
+        self.renew_margin = renew_margin
+        self.proactive_renewal = proactive_renewal
+
+        self._lock = threading.Lock()
+        self._authorization_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+        self.access_token: Optional[str] = None
+        self._refresh_token: Optional[str] = None
+        self._renew_at = 0.0
+        self._cold_start_at = 0.0
+
+    # STATE
+########################################################################################################################
+    def load(self, config: Dict):
+        """
+        Adopt tokens from a persisted config. The wall-clock refresh timestamp is only parsed here, once.
+        """
+        issued = datetime.datetime.strptime(config["last_refreshed"], TIMESTAMP_FORMAT)
+        age = (datetime.datetime.now() - issued).total_seconds()
+
+        self._set_tokens(access_token=config["access_token"], refresh_token=config["refresh_token"],
+                         expires_in=config.get("expires_in", DEFAULT_ACCESS_TOKEN_LIFETIME) - age,
+                         refresh_token_age=config.get("refresh_token_age", 0) + age)
+
+    def _set_tokens(self, access_token: str, refresh_token: str, expires_in: float, refresh_token_age: float = 0):
+        now = time.monotonic()
+        self.access_token = access_token
+        self._refresh_token = refresh_token
+        self._renew_at = now + expires_in - self.renew_margin
+        self._cold_start_at = now + REFRESH_TOKEN_LIFETIME - refresh_token_age
+        self._schedule_renewal()
+
+    @property
+    def expires_in(self) -> float:
+        """
+        Seconds until the access token is renewed
+        """
+        return self._renew_at - time.monotonic()
+
+    # HOT PATH
+########################################################################################################################
+    def ensure_fresh(self):
+        """
+        Renew the access token if it is due. Costs one monotonic clock read when it is not.
+        """
+        if time.monotonic() < self._renew_at:
+            return
+
+        self.refresh(stale_token=self.access_token)
+
+    def refresh(self, stale_token: Optional[str] = None, force_cold_start: bool = False):
+        """
+        Renew the access token. Callers that pass the token they saw as `stale_token` share a single refresh: if
+        another thread already replaced it while this one waited, no further request is made.
+        :param stale_token: The access token the caller found expired or rejected
+        :param force_cold_start: Run the interactive authorization flow instead of using the refresh token
+        """
+        seen_token = self.access_token if stale_token is None else stale_token
+
+        with self._lock:
+            if not force_cold_start and stale_token is not None and stale_token != self.access_token:
+                return
+
+            with self._store.locked():
+                if not force_cold_start and self._adopt_stored_tokens(stale_token):
+                    return
+
+                if not (force_cold_start or self._refresh_token is None or time.monotonic() >= self._cold_start_at):
+                    logger.info("Refreshing access token")
+                    self._token_request({
+                        "grant_type": "refresh_token",
+                        "refresh_token": self._refresh_token
+                    }, keeps_refresh_token_age=True)
+                    return
+
+        # The interactive flow can wait minutes for the user, so it runs without the provider and store locks; only
+        # other threads that need a cold start wait for it
+        with self._authorization_lock:
+            if not force_cold_start and self.access_token != seen_token:
+                return
+
+            auth_code = self._get_auth_code()
+
+            with self._lock, self._store.locked():
+                if isinstance(auth_code, tuple):
+                    self.exchange_code(*auth_code)
+                else:
+                    self.exchange_code(auth_code)
+
+    def _adopt_stored_tokens(self, stale_token: Optional[str]) -> bool:
+        """
+        Pick up tokens another process wrote to the store since they were last read here
+        :return: Whether the adopted access token is current, making a refresh unnecessary
+        """
+        if not self._store.changed():
+            return False
+
+        config = self._store.load()
+        if config is None or config["access_token"] in (stale_token, self.access_token):
+            return False
+
+        self.load(config)
+        self._on_update(config)
+
+        return time.monotonic() < self._renew_at
+
+    # TOKEN API CALLS
+########################################################################################################################
+    def exchange_code(self, auth_code: str, redirect_uri: Optional[str] = None):
+        """
+        Exchange a single-use auth code for a new access and refresh token pair
+        :param redirect_uri: The redirect URI named in the authorize request, if any
+        """
+        data = {
+            "grant_type": "authorization_code",
+            "code": auth_code
+        }
+        if redirect_uri is not None:
+            data["redirect_uri"] = redirect_uri
+
+        self._token_request(data, keeps_refresh_token_age=False)
+
+    def _token_request(self, data: Dict, keeps_refresh_token_age: bool):
+        r = self._transport.post("/oauth/v2/token", headers=self._token_headers, data=data)
+
+        if r.status_code != 200:
+            raise exception_for_status(r.status_code)(r.text)
+
+        tokens = decode(r)
+        expires_in = tokens.get("expires_in", DEFAULT_ACCESS_TOKEN_LIFETIME)
+
+        # Refresh tokens are rotated on every refresh, but their 30 day lifetime runs from the original grant
+        refresh_token_age = 0.0
+        if keeps_refresh_token_age:
+            refresh_token_age = REFRESH_TOKEN_LIFETIME - (self._cold_start_at - time.monotonic())
+
+        self._set_tokens(access_token=tokens["access_token"], refresh_token=tokens["refresh_token"],
+                         expires_in=expires_in, refresh_token_age=refresh_token_age)
+
+        config = {
+            "account_key": tokens["account_key"],
+            "organizer_key": tokens["organizer_key"],
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens["refresh_token"],
+            "expires_in": expires_in,
+            "refresh_token_age": refresh_token_age,
+            "last_refreshed": datetime.datetime.now().strftime(TIMESTAMP_FORMAT),
+        }
+
+        self._store.save(config)
+        self._on_update(config)
+
+    # PROACTIVE RENEWAL
+########################################################################################################################
+    def _schedule_renewal(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self.proactive_renewal:
+            return
+
+        # Only renew with the refresh token in the background; the interactive flow needs a caller
+        if self._renew_at >= self._cold_start_at:
+            return
+
+        self._timer = threading.Timer(max(self.expires_in, 0), self._renew_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _renew_in_background(self):
+        try:
+            self.refresh(stale_token=self.access_token)
+        except Exception as e:
+            # The next call on the hot path retries the refresh and surfaces the error
+            logger.warning("Background token renewal failed", exc_info=e)
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
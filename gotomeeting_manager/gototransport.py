@@ -0,0 +1,186 @@
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from typing import Dict, Optional, Tuple, Union
+
+from gotomeeting_manager.gotoratelimit import RateLimiter
+from gotomeeting_manager.gotoretry import CircuitBreaker, RetryPolicy, RetryStats
+
+
+class Transport:
+    """
+    Pooled, keep-alive HTTP transport shared by every Manager call.
+
+    Connections to the API host are kept warm in a per-host pool, and the default headers are built once and
+    attached to the underlying session instead of being recreated for every request. Every request first takes a
+    token from the rate limiter's bucket for its endpoint family; a 429 pauses that family for the Retry-After
+    delay and the request is sent again.
+
+    Failed requests (5xx responses and connection errors) are retried according to the RetryPolicy, and a per-host
+    CircuitBreaker fails requests fast while the host keeps failing. What the retry engine did is counted in
+    retry_stats.
+    """
+
+    def __init__(self, base_url: str = "https://api.getgo.com", pool_size: int = 10, pool_connections: int = 4,
+                 session: Optional[requests.Session] = None, headers: Optional[Dict[str, str]] = None,
+                 rate_limiter: Optional[RateLimiter] = None, max_rate_limit_retries: int = 3,
+                 retry_policy: Optional[RetryPolicy] = None, timeout: Union[float, Tuple[float, float]] = (5, 60),
+                 failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        :param base_url: Scheme and host that relative request paths are resolved against
+        :param pool_size: Maximum number of keep-alive connections kept open per host
+        :param pool_connections: Number of distinct host pools to cache
+        :param session: Optional pre-configured session to use instead of creating one
+        :param headers: Optional extra default headers sent with every request
+        :param rate_limiter: Limiter the requests are paced by. Defaults to the process-wide RateLimiter.shared()
+        :param max_rate_limit_retries: How many times a request answered with 429 is sent again
+        :param retry_policy: Retry policy for failed requests. Defaults to RetryPolicy()
+        :param timeout: Default (connect, read) timeout in seconds, used when a request does not set its own
+        :param failure_threshold: Consecutive failures after which the host's circuit opens
+        :param reset_timeout: Seconds an open circuit waits before letting a probe request through
+        """
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter.shared()
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.retry_stats = RetryStats()
+
+        self._session = session if session is not None else requests.Session()
+
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        self._session.headers.update({"Accept": "application/json"})
+        if headers is not None:
+            self._session.headers.update(headers)
+
+    def set_authorization(self, access_token: Optional[str]):
+        """
+        Set (or clear) the access token sent in the Authorization header of every request
+        :param access_token: The OAuth access token, or None to remove the header
+        """
+        if access_token is None:
+            self._session.headers.pop("Authorization", None)
+        else:
+            self._session.headers["Authorization"] = access_token
+
+    def url(self, path: str) -> str:
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return self.base_url + path
+
+    def circuit_breaker(self, url: str) -> CircuitBreaker:
+        return CircuitBreaker.for_host(urlsplit(url).netloc, failure_threshold=self.failure_threshold,
+                                       reset_timeout=self.reset_timeout)
+
+    def request(self, method: str, path: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        Send a request over the pooled session, retrying it according to the retry policy
+        :param method: HTTP method
+        :param path: Path relative to base_url, or an absolute URL
+        :param idempotent: Whether the request may be sent again after a failure. Defaults to the policy's view of
+        the method; pass True for writes that are safe to repeat, e.g. because they are keyed by the caller
+        :param kwargs: Passed through to requests.Session.request
+        :return: requests.Response. A 5xx response is returned once retries are exhausted
+        :raises CircuitOpenError: If the host's circuit is open
+        """
+        url = self.url(path)
+        kwargs.setdefault("timeout", self.timeout)
+
+        policy = self.retry_policy
+        breaker = self.circuit_breaker(url)
+        if idempotent is None:
+            idempotent = policy.is_idempotent(method)
+
+        started = time.monotonic()
+        attempt = rate_limited = 0
+        backoff_time = 0.0
+
+        def record(failed: bool, rejected: bool = False):
+            self.retry_stats.record(attempts=attempt + 1 - rejected, backoff_time=backoff_time,
+                                    elapsed=time.monotonic() - started, failed=failed, rejected=rejected)
+
+        while True:
+            try:
+                breaker.before_request()
+            except Exception:
+                record(failed=True, rejected=True)
+                raise
+
+            # Every attempt records an outcome, so a half-open probe that raises cannot leave the breaker waiting
+            # for a result forever
+            settled = False
+            try:
+                self.rate_limiter.acquire(url)
+
+                try:
+                    r = self._session.request(method=method, url=url, **kwargs)
+                except requests.RequestException as e:
+                    breaker.record_failure()
+                    settled = True
+                    if not policy.should_retry(attempt, started, idempotent, error=e):
+                        record(failed=True)
+                        raise
+                else:
+                    if self.rate_limiter.observe(url, r.status_code, r.headers) is not None and \
+                            rate_limited < self.max_rate_limit_retries:
+                        # The host answered, so a rate-limited probe still closes the circuit
+                        breaker.record_success()
+                        settled = True
+                        rate_limited += 1
+                        r.close()
+                        continue
+
+                    # Retries behind this response, for the Manager's instrumentation
+                    r.retries = attempt + rate_limited
+
+                    if r.status_code < 500:
+                        breaker.record_success()
+                        settled = True
+                        record(failed=False)
+                        return r
+
+                    breaker.record_failure()
+                    settled = True
+                    if not policy.should_retry(attempt, started, idempotent, status=r.status_code):
+                        record(failed=True)
+                        return r
+
+                    r.close()
+            finally:
+                if not settled:
+                    breaker.record_failure()
+
+            delay = policy.delay(attempt)
+            backoff_time += delay
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
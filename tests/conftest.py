@@ -0,0 +1,92 @@
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import msgpack
+import pytest
+
+
+@pytest.fixture
+def creds_file(tmp_path):
+    config = {
+        "organizer_key": "organizer",
+        "account_key": "account",
+        "access_token": "token",
+        "refresh_token": "refresh",
+        "last_refreshed": datetime.datetime.now().strftime("%m/%d/%Y, %H:%M:%S"),
+    }
+    path = tmp_path / "goto.creds"
+    with open(path, "wb") as file:
+        msgpack.pack(config, file)
+    return path
+
+
+class FakeApi:
+    """
+    Minimal local stand-in for the GoTo API. Routes map (method, path) to a callable taking
+    (query, body) and returning (status, body) or (status, body, response headers).
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.calls = []
+        self.request_headers = []
+        self.lock = threading.Lock()
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw and self.headers.get("Content-Type") == "application/json" else raw
+
+                with api.lock:
+                    api.calls.append((self.command, url.path, query))
+                    api.request_headers.append(dict(self.headers))
+
+                route = api.routes.get((self.command, url.path))
+                status, payload, *headers = route(query, body) if route is not None else (404, {})
+
+                data = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for name, value in (headers[0] if headers else {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def paged(self, items, max_page_size=None):
+        def route(query, body):
+            page_size = int(query.get("pageSize", 25))
+            if max_page_size is not None:
+                page_size = min(page_size, max_page_size)
+            offset = int(query.get("offset", 0))
+            return 200, {"results": items[offset:offset + page_size], "total": len(items)}
+
+        return route
+
+
+@pytest.fixture
+def fake_api():
+    api = FakeApi()
+    thread = threading.Thread(target=api.server.serve_forever, daemon=True)
+    thread.start()
+    yield api
+    api.server.shutdown()
+    api.server.server_close()
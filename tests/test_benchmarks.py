@@ -0,0 +1,21 @@
+import argparse
+
+from benchmarks.bench_client import SCENARIOS, make_manager
+from benchmarks.mockgoto import MockGoToServer
+
+
+def test_client_scenarios_run_against_the_mock_api(tmp_path):
+    args = argparse.Namespace(workers=4, writes=20, refreshes=2)
+
+    with MockGoToServer(users=250, max_page_size=40) as server:
+        manager = make_manager(server, str(tmp_path), rate_limited=False)
+        try:
+            assert SCENARIOS["walk"](manager, args) == 250
+            assert SCENARIOS["walk-stream"](manager, args) == 250
+            assert SCENARIOS["fetch-all"](manager, args) == 250
+            assert SCENARIOS["create"](manager, args) == 20
+            assert SCENARIOS["update"](manager, args) == 20
+            assert SCENARIOS["refresh"](manager, args) == 2
+            assert manager.get_user_by_email("bench0@example.com", use_directory=False).last_name == "0"
+        finally:
+            manager.close()
@@ -0,0 +1,256 @@
+import asyncio
+import datetime
+import threading
+import webbrowser
+from urllib.parse import parse_qs, urlsplit
+
+import msgpack
+import pytest
+import requests
+from aiohttp import web
+
+from gotomeeting_manager.gotoasyncmanager import AsyncManager
+from gotomeeting_manager.gotocredentials import FileCredentialStore
+from gotomeeting_manager.gotoexceptions import CredentialError, GroupNotFoundError
+
+
+def _write_config(path, **overrides):
+    config = {
+        "organizer_key": "organizer",
+        "account_key": "account",
+        "access_token": "token",
+        "refresh_token": "refresh",
+        "last_refreshed": datetime.datetime.now().strftime("%m/%d/%Y, %H:%M:%S"),
+    }
+    config.update(overrides)
+    with open(path, "wb") as file:
+        msgpack.pack(config, file)
+
+
+async def _serve(routes):
+    app = web.Application()
+    for method, path, handler in routes:
+        app.router.add_route(method, path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+def test_get_users_bounded_concurrency(tmp_path):
+    config_path = tmp_path / "goto.creds"
+    _write_config(config_path)
+
+    in_flight = {"current": 0, "max": 0}
+
+    async def users(request):
+        assert request.headers["Authorization"] == "token"
+        in_flight["current"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["current"])
+        await asyncio.sleep(0.01)
+        in_flight["current"] -= 1
+        return web.json_response({"results": [{"key": request.query["offset"], "email": "a@b.c"}]})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/admin/rest/v1/accounts/account/users", users)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        try:
+            async with AsyncManager(consumer_key="key", consumer_secret="secret", path_to_config=str(config_path),
+                                    base_url=f"http://127.0.0.1:{port}", max_concurrency=3) as manager:
+                pages = await asyncio.gather(*(manager.get_users(offset=offset) for offset in range(20)))
+        finally:
+            await runner.cleanup()
+
+        return pages
+
+    pages = asyncio.run(run())
+
+    assert [page[0].key for page in pages] == [str(offset) for offset in range(20)]
+    assert in_flight["max"] <= 3
+
+
+def test_refresh_goes_through_the_locked_store(tmp_path):
+    config_path = tmp_path / "goto.creds"
+    _write_config(config_path, expires_in=0)
+    token_posts = []
+
+    async def token(request):
+        token_posts.append(await request.post())
+        return web.json_response({"access_token": "fresh", "refresh_token": "refresh-2", "account_key": "account",
+                                  "organizer_key": "organizer", "expires_in": 3600})
+
+    async def users(request):
+        return web.json_response({"results": [{"key": "1", "authorization": request.headers["Authorization"]}]})
+
+    async def run():
+        runner, base_url = await _serve([("POST", "/oauth/v2/token", token),
+                                         ("GET", "/admin/rest/v1/accounts/account/users", users)])
+        try:
+            async with AsyncManager(consumer_key="key", consumer_secret="secret", path_to_config=str(config_path),
+                                    base_url=base_url) as manager:
+                await manager.get_users()
+                stored = FileCredentialStore(str(config_path)).load()
+
+            # Another process refreshed in the meantime: its tokens are adopted instead of refreshing again
+            _write_config(config_path, expires_in=0)
+            async with AsyncManager(consumer_key="key", consumer_secret="secret", path_to_config=str(config_path),
+                                    base_url=base_url) as manager:
+                _write_config(config_path, access_token="other", refresh_token="refresh-3", expires_in=3600)
+                await manager.get_users()
+                adopted = manager._tokens.access_token
+        finally:
+            await runner.cleanup()
+
+        return stored, adopted
+
+    stored, adopted = asyncio.run(run())
+
+    assert len(token_posts) == 1 and token_posts[0]["refresh_token"] == "refresh"
+    assert stored["access_token"] == "fresh"
+    assert stored["expires_in"] == 3600 and "refresh_token_age" in stored
+    assert adopted == "other"
+
+
+def test_rejected_token_is_refreshed_once_and_old_refresh_tokens_cold_start(tmp_path, monkeypatch):
+    config_path = tmp_path / "goto.creds"
+    _write_config(config_path, expires_in=3600)
+    token_posts = []
+
+    async def token(request):
+        token_posts.append(await request.post())
+        return web.json_response({"access_token": "fresh", "refresh_token": "refresh-2", "account_key": "account",
+                                  "organizer_key": "organizer", "expires_in": 3600})
+
+    async def users(request):
+        if request.headers["Authorization"] != "fresh":
+            return web.json_response({}, status=401)
+        return web.json_response({"results": [{"key": "1"}]})
+
+    async def run():
+        runner, base_url = await _serve([("POST", "/oauth/v2/token", token),
+                                         ("GET", "/admin/rest/v1/accounts/account/users", users)])
+        try:
+            async with AsyncManager(consumer_key="key", consumer_secret="secret", path_to_config=str(config_path),
+                                    base_url=base_url) as manager:
+                pages = await asyncio.gather(*(manager.get_users() for _ in range(5)))
+
+            # A refresh token past its 25 day budget needs the interactive flow, which headless mode refuses
+            _write_config(config_path, expires_in=0, refresh_token_age=26 * 24 * 3600)
+            async with AsyncManager(consumer_key="key", consumer_secret="secret", path_to_config=str(config_path),
+                                    base_url=base_url) as manager:
+                with pytest.raises(CredentialError):
+                    await manager.get_users()
+        finally:
+            await runner.cleanup()
+
+        return pages
+
+    monkeypatch.setenv("GOTO_HEADLESS", "1")
+    pages = asyncio.run(run())
+
+    assert [page[0].key for page in pages] == ["1"] * 5
+    assert len(token_posts) == 1
+
+
+def test_expired_token_is_refreshed_once_for_concurrent_coroutines(tmp_path):
+    config_path = tmp_path / "goto.creds"
+    _write_config(config_path, expires_in=0)
+    token_posts = []
+
+    async def token(request):
+        token_posts.append(await request.post())
+        await asyncio.sleep(0.05)
+        return web.json_response({"access_token": "fresh", "refresh_token": "refresh-2", "account_key": "account",
+                                  "organizer_key": "organizer", "expires_in": 3600})
+
+    async def users(request):
+        assert request.headers["Authorization"] == "fresh"
+        return web.json_response({"results": [{"key": request.query["offset"]}]})
+
+    async def missing(request):
+        return web.json_response({}, status=404)
+
+    async def run():
+        runner, base_url = await _serve([("POST", "/oauth/v2/token", token),
+                                         ("GET", "/admin/rest/v1/accounts/account/users", users),
+                                         ("GET", "/admin/rest/v1/accounts/account/groups", missing)])
+        try:
+            async with AsyncManager(consumer_key="key", consumer_secret="secret", path_to_config=str(config_path),
+                                    base_url=base_url) as manager:
+                pages = await asyncio.gather(*(manager.get_users(offset=offset) for offset in range(20)))
+                with pytest.raises(GroupNotFoundError):
+                    await manager.get_groups()
+        finally:
+            await runner.cleanup()
+
+        return pages
+
+    pages = asyncio.run(run())
+
+    assert [page[0].key for page in pages] == [str(offset) for offset in range(20)]
+    assert len(token_posts) == 1
+
+
+def test_headless_applies_to_a_cold_start_after_a_refresh(tmp_path, monkeypatch):
+    config_path = tmp_path / "goto.creds"
+    _write_config(config_path, expires_in=0, refresh_token_age=26 * 24 * 3600)
+
+    def open_new_tab(url):
+        raise AssertionError("A browser was opened in headless mode")
+
+    monkeypatch.delenv("GOTO_HEADLESS", raising=False)
+    monkeypatch.setattr(webbrowser, "open_new_tab", open_new_tab)
+
+    async def run():
+        async with AsyncManager(consumer_key="key", consumer_secret="secret", path_to_config=str(config_path),
+                                base_url="http://127.0.0.1:9", headless=True) as manager:
+            with pytest.raises(CredentialError):
+                await manager.get_users()
+
+    asyncio.run(run())
+
+
+def test_cold_start_runs_one_authorization_against_the_base_url(tmp_path, monkeypatch):
+    config_path = tmp_path / "goto.creds"
+    _write_config(config_path, expires_in=0, refresh_token_age=26 * 24 * 3600)
+    token_posts, opened = [], []
+
+    def open_new_tab(url):
+        opened.append(url)
+        query = {key: values[0] for key, values in parse_qs(urlsplit(url).query).items()}
+        threading.Thread(target=requests.get, args=(query["redirect_uri"],),
+                         kwargs={"params": {"code": "code", "state": query["state"]}}).start()
+
+    monkeypatch.delenv("GOTO_HEADLESS", raising=False)
+    monkeypatch.setattr(webbrowser, "open_new_tab", open_new_tab)
+
+    async def token(request):
+        token_posts.append(dict(await request.post()))
+        return web.json_response({"access_token": "fresh", "refresh_token": "refresh-2", "account_key": "account",
+                                  "organizer_key": "organizer", "expires_in": 3600})
+
+    async def users(request):
+        return web.json_response({"results": [{"key": "1"}]})
+
+    async def run():
+        runner, base_url = await _serve([("POST", "/oauth/v2/token", token),
+                                         ("GET", "/admin/rest/v1/accounts/account/users", users)])
+        try:
+            async with AsyncManager(consumer_key="key", consumer_secret="secret", path_to_config=str(config_path),
+                                    base_url=base_url) as manager:
+                await asyncio.gather(*(manager.get_users() for _ in range(5)))
+        finally:
+            await runner.cleanup()
+        return base_url
+
+    base_url = asyncio.run(run())
+
+    assert len(opened) == 1 and opened[0].startswith(base_url + "/oauth/v2/authorize?")
+    assert [post["grant_type"] for post in token_posts] == ["authorization_code"]
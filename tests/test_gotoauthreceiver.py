@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+import requests
+
+from gotomeeting_manager.gotoauthreceiver import AuthCodeReceiver
+from gotomeeting_manager.gotoexceptions import AuthorizationTimeoutError
+
+from tests.test_gotomanager import _manager
+
+
+def test_one_receiver_serves_concurrent_authorizations():
+    with AuthCodeReceiver() as receiver:
+        first, second = receiver.expect(timeout=5), receiver.expect(timeout=5)
+        expired = receiver.expect(timeout=0.1)
+
+        assert requests.get(receiver.redirect_uri, params={"code": "b", "state": second.state}).status_code == 200
+        assert requests.get(receiver.redirect_uri, params={"code": "x", "state": "unknown"}).status_code == 400
+
+        async def redirect_then_await():
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: requests.get(receiver.redirect_uri, params={"code": "a", "state": first.state}))
+            return await first
+
+        assert asyncio.run(redirect_then_await()) == "a"
+        assert second.result() == "b"
+        with pytest.raises(AuthorizationTimeoutError):
+            expired.result()
+
+
+def test_begin_and_complete_authorization(fake_api, creds_file):
+    tokens = {"access_token": "new", "refresh_token": "r", "account_key": "account", "organizer_key": "o"}
+    fake_api.routes[("POST", "/oauth/v2/token")] = lambda query, body: (200, tokens)
+    manager = _manager(fake_api, creds_file)
+
+    pending = manager.begin_authorization(open_browser=False)
+    requests.get(pending.redirect_uri, params={"code": "abc", "state": pending.state})
+    manager.complete_authorization(pending)
+
+    assert manager._config["access_token"] == "new"
+
+
+def test_redirect_without_state_is_rejected():
+    with AuthCodeReceiver() as receiver:
+        pending = receiver.expect(timeout=5)
+
+        assert requests.get(receiver.redirect_uri, params={"code": "forged"}).status_code == 400
+        assert not pending.done()
+
+        requests.get(receiver.redirect_uri, params={"code": "real", "state": pending.state})
+        assert pending.result() == "real"
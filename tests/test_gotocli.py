@@ -0,0 +1,97 @@
+import datetime
+import json
+
+from benchmarks.mockgoto import ACCOUNT_KEY, MockGoToServer
+from gotomeeting_manager.__main__ import main
+from gotomeeting_manager.gotocheckpoint import Checkpoint
+from gotomeeting_manager.gotocredentials import FileCredentialStore
+from gotomeeting_manager.gototokens import TIMESTAMP_FORMAT
+
+
+def _cli(server, tmp_path, *arguments):
+    config = tmp_path / "cli.creds"
+    if not config.exists():
+        FileCredentialStore(str(config)).save({
+            "organizer_key": "mock-organizer", "account_key": ACCOUNT_KEY, "access_token": "mock-access-0",
+            "refresh_token": "mock-refresh-0", "last_refreshed": datetime.datetime.now().strftime(TIMESTAMP_FORMAT),
+        })
+    return main(["--config", str(config), "--consumer-key", "key", "--consumer-secret", "secret",
+                 "--base-url", server.base_url, "--headless", *arguments])
+
+
+def test_checkpoint_tracks_rows_finished_out_of_order(tmp_path):
+    path = str(tmp_path / "job.checkpoint")
+    checkpoint = Checkpoint(path, job={"command": "create"}, flush_interval=0)
+    for row in (0, 2, 3, 1, 5):
+        checkpoint.mark(row)
+
+    resumed = Checkpoint(path, job={"command": "create"})
+    assert resumed.watermark == 4 and resumed.completed == 5
+    assert [row for row in range(7) if not resumed.is_done(row)] == [4, 6]
+
+
+def test_checkpoint_watermark_passes_failed_rows(tmp_path):
+    path = str(tmp_path / "job.checkpoint")
+    checkpoint = Checkpoint(path, job={"command": "create"}, flush_interval=0, max_failed=2)
+    checkpoint.fail(1)
+    for row in range(2, 5000):
+        checkpoint.mark(row)
+    checkpoint.mark(0)
+
+    resumed = Checkpoint(path, job={"command": "create"}, max_failed=2)
+    assert resumed.watermark == 5000 and resumed.completed == 4999 and resumed.failed == 1
+    assert json.loads(open(path).read())["done"] == []
+    assert [row for row in range(5001) if not resumed.is_done(row)] == [1, 5000]
+
+    resumed.mark(1)
+    assert resumed.failed == 0 and resumed.completed == 5000
+
+    # Past max_failed, a failure holds the watermark back again
+    for row in (5000, 5001, 5002):
+        resumed.fail(row)
+    resumed.mark(5003)
+    assert resumed.watermark == 5002 and resumed.failed == 2
+    assert not resumed.is_done(5002) and resumed.is_done(5003)
+
+
+def test_create_job_resumes_from_its_checkpoint(tmp_path, capsys):
+    rows = tmp_path / "users.csv"
+    rows.write_text("email,first_name,last_name,products,group_name\n" +
+                    "".join(f"new{index}@example.com,New,User{index},G2M,Group 3\n" for index in range(30)) +
+                    "user1@example.com,Taken,Email,G2M,\n")
+    output, checkpoint = tmp_path / "created.ndjson", tmp_path / "created.checkpoint"
+
+    # A previous run that died after the first 12 rows
+    job = {"command": "create", "input": str(rows)}
+    Checkpoint(str(checkpoint), job=job).finish(remove=False)
+    state = json.loads(checkpoint.read_text())
+    checkpoint.write_text(json.dumps(dict(state, watermark=12)))
+
+    with MockGoToServer(users=100, groups=5) as server:
+        # Row 12 was in flight when that run died, so it was created but never checkpointed
+        server._create("new12@example.com", "New", "User12")
+
+        assert _cli(server, tmp_path, "create", str(rows), "--output", str(output), "--checkpoint",
+                    str(checkpoint), "--workers", "4") == 1
+
+        results = [json.loads(line) for line in output.read_text().splitlines()]
+        assert sorted(result["row"] for result in results) == list(range(12, 31))
+        assert [result["row"] for result in results if not result["ok"]] == [30]
+        assert capsys.readouterr().err.splitlines()[-1].endswith("1 failed, 12 skipped from checkpoint")
+
+        # The failed row was checkpointed as failed, so the rerun retries it and nothing else
+        assert _cli(server, tmp_path, "create", str(rows), "--output", str(output), "--checkpoint",
+                    str(checkpoint)) == 1
+        results = [json.loads(line) for line in output.read_text().splitlines()]
+        assert [result["row"] for result in results[19:]] == [30]
+        assert capsys.readouterr().err.splitlines()[-1].endswith("1 failed, 30 skipped from checkpoint")
+
+        rows.write_text(rows.read_text().replace("user1@example.com", "user1000@example.com"))
+        assert _cli(server, tmp_path, "create", str(rows), "--output", str(output), "--checkpoint",
+                    str(checkpoint)) == 0
+        assert not checkpoint.exists()
+
+        export = tmp_path / "users.ndjson"
+        assert _cli(server, tmp_path, "export", "--output", str(export), "--filter", "email=new20@example.com") == 0
+        exported = [json.loads(line) for line in export.read_text().splitlines()]
+        assert [(user["last_name"], user["group_key"]) for user in exported] == [("User20", "3")]
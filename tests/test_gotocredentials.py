@@ -0,0 +1,58 @@
+import datetime
+
+import pytest
+
+from gotomeeting_manager.gotocredentials import FileCredentialStore, SQLiteCredentialStore
+from gotomeeting_manager.gototokens import TokenProvider
+from gotomeeting_manager.gototransport import Transport
+
+
+def _config(access_token, expires_in=3600):
+    return {"access_token": access_token, "refresh_token": f"refresh-{access_token}", "account_key": "account",
+            "organizer_key": "organizer", "expires_in": expires_in,
+            "last_refreshed": datetime.datetime.now().strftime("%m/%d/%Y, %H:%M:%S")}
+
+
+@pytest.mark.parametrize("store_type", ["file", "sqlite"])
+def test_stores_detect_writes_from_other_instances(tmp_path, store_type):
+    if store_type == "file":
+        first, second = (FileCredentialStore(str(tmp_path / "goto.creds")) for _ in range(2))
+    else:
+        first, second = (SQLiteCredentialStore(str(tmp_path / "goto.sqlite")) for _ in range(2))
+
+    assert first.load() is None
+
+    with first.locked():
+        first.save(_config("one"))
+
+    assert second.load()["access_token"] == "one"
+    assert not second.changed()
+
+    with first.locked():
+        first.save(_config("two"))
+
+    assert second.changed()
+    assert second.load()["access_token"] == "two"
+    assert not first.changed()
+
+
+def test_refresh_adopts_tokens_written_by_another_worker(fake_api, tmp_path):
+    fake_api.routes[("POST", "/oauth/v2/token")] = lambda query, body: (500, {})
+
+    path = str(tmp_path / "goto.creds")
+    FileCredentialStore(path).save(_config("stale", expires_in=0))
+
+    store = FileCredentialStore(path)
+    provider = TokenProvider(transport=Transport(base_url=fake_api.base_url), token_headers={},
+                             get_auth_code=lambda: "code", on_update=lambda config: None, store=store,
+                             proactive_renewal=False)
+    provider.load(store.load())
+
+    # Another worker refreshes and writes the new tokens
+    FileCredentialStore(path).save(_config("fresh"))
+
+    provider.ensure_fresh()
+
+    assert provider.access_token == "fresh"
+    assert fake_api.calls == []
+    assert list(tmp_path.glob("*.tmp")) == []
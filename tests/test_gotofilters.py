@@ -0,0 +1,71 @@
+import re
+
+import pytest
+
+from gotomeeting_manager.gotoexceptions import InvalidFilterError
+from gotomeeting_manager.gotofilters import compile_filter, eq, one_of, pack_one_of
+from gotomeeting_manager.gotomanager import Manager
+from gotomeeting_manager.gototransport import Transport
+
+USERS_PATH = "/admin/rest/v1/accounts/account/users"
+
+
+def test_compile_filter_combines_and_escapes():
+    assert compile_filter({"email": "a.b@example.com", "status": "active"}) == \
+        r'(email="(?i)a\.b@example\.com") & (status="(?i)active")'
+    assert compile_filter({"key": ["1", "2", "1"]}) == '(key="(?i)1") | (key="(?i)2")'
+    assert compile_filter(eq("lastName", 'O"Brien (jr)', case_sensitive=True) | eq("key", 3)) == \
+        r'(lastName="O\"Brien \(jr\)") | (key="(?i)3")'
+    assert compile_filter((eq("status", "active") | eq("status", "suspended")) & eq("admin", True)) == \
+        '((status="(?i)active") | (status="(?i)suspended")) & (admin="(?i)true")'
+
+
+@pytest.mark.parametrize("filter_values, resource", [
+    ({}, None),
+    ({"key": []}, None),
+    ({"email": "a\nb"}, None),
+    ({"email": {"nested": 1}}, None),
+    ({"bad field": "x"}, None),
+    ({"password": "x"}, "users"),
+])
+def test_compile_filter_rejects_invalid_filters(filter_values, resource):
+    with pytest.raises(InvalidFilterError):
+        compile_filter(filter_values, resource=resource)
+
+
+def test_pack_one_of_respects_value_and_length_limits():
+    values = [f"user{index}@example.com" for index in range(30)]
+
+    chunks = list(pack_one_of("email", values, max_values=8, max_length=400))
+    assert [value for chunk in chunks for value in chunk] == values
+    assert all(len(chunk) <= 8 for chunk in chunks)
+    assert all(len(compile_filter(one_of("email", chunk))) <= 400 for chunk in chunks)
+
+    with pytest.raises(InvalidFilterError):
+        list(pack_one_of("email", ["x" * 500], max_length=400))
+
+
+def test_get_users_by_packs_lookups_and_maps_results_back(fake_api, creds_file):
+    users = [{"key": str(index), "email": f"User{index}@Example.com"} for index in range(40)]
+
+    def filtered(query, body):
+        wanted = {value.replace("\\", "").lower() for value in re.findall(r'email="\(\?i\)((?:[^"\\]|\\.)*)"',
+                                                                            query["filter"])}
+        matched = [user for user in users if user["email"].lower() in wanted]
+        offset, page_size = int(query["offset"]), int(query["pageSize"])
+        return 200, {"results": matched[offset:offset + page_size], "total": len(matched)}
+
+    fake_api.routes[("GET", USERS_PATH)] = filtered
+    manager = Manager(consumer_key="key", consumer_secret="secret", path_to_config=str(creds_file),
+                      transport=Transport(base_url=fake_api.base_url))
+
+    emails = [f"user{index}@example.com" for index in range(0, 40, 2)] + ["missing@example.com"]
+    found = manager.get_users_by(emails=emails, max_values=6)
+
+    assert list(found) == emails
+    assert [found[email].key for email in emails[:-1]] == [str(index) for index in range(0, 40, 2)]
+    assert found["missing@example.com"] is None
+    assert len(fake_api.calls) == 4
+
+    with pytest.raises(InvalidFilterError):
+        manager.get_users_by(emails=emails, keys=["1"])
@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+import pytest
+
+from gotomeeting_manager.gotoexceptions import CredentialError
+from gotomeeting_manager.gotomanager import Manager
+
+
+def test_manager_import_does_not_load_the_auth_stack():
+    probe = "import sys, gotomeeting_manager.gotomanager; " \
+            "print(any(m in sys.modules for m in ('webbrowser', 'gotomeeting_manager.gotoauthreceiver')))"
+    output = subprocess.run([sys.executable, "-c", probe], check=True, capture_output=True, text=True).stdout
+
+    assert output.strip() == "False"
+
+
+def test_headless_cold_start_fails_instead_of_opening_a_browser(tmp_path):
+    with pytest.raises(CredentialError):
+        Manager(consumer_key="key", consumer_secret="secret", path_to_config=str(tmp_path / "missing.creds"),
+                headless=True)
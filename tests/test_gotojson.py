@@ -0,0 +1,29 @@
+import json
+
+from gotomeeting_manager.gotojson import ResultsStream, loads
+
+from tests.test_gotomanager import USERS_PATH, _manager
+
+
+def test_results_stream_survives_any_chunk_boundary():
+    body = {"total": 12, "results": [{"key": "1", "firstName": "Zoë"}, {"key": "2", "admin": True}, 3.5, []],
+            "next": None}
+    data = json.dumps(body, ensure_ascii=False, indent=1).encode("utf-8")
+
+    for size in (1, 2, 7, len(data)):
+        stream = ResultsStream(data[i:i + size] for i in range(0, len(data), size))
+        assert list(stream) == body["results"]
+        assert stream.fields == {"total": 12, "next": None}
+        assert stream.count == 4
+
+    assert loads(data) == body
+
+
+def test_iter_users_can_stream_pages(fake_api, creds_file):
+    users = [{"key": str(index), "email": f"user{index}@example.com"} for index in range(23)]
+    fake_api.routes[("GET", USERS_PATH)] = fake_api.paged(users, max_page_size=5)
+
+    manager = _manager(fake_api, creds_file)
+
+    assert [user.key for user in manager.iter_users(page_size=10, stream=True)] == [str(i) for i in range(23)]
+    assert [call[2]["offset"] for call in fake_api.calls] == ["0", "5", "10", "15", "20"]
@@ -0,0 +1,288 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from gotomeeting_manager.gotocache import ResponseCache
+from gotomeeting_manager.gotoexceptions import UserExistsError, UserNotFoundError
+from gotomeeting_manager.gotomanager import Manager
+from gotomeeting_manager.gotoretry import RetryPolicy
+from gotomeeting_manager.gototransport import Transport
+
+USERS_PATH = "/admin/rest/v1/accounts/account/users"
+
+
+def _manager(fake_api, creds_file):
+    return Manager(consumer_key="key", consumer_secret="secret", path_to_config=str(creds_file),
+                   transport=Transport(base_url=fake_api.base_url))
+
+
+def test_iter_users_follows_server_page_limit(fake_api, creds_file):
+    users = [{"key": str(index), "email": f"user{index}@example.com"} for index in range(23)]
+    fake_api.routes[("GET", USERS_PATH)] = fake_api.paged(users, max_page_size=5)
+
+    manager = _manager(fake_api, creds_file)
+
+    assert [user.key for user in manager.iter_users(page_size=10)] == [str(index) for index in range(23)]
+    assert [call[2]["offset"] for call in fake_api.calls] == ["0", "5", "10", "15", "20"]
+
+
+def test_fetch_all_users_retries_failed_pages_and_dedupes(fake_api, creds_file):
+    users = [{"key": str(index)} for index in range(50)]
+    paged = fake_api.paged(users)
+    failures = {"20": 1}
+
+    def flaky(query, body):
+        if failures.get(query["offset"], 0) > 0:
+            failures[query["offset"]] -= 1
+            return 502, {}
+        status, page = paged(query, body)
+        # Simulate a user shifting between pages while the walk is in progress
+        if query["offset"] == "10":
+            page["results"] = page["results"] + [{"key": "0"}]
+        return status, page
+
+    fake_api.routes[("GET", USERS_PATH)] = flaky
+    timings = []
+
+    # Disable transport-level retries so the page-level retry of fetch_all_users is exercised
+    manager = Manager(consumer_key="key", consumer_secret="secret", path_to_config=str(creds_file),
+                      transport=Transport(base_url=fake_api.base_url, retry_policy=RetryPolicy(max_attempts=1)))
+    result = manager.fetch_all_users(parallelism=3, page_size=10, timings=timings)
+
+    assert [user.key for user in result] == [str(index) for index in range(50)]
+    assert [(timing.offset, timing.attempt) for timing in timings if timing.error is not None] == [(20, 0)]
+    assert len([timing for timing in timings if timing.error is None]) == 4
+
+
+def test_license_catalog_is_fetched_once_per_ttl(fake_api, creds_file):
+    licenses = {"results": [{"key": "1", "products": ["G2M"]}, {"key": "2", "products": ["G2M", "G2W"]}]}
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/licenses")] = lambda query, body: (200, licenses)
+
+    manager = _manager(fake_api, creds_file)
+    products = ["G2M", "G2W"]
+
+    assert manager.get_corresponding_product_licenses(products) == ["2"]
+    assert manager.get_corresponding_product_licenses(["G2M"]) == ["1"]
+    assert products == ["G2M", "G2W"]
+    assert len(fake_api.calls) == 1
+
+    manager.invalidate_license_cache()
+    manager.get_license_codes()
+    assert len(fake_api.calls) == 2
+
+
+def test_expired_token_is_refreshed_once_and_request_retried(fake_api, creds_file):
+    tokens = {"access_token": "fresh", "refresh_token": "refresh-2", "account_key": "account",
+              "organizer_key": "organizer", "expires_in": 3600}
+    fake_api.routes[("POST", "/oauth/v2/token")] = lambda query, body: (200, tokens)
+
+    seen_tokens = []
+
+    def users(query, body):
+        return (200, {"results": [{"key": "1"}]}) if seen_tokens[-1] == "fresh" else (401, {})
+
+    fake_api.routes[("GET", USERS_PATH)] = users
+
+    manager = _manager(fake_api, creds_file)
+    original_request = manager._transport.request
+
+    def recording_request(method, path, **kwargs):
+        if method == "GET":
+            seen_tokens.append(manager._transport._session.headers.get("Authorization"))
+        return original_request(method, path, **kwargs)
+
+    manager._transport.request = recording_request
+
+    assert [user.key for user in manager.get_users()] == ["1"]
+    assert seen_tokens == ["token", "fresh"]
+    assert [call[:2] for call in fake_api.calls].count(("POST", "/oauth/v2/token")) == 1
+
+    manager.close()
+
+
+def test_create_users_reports_per_item_results(fake_api, creds_file):
+    licenses = {"results": [{"key": "1", "products": ["G2M"]}]}
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/licenses")] = lambda query, body: (200, licenses)
+
+    def create(query, body):
+        if body["email"] == "taken@example.com":
+            return 409, {}
+        return 200, {"key": body["email"].split("@")[0]}
+
+    fake_api.routes[("POST", USERS_PATH)] = create
+
+    users = ({"first_name": "First", "last_name": "Last", "email": email}
+             for email in ["a@example.com", "taken@example.com", "b@example.com"])
+
+    results = sorted(_manager(fake_api, creds_file).create_users(users, workers=2), key=lambda result: result.index)
+
+    assert [result.result for result in results] == ["a", None, "b"]
+    assert isinstance(results[1].error, UserExistsError)
+    assert [call[1] for call in fake_api.calls].count("/admin/rest/v1/accounts/account/licenses") == 1
+
+
+def test_write_without_read_back_and_batch_confirm(fake_api, creds_file):
+    licenses = {"results": [{"key": "1", "products": ["G2M"]}]}
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/licenses")] = lambda query, body: (200, licenses)
+    fake_api.routes[("POST", USERS_PATH)] = lambda query, body: (200, {"key": "42"})
+    fake_api.routes[("GET", USERS_PATH)] = lambda query, body: (
+        200, {"results": [{"key": "42", "email": "a@example.com", "status": "ACTIVE"},
+                          {"key": "43", "email": "b@example.com", "status": "ACTIVE"}], "total": 2})
+
+    manager = _manager(fake_api, creds_file)
+
+    user = manager.create_user(first_name="First", last_name="Last", email="a@example.com", confirm=False)[0]
+    assert (user.key, user.email, user.license_keys) == ("42", "a@example.com", ["1"])
+
+    lazy = manager.create_user(first_name="First", last_name="Last", email="a@example.com", confirm=False,
+                               lazy=True)[0]
+    assert lazy.first_name == "First"
+    assert not [call for call in fake_api.calls if call[:2] == ("GET", USERS_PATH)]
+    assert lazy.status == "ACTIVE"
+
+    confirmed = manager.confirm_users(["42", "43"])
+    assert sorted(confirmed) == ["42", "43"]
+
+    user_reads = [call for call in fake_api.calls if call[:2] == ("GET", USERS_PATH)]
+    assert len(user_reads) == 2
+    assert user_reads[-1][2]["filter"] == '(key="42") | (key="43")'
+
+
+def test_directory_resolves_emails_locally(fake_api, creds_file):
+    users = [{"key": str(index), "email": f"User{index}@Example.com", "groupKey": "g1" if index % 2 else "g2"}
+             for index in range(10)]
+    fake_api.routes[("GET", USERS_PATH)] = fake_api.paged(users)
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/groups")] = fake_api.paged(
+        [{"groupKey": "g1", "groupName": "Odd"}, {"groupKey": "g2", "groupName": "Even"}])
+    fake_api.routes[("DELETE", "/G2M/rest/organizers/3")] = lambda query, body: (204, None)
+
+    manager = _manager(fake_api, creds_file)
+    directory = manager.enable_directory()
+
+    assert manager.get_user_by_email("user3@example.com").key == "3"
+    assert manager.get_user_by_key("4").email == "User4@Example.com"
+    assert directory.group_key("Odd") == "g1"
+    assert sorted(user.key for user in directory.in_group("g1")) == ["1", "3", "5", "7", "9"]
+    requests_after_load = len(fake_api.calls)
+
+    # The Directory's groups are the Manager's group index, so resolving a name needs no request
+    assert manager.enable_group_index() is directory.groups
+    assert manager.get_group_key("Even") == "g2"
+    assert len(fake_api.calls) == requests_after_load
+
+    manager.delete_user("USER3@example.com")
+
+    assert directory.by_key("3") is None
+    assert len(fake_api.calls) == requests_after_load + 1
+
+
+def test_directory_follows_renames_and_status_changes(fake_api, creds_file):
+    users = [{"key": "1", "email": "old@example.com", "status": "ACTIVE"},
+             {"key": "2", "email": "other@example.com", "status": "ACTIVE"}]
+
+    def get_users(query, body):
+        match = re.fullmatch(r'\((\w+)="\(\?i\)(.*)"\)', query.get("filter", ""))
+        value = re.sub(r"\\(.)", r"\1", match.group(2)).lower() if match else None
+        results = [user for user in users if match is None or str(user.get(match.group(1), "")).lower() == value]
+        return 200, {"results": results, "total": len(results)}
+
+    def rename(query, body):
+        users[0] = dict(users[0], email=body["email"])
+        return 200, None
+
+    def suspend(query, body):
+        users[1] = dict(users[1], status=body["status"].upper())
+        return 204, None
+
+    fake_api.routes[("GET", USERS_PATH)] = get_users
+    fake_api.routes[("PUT", f"{USERS_PATH}/1")] = rename
+    fake_api.routes[("PUT", "/G2M/rest/organizers/2")] = suspend
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/groups")] = fake_api.paged([])
+
+    manager = _manager(fake_api, creds_file)
+    manager.enable_directory()
+    assert manager.get_user_by_email("old@example.com").key == "1"
+    assert manager.get_user_by_key("2").status == "ACTIVE"
+
+    manager.update_user("1", email="new@example.com", firstName="Renamed")
+    manager.set_user_status("2", "suspended")
+
+    with pytest.raises(UserNotFoundError):
+        manager.get_user_by_email("old@example.com")
+    assert manager.get_user_by_email("new@example.com").key == "1"
+    assert manager.get_user_by_key("2").status == "SUSPENDED"
+
+
+def test_group_index_resolves_groups_past_the_first_page(fake_api, creds_file):
+    groups = [{"groupKey": f"g{index}", "groupName": f"Group {index}", "userKeys": [str(index), str(index + 1)]}
+              for index in range(30)]
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/groups")] = fake_api.paged(groups, max_page_size=10)
+    fake_api.routes[("POST", "/G2M/rest/groups/g27/organizers")] = lambda query, body: (201, [{"key": "new"}])
+    fake_api.routes[("GET", USERS_PATH)] = fake_api.paged([{"key": "new", "email": "new@example.com"}])
+
+    manager = _manager(fake_api, creds_file)
+    index = manager.enable_group_index(max_age=None)
+
+    assert manager.create_user_in_group("New", "User", "new@example.com", "Group 27").key == "new"
+    assert len([call for call in fake_api.calls if call[1].endswith("/groups")]) == 3
+    assert index.is_member("new", "g27")
+    assert sorted(group.key for group in index.groups_of("5")) == ["g4", "g5"]
+    assert index.members("g29") == {"29", "30"}
+
+    groups[4] = {"groupKey": "g4", "groupName": "Renamed", "userKeys": ["4"]}
+    del groups[29]
+    assert index.refresh() == {"added": 0, "updated": 2, "removed": 1}
+    assert index.group_key("Renamed") == "g4" and index.group_key("Group 4") is None
+    assert [group.key for group in index.groups_of("5")] == ["g5"]
+    assert index.groups_of("30") == []
+
+
+def test_identical_concurrent_gets_share_one_request(fake_api, creds_file):
+    paged = fake_api.paged([{"key": "1", "email": "user1@example.com"}])
+
+    def slow(query, body):
+        time.sleep(0.2)
+        return paged(query, body)
+
+    fake_api.routes[("GET", USERS_PATH)] = slow
+    manager = _manager(fake_api, creds_file)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: manager.get_users(filter_values={"key": "1"}), range(8)))
+
+    assert all(users[0].email == "user1@example.com" for users in results)
+    assert len(fake_api.calls) == 1
+
+
+def test_response_cache_revalidates_and_is_invalidated_by_writes(fake_api, creds_file):
+    groups = {"results": [{"groupKey": "g", "groupName": "Group"}], "total": 1}
+
+    def etagged(query, body):
+        if fake_api.request_headers[-1].get("If-None-Match") == '"v1"':
+            return 304, None, {"ETag": '"v1"'}
+        return 200, groups, {"ETag": '"v1"'}
+
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/groups")] = etagged
+    fake_api.routes[("PUT", USERS_PATH + "/1")] = lambda query, body: (200, {})
+
+    cache = ResponseCache(ttls={"groups": 0.2})
+    manager = Manager(consumer_key="key", consumer_secret="secret", path_to_config=str(creds_file),
+                      transport=Transport(base_url=fake_api.base_url), response_cache=cache)
+
+    assert manager.get_groups()[0].name == "Group"
+    assert manager.get_groups()[0].name == "Group"
+    assert len(fake_api.calls) == 1
+
+    time.sleep(0.25)
+    assert manager.get_groups()[0].name == "Group"
+    assert cache.stats()["revalidations"] == 1
+
+    group = manager.get_groups()[0]
+    group.name = "Mutated locally"
+    assert manager.get_groups()[0].name == "Group"
+    assert cache.stats()["revalidations"] == 1
+
+    manager.update_user("1", email="user1@example.com", confirm=False, firstName="One")
+    assert len(cache) == 0
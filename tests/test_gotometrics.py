@@ -0,0 +1,34 @@
+from gotomeeting_manager.gotometrics import endpoint_name
+
+from tests.test_gotomanager import USERS_PATH, _manager
+
+
+def test_metrics_record_every_call_with_retries_and_token_refreshes(fake_api, creds_file):
+    responses = iter([(401, {}), (502, {})])
+    paged = fake_api.paged([{"key": "1"}])
+    fake_api.routes[("GET", USERS_PATH)] = lambda query, body: next(responses, None) or paged(query, body)
+    fake_api.routes[("POST", "/oauth/v2/token")] = lambda query, body: (200, {
+        "access_token": "new", "refresh_token": "r", "account_key": "account", "organizer_key": "o"})
+
+    manager = _manager(fake_api, creds_file)
+    metrics = manager.enable_metrics()
+    events, started = [], []
+    manager.instrumentation.add_hooks(before=lambda method, endpoint: started.append(method), after=events.append)
+
+    manager.get_users()
+    manager.get_users(offset=1)
+
+    endpoint = "/admin/rest/v1/accounts/{account}/users"
+    assert started == ["GET", "GET"]
+    assert [(event.endpoint, event.status, event.retries, event.token_refreshed) for event in events] == [
+        (endpoint, 200, 2, True), (endpoint, 200, 0, False)]
+
+    exported = metrics.export_prometheus()
+    assert f'goto_requests_total{{endpoint="{endpoint}",method="GET",status="200"}} 2' in exported
+    assert f'goto_request_retries_total{{endpoint="{endpoint}",method="GET"}} 2' in exported
+    assert f'goto_request_duration_seconds_count{{endpoint="{endpoint}",method="GET"}} 2' in exported
+    assert "goto_token_refreshes_total 1" in exported
+
+
+def test_endpoint_names_have_no_keys():
+    assert endpoint_name("https://api.getgo.com/G2M/rest/organizers/123?x=1") == "/G2M/rest/organizers/{key}"
@@ -0,0 +1,82 @@
+import re
+
+from gotomeeting_manager.gotomanager import Manager
+from gotomeeting_manager.gototransport import Transport
+
+USERS_PATH = "/admin/rest/v1/accounts/account/users"
+
+
+def test_mirror_delta_sync_and_reads(fake_api, creds_file):
+    users = [{"key": str(index), "email": f"User{index}@Example.com", "status": "ACTIVE", "products": ["G2M"]}
+             for index in range(5)]
+    fake_api.routes[("GET", USERS_PATH)] = fake_api.paged(users)
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/groups")] = fake_api.paged([])
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/licenses")] = lambda query, body: (
+        200, {"results": [{"key": "1", "products": ["G2M"]}]})
+
+    manager = Manager(consumer_key="key", consumer_secret="secret", path_to_config=str(creds_file),
+                      transport=Transport(base_url=fake_api.base_url))
+    mirror = manager.enable_mirror()
+
+    assert (creds_file.parent / "goto.mirror.sqlite").exists()
+
+    users[1] = dict(users[1], status="SUSPENDED")
+    del users[4]
+    stats = mirror.sync(manager)["users"]
+    assert (stats.inserted, stats.updated, stats.deleted, stats.unchanged) == (0, 1, 1, 3)
+
+    calls = len(fake_api.calls)
+    assert manager.get_users(filter_values={"email": "user1@example.com"})[0].status == "SUSPENDED"
+    assert len(manager.get_users(filter_values={"status": "active"})) == 3
+    assert len(mirror.get_users_with_product("G2M")) == 4
+    # The rewritten row keeps its place in the pages
+    assert [user.key for user in manager.get_users(page_size=2, offset=1)] == ["1", "2"]
+    assert len(fake_api.calls) == calls
+
+    manager.get_users(filter_values={"email": "user1@example.com"}, max_staleness=0)
+    assert len(fake_api.calls) == calls + 1
+
+
+def _filtered(users):
+    # Answers (field="(?i)value") filters, enough for the single-term reads made by the Manager
+    def route(query, body):
+        expression = query.get("filter", "")
+        match = re.fullmatch(r'\((\w+)="\(\?i\)(.*)"\)', expression)
+        value = re.sub(r"\\(.)", r"\1", match.group(2)).lower() if match else None
+        results = [user for user in users if match is None or str(user.get(match.group(1), "")).lower() == value]
+        return 200, {"results": results, "total": len(results)}
+    return route
+
+
+def test_mirror_does_not_answer_confirmations_and_follows_writes(fake_api, creds_file):
+    users = [{"key": "1", "email": "old@example.com", "status": "ACTIVE", "products": ["G2M"]}]
+    fake_api.routes[("GET", USERS_PATH)] = _filtered(users)
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/groups")] = fake_api.paged([])
+    fake_api.routes[("GET", "/admin/rest/v1/accounts/account/licenses")] = lambda query, body: (
+        200, {"results": [{"key": "1", "products": ["G2M"]}]})
+
+    def create(query, body):
+        users.append(dict(body, key="2", status="ACTIVE", products=["G2M"]))
+        return 200, {"key": "2"}
+
+    def suspend(query, body):
+        users[0]["status"] = body["status"].upper()
+        return 204, None
+
+    fake_api.routes[("POST", USERS_PATH)] = create
+    fake_api.routes[("PUT", "/G2M/rest/organizers/1")] = suspend
+    fake_api.routes[("DELETE", "/G2M/rest/organizers/2")] = lambda query, body: (204, None)
+
+    manager = Manager(consumer_key="key", consumer_secret="secret", path_to_config=str(creds_file),
+                      transport=Transport(base_url=fake_api.base_url))
+    mirror = manager.enable_mirror()
+
+    created = manager.create_user(first_name="New", last_name="User", email="new@example.com")
+    assert [user.key for user in created] == ["2"]
+    assert mirror.get_users(filter_values={"email": "new@example.com"})[0].products == ["G2M"]
+
+    assert manager.suspend_user(email="old@example.com").status == "SUSPENDED"
+    assert mirror.get_users(filter_values={"key": "1"})[0].status == "SUSPENDED"
+
+    manager.delete_user(email="new@example.com")
+    assert mirror.get_users(filter_values={"key": "2"}) == []
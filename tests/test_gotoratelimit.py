@@ -0,0 +1,28 @@
+from gotomeeting_manager.gotoexceptions import HTTPError, HTTPError429, exception_for_status
+from gotomeeting_manager.gotoratelimit import RateLimit, RateLimiter, endpoint_family
+
+
+def test_families_are_paced_independently_and_adapt_to_429():
+    limiter = RateLimiter(limits={"users": RateLimit(rate=10, burst=2)})
+    users = "https://api.getgo.com/admin/rest/v1/accounts/1/users?pageSize=5"
+
+    assert endpoint_family(users) == "users"
+    assert endpoint_family("/oauth/v2/token") == "oauth"
+    assert endpoint_family("/G2M/rest/organizers/1") == "organizers"
+
+    assert limiter.reserve(users) == 0
+    assert limiter.reserve(users) == 0
+    assert 0.05 < limiter.reserve(users) <= 0.1
+
+    assert limiter.observe(users, 429, {"Retry-After": "2"}) == 2
+    assert limiter.bucket(users).rate == 5
+    assert limiter.reserve(users) > 1.9
+    assert limiter.reserve("/admin/rest/v1/accounts/1/licenses") == 0
+
+    limiter.observe("/oauth/v2/token", 200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "3"})
+    assert limiter.reserve("/oauth/v2/token") > 2.9
+
+
+def test_unknown_status_codes_map_to_generic_http_error():
+    assert exception_for_status(429) is HTTPError429
+    assert exception_for_status(418) is HTTPError
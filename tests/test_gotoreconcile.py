@@ -0,0 +1,95 @@
+from benchmarks.bench_client import make_manager
+from benchmarks.mockgoto import KEY_BASE, MockGoToServer
+from gotomeeting_manager.gotoexceptions import GroupNotFoundError
+from gotomeeting_manager.gotoreconcile import ACTIVATE, CREATE, LICENSES, SUSPEND, UPDATE, DesiredUser, Reconciler
+
+
+def _desired(count: int):
+    for index in range(count):
+        user = DesiredUser(email=f"user{index}@example.com", first_name="First", last_name=f"Last{index}",
+                           group_name=f"Group {index % 10}")
+        if index == 5:
+            user = user._replace(last_name="Renamed")
+        elif index == 6:
+            user = user._replace(products=("G2M", "G2W"))
+        elif index == 7:
+            user = user._replace(active=False)
+        elif index == 8:
+            user = user._replace(group_name="Group 3")
+        elif index == 9:
+            user = user._replace(email="moved9@example.com", key=str(KEY_BASE + 9))
+        yield user
+    yield DesiredUser(email="user9@example.com", first_name="New", last_name="Hire", group_name="Group 2")
+    yield DesiredUser(email="lost@example.com", first_name="No", last_name="Group", group_name="Missing")
+
+
+def test_reconcile_writes_only_the_differences(tmp_path):
+    with MockGoToServer(users=200, groups=10, max_page_size=40) as server:
+        manager = make_manager(server, str(tmp_path), rate_limited=False)
+        try:
+            reconciler = Reconciler(manager, workers=4)
+            plan = reconciler.plan(_desired(200))
+
+            assert plan.summary() == {UPDATE: 3, LICENSES: 1, SUSPEND: 1, CREATE: 1, "unchanged": 195, "errors": 1}
+            assert isinstance(plan.errors[0][1], GroupNotFoundError)
+            create = next(index for index, action in enumerate(plan) if action.kind == CREATE)
+            rename = next(index for index, action in enumerate(plan) if action.email == "moved9@example.com")
+            assert plan.actions[create].depends_on == (rename,)
+            assert plan.actions[create].level > plan.actions[rename].level
+
+            requests = server.requests
+            assert all(result.ok for result in reconciler.apply(plan, dry_run=True))
+            assert server.requests == requests
+
+            assert all(result.ok for result in reconciler.apply(plan))
+            assert server.requests == requests + len(plan) + 1  # The create also moves the user into its group
+
+            assert len(reconciler.plan(_desired(200))) == 0
+            assert manager.get_user_by_email("moved9@example.com", use_directory=False).key == str(KEY_BASE + 9)
+            assert manager.get_user_by_email("user9@example.com", use_directory=False).first_name == "New"
+
+            reactivate = reconciler.plan([DesiredUser(email="user7@example.com", first_name="First",
+                                                      last_name="Last7", group_name="Group 7")])
+            assert [action.kind for action in reactivate] == [ACTIVATE]
+        finally:
+            manager.close()
+
+
+def test_rows_with_errors_are_not_suspended_as_missing(tmp_path):
+    with MockGoToServer(users=3, groups=1) as server:
+        manager = make_manager(server, str(tmp_path), rate_limited=False)
+        try:
+            reconciler = Reconciler(manager, suspend_missing=True)
+            desired = [{"email": "user0@example.com", "first_name": "First", "last_name": "Last0", "products": "G2X"},
+                       {"email": "user1@example.com", "first_name": "First", "last_name": "Last1"}]
+
+            plan = reconciler.plan(desired)
+            assert len(plan.errors) == 1
+            assert [(action.kind, action.email) for action in plan] == [(SUSPEND, "user2@example.com")]
+
+            plan = reconciler.plan(desired + [{"first_name": "No", "last_name": "Email"}])
+            assert len(plan.errors) == 3
+            assert len(plan) == 0
+        finally:
+            manager.close()
+
+
+def test_webinar_only_rows_converge(tmp_path):
+    with MockGoToServer(users=3, groups=1) as server:
+        manager = make_manager(server, str(tmp_path), rate_limited=False)
+        try:
+            reconciler = Reconciler(manager)
+            desired = [DesiredUser(email="user1@example.com", first_name="First", last_name="Last1",
+                                   products=("G2W",), group_name="Group 0"),
+                       {"email": "user2@example.com", "first_name": "First", "last_name": ""},
+                       {"email": "new@example.com", "firstName": "New"}]
+
+            plan = reconciler.plan(desired)
+            assert [action.kind for action in plan] == [LICENSES]
+            assert [record["email"] for record, _ in plan.errors] == ["user2@example.com", "new@example.com"]
+            assert all(result.ok for result in reconciler.apply(plan))
+
+            assert manager.get_user_by_email("user1@example.com", use_directory=False).products == ["G2M", "G2W"]
+            assert len(reconciler.plan(desired)) == 0
+        finally:
+            manager.close()
@@ -0,0 +1,32 @@
+from gotomeeting_manager.gotoresponses import UserResponse, GroupResponse
+
+
+def test_lazy_and_compact_models_agree():
+    page = [{"key": str(index), "email": f"user{index}@example.com", "status": "ACTIVE", "admin": True}
+            for index in range(3)]
+
+    lazy = UserResponse.from_page(page)
+    compact = UserResponse.from_page([dict(data) for data in page], compact=True)
+
+    assert [user.to_dict() for user in lazy] == [user.to_dict() for user in compact]
+    assert lazy[0].first_name is None and lazy[0].admin is True
+    assert compact[0].status is compact[1].status
+    assert not hasattr(compact[0], "__dict__")
+
+    compact[0].status = "SUSPENDED"
+    assert compact[0].to_tuple()[-1] == "SUSPENDED"
+
+    group = GroupResponse(key="g", name="Group", user_keys=["1"], total_member_count=1)
+    assert group.to_dict() == {"key": "g", "name": "Group", "user_keys": ["1"], "total_member_count": 1}
+
+
+def test_writes_do_not_leak_into_a_shared_raw_dict():
+    # Callers coalesced onto one GET wrap the same decoded body
+    body = {"key": "1", "email": "user1@example.com", "status": "ACTIVE"}
+    first, second = UserResponse.from_page([body])[0], UserResponse.create_from_dict(body)
+
+    first.status = "SUSPENDED"
+
+    assert first.status == "SUSPENDED" and first.email == "user1@example.com"
+    assert second.status == "ACTIVE"
+    assert body["status"] == "ACTIVE"
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from gotomeeting_manager.gotoexceptions import CircuitOpenError
+from gotomeeting_manager.gotoratelimit import RateLimiter
+from gotomeeting_manager.gotoretry import CircuitBreaker, RetryPolicy
+from gotomeeting_manager.gototransport import Transport
+
+
+def test_idempotent_requests_are_retried_and_counted(fake_api):
+    failures = {"GET": 2, "POST": 2}
+
+    def flaky(query, body, method):
+        if failures[method] > 0:
+            failures[method] -= 1
+            return 502, {}
+        return 200, {"ok": True}
+
+    fake_api.routes[("GET", "/flaky")] = lambda query, body: flaky(query, body, "GET")
+    fake_api.routes[("POST", "/flaky")] = lambda query, body: flaky(query, body, "POST")
+
+    transport = Transport(base_url=fake_api.base_url, retry_policy=RetryPolicy(backoff=0.01))
+
+    assert transport.get("/flaky").status_code == 200
+    assert transport.post("/flaky", json={}).status_code == 502
+    assert transport.post("/flaky", json={}, idempotent=True).status_code == 200
+
+    stats = transport.retry_stats.snapshot()
+    assert (stats["requests"], stats["attempts"], stats["retries"], stats["failures"]) == (3, 6, 3, 1)
+
+
+def test_circuit_opens_and_recovers_through_a_probe(fake_api):
+    status = {"code": 502}
+    fake_api.routes[("GET", "/down")] = lambda query, body: (status["code"], {})
+
+    transport = Transport(base_url=fake_api.base_url, retry_policy=RetryPolicy(max_attempts=1),
+                          failure_threshold=2, reset_timeout=0.2)
+
+    transport.get("/down")
+    transport.get("/down")
+    with pytest.raises(CircuitOpenError):
+        transport.get("/down")
+    assert len(fake_api.calls) == 2
+
+    time.sleep(0.25)
+    status["code"] = 200
+    assert transport.get("/down").status_code == 200
+    assert transport.get("/down").status_code == 200
+    assert transport.retry_stats.snapshot()["rejected"] == 1
+
+
+def test_rate_limited_half_open_probe_closes_the_circuit(fake_api):
+    responses = [(502, {}), (429, {}, {"Retry-After": "0"}), (200, {})]
+    fake_api.routes[("GET", "/busy")] = lambda query, body: responses.pop(0) if len(responses) > 1 else responses[0]
+
+    transport = Transport(base_url=fake_api.base_url, retry_policy=RetryPolicy(max_attempts=1),
+                          rate_limiter=RateLimiter(), failure_threshold=1, reset_timeout=0.1)
+
+    transport.get("/busy")
+    with pytest.raises(CircuitOpenError):
+        transport.get("/busy")
+
+    time.sleep(0.15)
+    assert transport.get("/busy").status_code == 200
+    assert transport.circuit_breaker(transport.url("/busy")).state == CircuitBreaker.CLOSED
+    assert transport.get("/busy").status_code == 200
+
+
+def test_probe_that_raises_reopens_the_circuit():
+    breaker = CircuitBreaker("probe.invalid", failure_threshold=1, reset_timeout=0)
+
+    class Failing(RateLimiter):
+        def acquire(self, path: str):
+            raise RuntimeError("interrupted")
+
+    transport = Transport(base_url="http://probe.invalid", rate_limiter=Failing())
+    transport.circuit_breaker = lambda url: breaker
+    breaker.record_failure()
+
+    with pytest.raises(RuntimeError):
+        transport.get("/")
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breakers_are_shared_only_between_identical_settings():
+    strict = CircuitBreaker.for_host("settings.invalid", failure_threshold=1, reset_timeout=60)
+    assert CircuitBreaker.for_host("settings.invalid", failure_threshold=1, reset_timeout=60) is strict
+
+    lenient = CircuitBreaker.for_host("settings.invalid", failure_threshold=10, reset_timeout=5)
+    assert lenient is not strict
+    assert (lenient.failure_threshold, lenient.reset_timeout) == (10, 5)
+
+    strict.record_failure()
+    assert strict.state == CircuitBreaker.OPEN and lenient.state == CircuitBreaker.CLOSED
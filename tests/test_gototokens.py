@@ -0,0 +1,63 @@
+import datetime
+import threading
+import time
+
+from gotomeeting_manager.gotocredentials import FileCredentialStore
+from gotomeeting_manager.gototokens import TokenProvider
+from gotomeeting_manager.gototransport import Transport
+
+
+def test_concurrent_callers_share_one_refresh(fake_api, tmp_path):
+    def token(query, body):
+        time.sleep(0.05)
+        return 200, {"access_token": "fresh", "refresh_token": "refresh-2", "account_key": "account",
+                     "organizer_key": "organizer", "expires_in": 3600}
+
+    fake_api.routes[("POST", "/oauth/v2/token")] = token
+    updates = []
+
+    provider = TokenProvider(transport=Transport(base_url=fake_api.base_url), token_headers={},
+                             get_auth_code=lambda: "code", on_update=updates.append,
+                             store=FileCredentialStore(str(tmp_path / "goto.creds")), proactive_renewal=False)
+    provider.load({"access_token": "stale", "refresh_token": "refresh", "expires_in": 0,
+                   "last_refreshed": datetime.datetime.now().strftime("%m/%d/%Y, %H:%M:%S")})
+
+    threads = [threading.Thread(target=provider.ensure_fresh) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert provider.access_token == "fresh"
+    assert len(updates) == 1
+    assert provider.expires_in > 0
+
+
+def test_interactive_authorization_runs_outside_the_locks(fake_api, tmp_path):
+    fake_api.routes[("POST", "/oauth/v2/token")] = lambda query, body: (
+        200, {"access_token": "fresh", "refresh_token": "refresh-2", "account_key": "account",
+              "organizer_key": "organizer", "expires_in": 3600})
+    path = str(tmp_path / "goto.creds")
+    free = []
+
+    def get_auth_code():
+        # Another process taking the store's lock, and this provider's own lock, are not blocked meanwhile
+        def lock_store():
+            with FileCredentialStore(path).locked():
+                pass
+
+        other_process = threading.Thread(target=lock_store)
+        other_process.start()
+        other_process.join(timeout=2)
+        free.append(not other_process.is_alive())
+        free.append(provider._lock.acquire(blocking=False))
+        provider._lock.release()
+        return "code"
+
+    provider = TokenProvider(transport=Transport(base_url=fake_api.base_url), token_headers={},
+                             get_auth_code=get_auth_code, on_update=lambda config: None,
+                             store=FileCredentialStore(path), proactive_renewal=False)
+    provider.refresh(force_cold_start=True)
+
+    assert free == [True, True]
+    assert provider.access_token == "fresh"
@@ -0,0 +1,36 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from gotomeeting_manager.gototransport import Transport
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = f"{self.headers.get('Authorization')}|{self.client_address[1]}".encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_transport_reuses_connection_and_sends_default_headers():
+    server = HTTPServer(("127.0.0.1", 0), _EchoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        with Transport(base_url=f"http://127.0.0.1:{server.server_port}", pool_size=2) as transport:
+            transport.set_authorization("token-1")
+            first = transport.get("/").text.split("|")
+            second = transport.get("/").text.split("|")
+
+        assert first[0] == "token-1"
+        assert first[1] == second[1]
+    finally:
+        server.shutdown()
+        server.server_close()